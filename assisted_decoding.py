@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Assisted (speculative) decoding: model nháp nhỏ đề xuất token, model chính kiểm tra.
+
+Dùng khi model chính lớn (vd. facebook/bart-large-cnn) và có model chưng cất
+cùng tokenizer nhanh hơn nhiều (vd. sshleifer/distilbart-cnn-12-6):
+
+  python quickstart.py --url URL --model facebook/bart-large-cnn \\
+      --draft-model sshleifer/distilbart-cnn-12-6
+
+Mỗi bước, model nháp sinh vài token, model chính chạy một lần forward để kiểm
+tra cả dãy và giữ phần khớp với lựa chọn của chính nó, nên kết quả giống hệt
+model chính giải mã greedy. Transformers chỉ hỗ trợ assisted generation với
+num_beams=1 và batch 1, nên ở chế độ này num_beams / batch_size của inference
+profile bị bỏ qua.
+
+Sau mỗi bước (map / reduce) in ra:
+- acceptance: tỉ lệ token nháp được model chính chấp nhận
+- speedup: thời gian ước tính nếu không có model nháp / thời gian thực tế.
+  Ước tính = thời gian thực - thời gian model nháp + (số bước model chính đã
+  tiết kiệm) x (thời gian trung bình một bước model chính).
+"""
+
+import time
+from typing import Dict, Optional
+
+
+def tokenizers_compatible(main_tokenizer, draft_tokenizer) -> bool:
+    """Model nháp phải dùng cùng bộ từ vựng thì token đề xuất mới có nghĩa."""
+    try:
+        return main_tokenizer.get_vocab() == draft_tokenizer.get_vocab()
+    except Exception:
+        return len(main_tokenizer) == len(draft_tokenizer)
+
+
+class AssistedDecoding:
+    """
+    Gắn model nháp vào model chính: bọc model.generate để luôn truyền
+    assistant_model, và đo số lần forward / thời gian của hai model.
+    """
+
+    def __init__(self, model, draft, draft_name: str, pad_token_id: Optional[int] = None):
+        self.model = model
+        self.draft = draft
+        self.draft_name = draft_name
+        self.pad_token_id = pad_token_id
+        self.counters: Dict[str, float] = {
+            "generate_calls": 0,
+            "tokens": 0,
+            "main_steps": 0,
+            "main_seconds": 0.0,
+            "draft_steps": 0,
+            "draft_seconds": 0.0,
+        }
+        self._attach()
+
+    def _attach(self) -> None:
+        self._hook(self.model, "main")
+        self._hook(self.draft, "draft")
+        generate = self.model.generate
+
+        def assisted_generate(*args, **kwargs):
+            # Assisted generation chỉ chạy với greedy / sampling
+            kwargs.pop("early_stopping", None)
+            kwargs["num_beams"] = 1
+            kwargs["assistant_model"] = self.draft
+            output = generate(*args, **kwargs)
+            self._count_tokens(output)
+            return output
+
+        self.model.generate = assisted_generate
+
+    def _hook(self, module, prefix: str) -> None:
+        # Forward của model (không phải encoder) chạy một lần cho mỗi bước giải mã
+        started: Dict[str, float] = {}
+
+        def before(_module, _inputs):
+            started["t"] = time.perf_counter()
+
+        def after(_module, _inputs, _output):
+            self.counters[prefix + "_steps"] += 1
+            self.counters[prefix + "_seconds"] += time.perf_counter() - started.get("t", time.perf_counter())
+
+        module.register_forward_pre_hook(before)
+        module.register_forward_hook(after)
+
+    def _count_tokens(self, output) -> None:
+        sequences = getattr(output, "sequences", output)
+        self.counters["generate_calls"] += 1
+        try:
+            body = sequences[:, 1:]  # bỏ decoder_start_token
+            if self.pad_token_id is not None:
+                self.counters["tokens"] += int((body != self.pad_token_id).sum())
+            else:
+                self.counters["tokens"] += int(body.numel())
+        except Exception:
+            pass
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self.counters)
+
+    def report(self, since: Dict[str, float], elapsed: float) -> Optional[Dict]:
+        """Số liệu từ lúc `since` (snapshot) tới giờ; None nếu chưa generate lần nào."""
+        delta = {k: self.counters[k] - since.get(k, 0) for k in self.counters}
+        if not delta["generate_calls"] or not delta["main_steps"]:
+            return None
+        tokens = delta["tokens"]
+        # Mỗi bước model chính giữ các token nháp đúng + 1 token của chính nó
+        accepted = max(0.0, tokens - delta["main_steps"])
+        acceptance = accepted / delta["draft_steps"] if delta["draft_steps"] else 0.0
+        step_time = delta["main_seconds"] / delta["main_steps"]
+        unassisted = elapsed - delta["draft_seconds"] + accepted * step_time
+        return {
+            "draft_model": self.draft_name,
+            "tokens": int(tokens),
+            "main_steps": int(delta["main_steps"]),
+            "draft_tokens": int(delta["draft_steps"]),
+            "acceptance_rate": round(min(1.0, acceptance), 3),
+            "estimated_speedup": round(unassisted / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+def describe(report: Dict) -> str:
+    speedup = report.get("estimated_speedup")
+    return (
+        f"assisted by {report['draft_model']}: "
+        f"acceptance {report['acceptance_rate'] * 100:.0f}%, "
+        f"{report['tokens']} tokens in {report['main_steps']} main-model steps"
+        + (f", ~{speedup:.2f}x vs unassisted" if speedup else "")
+    )
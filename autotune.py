@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Autotune: đo nhanh trên máy hiện tại để chọn cấu hình suy luận local.
+
+Chạy thử summarize_text trên một transcript mẫu với các giá trị khác nhau của
+số thread torch (intra-op / inter-op), precision, batch size, số từ mỗi chunk,
+ngân sách token đầu vào và số beam. Mỗi lần thử chạy trong một process riêng
+(set_num_interop_threads chỉ đặt được một lần mỗi process), thời gian load
+model không được tính.
+
+Chất lượng được so với bản tóm tắt tham chiếu (cấu hình mặc định nhưng
+num_beams=4, giá trị trước khi chỉnh tay): điểm = unigram F1. Một cấu hình chỉ
+được nhận nếu điểm không thấp hơn cấu hình mặc định quá --tolerance. Cấu hình
+nhanh nhất được ghi vào inference_profile.json (xem inference_profile.py), và
+quickstart.py / create_lesson.py tự dùng từ lần chạy sau.
+
+Mặc định đo với cấu hình của quickstart (min/max 30/120). create_lesson tóm tắt
+dài hơn (150/400) nên chunk_words của nó được đo riêng bằng --entry
+create_lesson: chỉ thử chunk_words, các tham số khác lấy từ profile chung.
+
+Usage:
+  python autotune.py
+  python autotune.py --model t5-small --mode lesson --tolerance 0.03
+  python autotune.py --fixture runs/<RUN_ID>/transcript.json --dry-run
+  python autotune.py --entry create_lesson
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from inference_profile import (
+    DEFAULT_PROFILE,
+    ENTRY_DEFAULTS,
+    load_profile,
+    profile_path,
+    save_entry_setting,
+    save_profile,
+)
+
+
+# Transcript mẫu (~700 từ, dạng phụ đề bài giảng) - đủ để có nhiều chunk
+FIXTURE_TEXT = """
+okay so today we are going to talk about functions in python and why they matter
+so much once your programs grow beyond a few lines. a function is a named block of
+code that does one job. you define it with the def keyword followed by the name,
+parentheses with the parameters, and a colon. everything indented below that line
+is the body of the function. when you call the function python jumps into the body,
+runs it with the arguments you passed, and comes back with a return value. if you
+do not write a return statement the function returns None, which is a very common
+source of bugs for beginners, so keep that in mind. let's look at a first example.
+we write def area of rectangle with two parameters width and height, and the body is
+just return width times height. now when we call area of rectangle with three and
+four we get twelve. the important idea here is that the caller does not need to know
+how the area is computed. it only needs to know the name, the parameters and what
+comes back. that is what we call an interface. the second concept is parameters
+versus arguments. parameters are the names in the definition, arguments are the
+actual values you pass in the call. python supports positional arguments, keyword
+arguments, and default values. for example we can give height a default of one, so
+area of rectangle with only five returns five. a common mistake is to use a mutable
+default like an empty list. the list is created once when the function is defined,
+not every time it is called, so values leak between calls. the fix is to use None as
+the default and create the list inside the body. next, let's talk about scope. a
+variable assigned inside a function is local to that function. it disappears when the
+function returns and it does not change a variable with the same name outside. if you
+really need to modify a global variable you have to declare it with the global
+keyword, but in practice you should avoid that and return values instead. functions
+that only depend on their inputs and do not change anything outside are called pure
+functions. they are easy to test because the same input always gives the same output.
+now step by step, how do you turn messy code into functions. step one, find a block
+of code that you copy and paste in several places. step two, figure out which values
+change between the copies, those become parameters. step three, move the block into
+a function and return the result. step four, replace every copy with a call and run
+your tests again. this process is called refactoring and you will do it all the time.
+another useful feature is that functions are objects in python. you can store them
+in a list, pass them to other functions and return them. for example the built in
+sorted function takes a key argument which is a function that computes the sort key.
+if we have a list of students we can sort them by grade with sorted students key
+equals a small lambda that returns the grade. lambda is just a short way to write a
+one line function without a name. be careful though, if the logic is more than one
+expression, write a normal def with a clear name, it is much easier to read. a few
+tips before we finish. give functions verb names that say what they do, like load
+config or send email. keep them short, ideally they fit on one screen. write a
+docstring right under the def line that explains the parameters and the return value.
+and test each function on its own with a few inputs including edge cases like an empty
+list or zero. to summarize, functions let you name a piece of logic, reuse it, and
+reason about your program one small piece at a time. in the next lesson we will use
+these ideas to build a small command line tool that reads a file and prints statistics.
+for homework try rewriting last week's exercise using at least three functions.
+"""
+
+
+# Cấu hình summarize_text của từng entry point (create_lesson.py gọi với 150/400, mode lesson)
+ENTRY_POINTS: Dict[str, Dict] = {
+    "quickstart": {"min_length": 30, "max_length": 120},
+    "create_lesson": {"min_length": 150, "max_length": 400, "mode": "lesson"},
+}
+
+
+# Các giá trị thử cho từng tham số, theo thứ tự tối ưu (coordinate descent)
+def _candidates(on_gpu: bool) -> List[Tuple[str, List]]:
+    cpus = os.cpu_count() or 1
+    threads = sorted({max(1, cpus // 4), max(1, cpus // 2), cpus})
+    return [
+        ("torch_threads", [None] + threads),
+        ("interop_threads", [None, 1, 2]),
+        ("precision", ["fp32", "fp16"] if on_gpu else ["fp32", "bf16", "int8"]),
+        ("batch_size", [1, 2, 4]),
+        ("chunk_words", [200, 300, 400, 600]),
+        ("max_source_len", [None, 512, 384]),
+        ("num_beams", [1, 2, 4]),
+    ]
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def unigram_f1(candidate: str, reference: str) -> float:
+    """Độ trùng từ (giống ROUGE-1 F1) giữa bản tóm tắt thử và bản tham chiếu."""
+    cand = Counter(_WORD_RE.findall(candidate.lower()))
+    ref = Counter(_WORD_RE.findall(reference.lower()))
+    overlap = sum((cand & ref).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def load_fixture(path: Optional[str]) -> str:
+    """Transcript mẫu: file .txt, transcript.json của một run, hoặc FIXTURE_TEXT."""
+    if not path:
+        return " ".join(FIXTURE_TEXT.split())
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            from transcript import Transcript
+
+            return Transcript.from_raw_data(json.load(f)).text
+        return " ".join(f.read().split())
+
+
+# ---------- một lần thử (chạy trong process con) ----------
+def _trial_main(spec: Dict) -> None:
+    from inference_profile import use_profile
+
+    use_profile(spec["profile"])
+    with contextlib.redirect_stdout(sys.stderr):
+        from quickstart import build_summarizer, summarize_text
+
+        build_summarizer(spec["model"])  # load model trước, không tính vào thời gian
+        text = load_fixture(spec.get("fixture"))
+        times: List[float] = []
+        summary = ""
+        for _ in range(max(1, spec.get("repeats", 1))):
+            started = time.perf_counter()
+            summary = summarize_text(
+                text,
+                model_name=spec["model"],
+                min_length=spec["min_length"],
+                max_length=spec["max_length"],
+                chunk_words=None,
+                combine=True,
+                mode=spec["mode"],
+                language="en",
+            )
+            times.append(time.perf_counter() - started)
+    print(json.dumps({"seconds": statistics.median(times), "summary": summary}, ensure_ascii=False))
+
+
+def run_trial(
+    profile: Dict,
+    model: str,
+    mode: str,
+    fixture: Optional[str],
+    repeats: int,
+    timeout: float,
+    entry: str = "quickstart",
+) -> Optional[Dict]:
+    spec = {
+        "profile": profile, "model": model, "mode": mode, "fixture": fixture, "repeats": repeats,
+        "min_length": ENTRY_POINTS[entry]["min_length"], "max_length": ENTRY_POINTS[entry]["max_length"],
+    }
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--trial", json.dumps(spec)],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            timeout=timeout,
+            env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+        )
+    except subprocess.TimeoutExpired:
+        print(f"✗ timed out after {timeout:.0f}s")
+        return None
+    if proc.returncode != 0:
+        last = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        print(f"✗ failed: {last}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _describe(name: str, value) -> str:
+    return f"{name}={'auto' if value is None else value}"
+
+
+def autotune(
+    model: str,
+    mode: str = "plain",
+    fixture: Optional[str] = None,
+    tolerance: float = 0.05,
+    repeats: int = 1,
+    timeout: float = 900.0,
+    entry: str = "quickstart",
+) -> Tuple[Dict, Dict]:
+    """
+    Trả về (profile tốt nhất, thông tin đo). Tối ưu lần lượt từng tham số,
+    giữ nguyên các tham số khác ở giá trị tốt nhất đã tìm được. Với entry
+    khác quickstart chỉ thử các tham số trong ENTRY_DEFAULTS[entry], xuất
+    phát từ profile chung + giá trị cũ của entry point đó.
+    """
+    mode = ENTRY_POINTS[entry].get("mode", mode)
+
+    def trial(profile: Dict, label: str) -> Optional[Dict]:
+        print(f"  {label:<28}", end=" ", flush=True)
+        result = run_trial(profile, model, mode, fixture, repeats, timeout, entry)
+        if result is not None:
+            result["quality"] = unigram_f1(result["summary"], reference)
+            print(f"{result['seconds']:7.2f}s  quality={result['quality']:.3f}")
+        return result
+
+    on_gpu = False
+    try:
+        import torch  # type: ignore
+
+        on_gpu = torch.cuda.is_available()
+    except Exception:
+        pass
+
+    start = dict(DEFAULT_PROFILE) if entry == "quickstart" else dict(load_profile(), **ENTRY_DEFAULTS[entry])
+    candidates = _candidates(on_gpu)
+    if entry != "quickstart":
+        candidates = [(name, values) for name, values in candidates if name in ENTRY_DEFAULTS[entry]]
+
+    print("📏 Reference run (num_beams=4)...")
+    reference = ""
+    ref = run_trial(dict(start, num_beams=4), model, mode, fixture, 1, timeout, entry)
+    if ref is None:
+        raise RuntimeError("Reference run failed, check that the model loads")
+    reference = ref["summary"]
+
+    print("📏 Baseline (current defaults)...")
+    best = dict(start)
+    base = trial(best, "defaults")
+    if base is None:
+        raise RuntimeError("Baseline run failed")
+    min_quality = base["quality"] - tolerance
+    best_seconds = base["seconds"]
+
+    for name, values in candidates:
+        print(f"🔧 {name}")
+        for value in values:
+            if value == best[name]:
+                continue
+            candidate = dict(best, **{name: value})
+            result = trial(candidate, _describe(name, value))
+            if result is None or result["quality"] < min_quality:
+                continue
+            # Chỉ đổi khi nhanh hơn rõ rệt (>3%), tránh chọn theo nhiễu đo
+            if result["seconds"] < best_seconds * 0.97:
+                best, best_seconds = candidate, result["seconds"]
+        print(f"   → {_describe(name, best[name])}")
+
+    info = {
+        "model": model,
+        "mode": mode,
+        "entry": entry,
+        "tolerance": tolerance,
+        "baseline_seconds": round(base["seconds"], 3),
+        "tuned_seconds": round(best_seconds, 3),
+        "baseline_quality": round(base["quality"], 4),
+        "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return best, info
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark local inference settings and save the fastest profile")
+    parser.add_argument("--model", default="sshleifer/distilbart-cnn-12-6", help="Model to tune with")
+    parser.add_argument("--mode", choices=["plain", "lesson"], default="plain")
+    parser.add_argument(
+        "--entry",
+        choices=sorted(ENTRY_POINTS),
+        default="quickstart",
+        help="Tune for this script's summary lengths (create_lesson: chunk_words only)",
+    )
+    parser.add_argument("--fixture", help="Transcript to benchmark on (.txt or runs/<RUN_ID>/transcript.json)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.05,
+        help="Max drop in quality (unigram F1 vs the num_beams=4 reference) allowed vs the defaults",
+    )
+    parser.add_argument("--repeats", type=int, default=1, help="Timed runs per setting (median is used)")
+    parser.add_argument("--trial-timeout", type=float, default=900.0, help="Seconds before a single trial is abandoned")
+    parser.add_argument("--output", default=None, help=f"Profile file (default: {profile_path()})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the best profile without saving it")
+    parser.add_argument("--trial", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trial:
+        _trial_main(json.loads(args.trial))
+        return 0
+
+    print("=" * 60)
+    print(f"Autotune: {args.model} ({args.entry}, {ENTRY_POINTS[args.entry].get('mode', args.mode)} mode)")
+    print("=" * 60)
+    try:
+        best, info = autotune(
+            args.model,
+            mode=args.mode,
+            fixture=args.fixture,
+            tolerance=args.tolerance,
+            repeats=args.repeats,
+            timeout=args.trial_timeout,
+            entry=args.entry,
+        )
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        return 1
+
+    if args.entry != "quickstart":
+        best = {name: best[name] for name in ENTRY_DEFAULTS[args.entry]}
+    print("\n✓ Best profile:")
+    print(json.dumps(best, indent=2))
+    print(f"  {info['baseline_seconds']:.2f}s → {info['tuned_seconds']:.2f}s")
+    if args.dry_run:
+        return 0
+    if args.entry == "quickstart":
+        path = save_profile(best, args.output, tuned=info)
+    else:
+        path = save_entry_setting(args.entry, best, args.output, tuned=info)
+    print(f"💾 Saved to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Backend tạo bài học dùng chung một giao diện + bộ định tuyến (router).
+
+- LocalBackend  : model HuggingFace chạy local (summarize_text, lesson mode)
+- GeminiBackend : key points + Gemini API (như gemini_lesson.py)
+- StubBackend   : bài học giả lập từ transcript, có độ trễ cấu hình được - dùng
+                  để thử router / hàng đợi mà không cần model hay API key
+
+Router chọn backend cho từng job:
+- Gemini đang bị giới hạn (429 / hết quota) -> tạm nghỉ Gemini một lúc, dùng local
+- Hàng đợi local sâu (>= deep_queue) và Gemini không chậm hơn thời gian chờ
+  ước tính ở local -> gửi sang Gemini
+- Còn lại dùng local (không tốn quota)
+Thời gian chờ được ước tính từ phân vị độ trễ (p50 / p95) của từng backend.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from evidence import extract_key_points
+from transcript import TranscriptSpan
+
+
+class BackendError(RuntimeError):
+    pass
+
+
+class RateLimited(BackendError):
+    """Backend từ chối vì quá giới hạn request / quota."""
+
+
+_RATE_LIMIT_RE = re.compile(r"\b429\b|resource.?exhausted|quota|rate.?limit", re.IGNORECASE)
+
+
+def is_rate_limit_error(message: str) -> bool:
+    return bool(_RATE_LIMIT_RE.search(message or ""))
+
+
+# Lỗi tạm thời của server / mạng: thử lại có thể thành công
+_TRANSIENT_RE = re.compile(
+    r"\b(500|502|503|504)\b|unavailable|internal.?server|deadline.?exceeded|timed?.?out|"
+    r"connection (reset|aborted|refused|error)|temporar",
+    re.IGNORECASE,
+)
+
+
+def is_transient_error(message: str) -> bool:
+    """Rate limit hoặc lỗi tạm thời; lỗi như API key sai, prompt bị chặn thì không."""
+    return is_rate_limit_error(message) or bool(_TRANSIENT_RE.search(message or ""))
+
+
+class Backend(ABC):
+    """Giao diện chung: nhận transcript, trả về bài học markdown."""
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def generate(self, transcript: TranscriptSpan, language: str, **params) -> str:
+        """Bài học markdown cho `transcript`; bị giới hạn request / quota thì raise RateLimited."""
+
+
+class LocalBackend(Backend):
+    name = "local"
+
+    def __init__(self, model_name: str = "sshleifer/distilbart-cnn-12-6"):
+        self.model_name = model_name
+
+    def generate(self, transcript: TranscriptSpan, language: str, **params) -> str:
+        from quickstart import summarize_text
+
+        return summarize_text(
+            transcript,
+            model_name=params.get("model") or self.model_name,
+            min_length=int(params.get("min_length", 150)),
+            max_length=int(params.get("max_length", 400)),
+            chunk_words=params.get("chunk_words"),
+            combine=True,
+            mode="lesson",
+            language=language,
+            cancel=params.get("cancel"),
+            draft_model=params.get("draft_model"),
+        )
+
+
+def _gemini_module():
+    """gemini_lesson.py thoát process nếu thiếu thư viện, nên import có bảo vệ."""
+    try:
+        import gemini_lesson
+
+        return gemini_lesson
+    except (ImportError, SystemExit):
+        return None
+
+
+class GeminiBackend(Backend):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, max_points: int = 80):
+        self.api_key = api_key
+        self.max_points = max_points
+
+    def _api_key(self) -> Optional[str]:
+        if self.api_key or os.getenv("GEMINI_API_KEY"):
+            return self.api_key or os.getenv("GEMINI_API_KEY")
+        module = _gemini_module()
+        return getattr(module, "DEFAULT_GEMINI_API_KEY", None) if module else None
+
+    def available(self) -> bool:
+        return _gemini_module() is not None and bool(self._api_key())
+
+    def generate(self, transcript: TranscriptSpan, language: str, **params) -> str:
+        module = _gemini_module()
+        if module is None:
+            raise BackendError("google-generativeai is not installed")
+        key_points = extract_key_points(
+            transcript.text, int(params.get("max_points", self.max_points))
+        )
+        try:
+            return module.generate_lesson_with_gemini(
+                video_title="",
+                key_points=key_points,
+                language=language,
+                api_key=self._api_key(),
+                cancel=params.get("cancel"),
+                sections=params.get("sections", "single"),
+            )
+        except RuntimeError as e:
+            if is_rate_limit_error(str(e)):
+                raise RateLimited(str(e)) from e
+            raise
+
+
+class StubBackend(Backend):
+    """
+    Bài học giả lập: tiêu đề + vài câu đầu của transcript. `delay` (giây) mô
+    phỏng thời gian xử lý; `rate_limit_every` > 0 thì cứ N lần gọi lại báo 429.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0, rate_limit_every: int = 0):
+        self.delay = delay
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+
+    def generate(self, transcript: TranscriptSpan, language: str, **params) -> str:
+        self.calls += 1
+        delay = float(params.get("delay", self.delay))
+        if delay > 0:
+            time.sleep(delay)
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise RateLimited("429 stub rate limit")
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", transcript.text) if s.strip()]
+        points = "\n".join(f"- {s}" for s in sentences[:5]) or "- (empty transcript)"
+        return (
+            f"# 📚 Stub lesson [{transcript.label}]\n\n"
+            f"## 📌 Summary\n{points}\n"
+        )
+
+
+def get_backend(name: str, **options) -> Backend:
+    if name == "local":
+        return LocalBackend(**options)
+    if name == "gemini":
+        return GeminiBackend(**options)
+    if name == "stub":
+        return StubBackend(**options)
+    raise ValueError(f"Unknown backend: {name}")
+
+
+BACKEND_NAMES = ("local", "gemini", "stub")
+
+
+class LatencyTracker:
+    """Giữ `window` mẫu độ trễ gần nhất cho mỗi backend và tính phân vị."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, backend: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(backend, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, backend: str) -> int:
+        return len(self._samples.get(backend, ()))
+
+    def percentile(self, backend: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(backend, ()))
+        if not samples:
+            return None
+        # nearest-rank
+        rank = max(0, min(len(samples) - 1, math.ceil(q / 100.0 * len(samples)) - 1))
+        return samples[rank]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            backend: {
+                "n": self.count(backend),
+                "p50": round(self.percentile(backend, 50), 3),
+                "p95": round(self.percentile(backend, 95), 3),
+                "p99": round(self.percentile(backend, 99), 3),
+            }
+            for backend in list(self._samples)
+            if self.count(backend)
+        }
+
+
+class Router:
+    """
+    Chọn backend cho job kế tiếp.
+
+    queue_depth(): số job đang chờ + đang chạy ở local (vd. JobService.queue_depth)
+    local_workers: số job local chạy song song
+    deep_queue: từ độ sâu này trở lên mới cân nhắc chuyển sang Gemini
+    cooldown: số giây tạm nghỉ Gemini sau khi bị rate limit
+    """
+
+    # Ước lượng khi chưa có mẫu đo nào
+    DEFAULT_LATENCY = {"local": 300.0, "gemini": 30.0, "stub": 1.0}
+
+    def __init__(
+        self,
+        queue_depth: Callable[[], int],
+        tracker: Optional[LatencyTracker] = None,
+        local_workers: int = 1,
+        deep_queue: int = 2,
+        cooldown: float = 60.0,
+        remote: str = "gemini",
+        remote_available: Optional[bool] = None,
+    ):
+        self.queue_depth = queue_depth
+        self.tracker = tracker or LatencyTracker()
+        self.local_workers = max(1, local_workers)
+        self.deep_queue = deep_queue
+        self.cooldown = cooldown
+        self.remote = remote
+        self._remote_available = remote_available
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _latency(self, backend: str, q: float) -> float:
+        value = self.tracker.percentile(backend, q)
+        return value if value is not None else self.DEFAULT_LATENCY.get(backend, 60.0)
+
+    def remote_ready(self) -> bool:
+        if self._remote_available is None:
+            self._remote_available = get_backend(self.remote).available()
+        return self._remote_available and time.monotonic() >= self._cooldown_until
+
+    def estimate(self) -> Dict[str, float]:
+        """Thời gian hoàn thành ước tính (giây) nếu job kế tiếp đi vào mỗi backend."""
+        depth = self.queue_depth()
+        waves = depth // self.local_workers + 1
+        return {
+            "local": self._latency("local", 50) * waves,
+            self.remote: self._latency(self.remote, 95),
+        }
+
+    def choose(self) -> str:
+        with self._lock:
+            if not self.remote_ready():
+                return "local"
+            if self.queue_depth() < self.deep_queue:
+                return "local"
+            est = self.estimate()
+            # Hàng đợi local sâu: chỉ chuyển khi đuôi độ trễ của remote vẫn tốt hơn
+            return self.remote if est[self.remote] < est["local"] else "local"
+
+    def record(self, backend: str, seconds: float, ok: bool = True, rate_limited: bool = False) -> None:
+        if rate_limited:
+            with self._lock:
+                self._cooldown_until = time.monotonic() + self.cooldown
+            print(f"⏸ {backend} rate limited, routing to local for {self.cooldown:.0f}s")
+            return
+        if ok:
+            self.tracker.record(backend, seconds)
+
+    def fallback(self, failed: str) -> Optional[str]:
+        """Backend thay thế khi `failed` bị rate limit / lỗi tạm thời."""
+        return "local" if failed != "local" else None
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Hủy hợp tác (cooperative cancellation) và deadline cho các job dài.
+
+CancelToken được truyền vào summarize_text và vòng lặp tạo từng phần bài học:
+- Giữa các chunk / các phần: kiểm tra `token.should_stop` và dừng sớm, trả
+  về phần kết quả đã có.
+- Trong lúc generate: `token.stopping_criteria()` được truyền cho pipeline
+  (transformers StoppingCriteria), beam search dừng ở bước token kế tiếp.
+
+Token bị hủy khi: gọi cancel(), quá deadline, nhận SIGTERM, hoặc tiến trình
+cha (PHP / worker) đã chết.
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+
+class CancelToken:
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self.deadline: Optional[float] = None
+        if deadline_seconds is not None and deadline_seconds > 0:
+            self.deadline = time.monotonic() + deadline_seconds
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def should_stop(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        return False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.should_stop
+
+    def remaining(self) -> Optional[float]:
+        """Số giây còn lại trước deadline (None nếu không có deadline)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def stopping_criteria(self):
+        """StoppingCriteriaList cho model.generate / pipeline (import lười transformers)."""
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        token = self
+
+        class _CancelCriteria(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return token.should_stop
+
+        return StoppingCriteriaList([_CancelCriteria()])
+
+    def generate_kwargs(self) -> dict:
+        """Tham số thêm cho mỗi lần gọi summarizer(...)."""
+        return {"stopping_criteria": self.stopping_criteria()}
+
+
+def install_signal_handlers(token: CancelToken) -> None:
+    """SIGTERM (và SIGBREAK trên Windows) -> hủy token thay vì giết process ngay."""
+
+    def handler(signum, frame):
+        token.cancel(f"signal {signum}")
+
+    for name in ("SIGTERM", "SIGBREAK", "SIGHUP"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            try:
+                signal.signal(sig, handler)
+            except (ValueError, OSError):
+                pass  # không phải main thread / không hỗ trợ
+
+
+def _parent_exited_check(parent: int) -> Optional[Callable[[], bool]]:
+    """
+    Hàm trả về True khi tiến trình cha đã thoát, hoặc None nếu không theo dõi được.
+    POSIX: process mồ côi được chuyển sang cha khác nên getppid() đổi.
+    Windows: getppid() không bao giờ đổi, nên giữ handle của process cha (handle
+    đang mở thì PID không bị tái sử dụng) và hỏi xem nó đã kết thúc chưa.
+    """
+    if os.name != "nt":
+        return lambda: os.getppid() != parent
+    import ctypes
+
+    synchronize, wait_object_0 = 0x00100000, 0
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(synchronize, False, parent)
+    if not handle:
+        return None
+    return lambda: kernel32.WaitForSingleObject(handle, 0) == wait_object_0
+
+
+def watch_parent(token: CancelToken, interval: float = 0.5) -> None:
+    """Hủy token khi tiến trình cha chết (ví dụ PHP hết set_time_limit)."""
+    parent_exited = _parent_exited_check(os.getppid())
+    if parent_exited is None:
+        return
+
+    def loop() -> None:
+        while not token._event.wait(interval):
+            if parent_exited():
+                token.cancel("parent exited")
+                return
+
+    threading.Thread(target=loop, name="watch-parent", daemon=True).start()
+
+
+def make_cli_token(deadline_seconds: Optional[float]) -> CancelToken:
+    """Token cho các script CLI: deadline + SIGTERM + theo dõi tiến trình cha."""
+    token = CancelToken(deadline_seconds)
+    install_signal_handlers(token)
+    watch_parent(token)
+    return token
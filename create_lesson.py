@@ -8,15 +8,28 @@ import sys
 import argparse
 from quickstart import (
     extract_video_id,
-    fetch_transcript_text,
+    fetch_transcript,
     summarize_text,
 )
+from cancellation import make_cli_token
+from inference_profile import entry_setting
+from lesson_output import FORMATS, OutputWriter
+from model_store import set_offline
+from run_journal import RunJournal
+from transcript import parse_timestamp
 
 
 def create_comprehensive_lesson(
     video_url: str,
     language: str = "en",
     output_file: str = None,
+    start: float = None,
+    end: float = None,
+    resume: str = None,
+    writer: OutputWriter = None,
+    deadline: float = None,
+    max_rss: float = None,
+    incremental: bool = False,
 ):
     """
     Tạo bài học hoàn chỉnh từ YouTube video
@@ -25,49 +38,137 @@ def create_comprehensive_lesson(
         video_url: URL hoặc ID của video YouTube
         language: Ngôn ngữ (vi hoặc en)
         output_file: File đầu ra (nếu None, in ra console)
+        start, end: Chỉ dùng đoạn transcript trong khoảng thời gian này (giây)
+        resume: RUN_ID của lần chạy bị gián đoạn cần tiếp tục
+        writer: OutputWriter khi chạy với --format json/ndjson
+        deadline: Số giây tối đa; quá hạn (hoặc nhận SIGTERM) thì dừng và trả về bài học dở dang
+        max_rss: Giới hạn bộ nhớ (MB); gần tới giới hạn thì giảm batch size
+        incremental: Chỉ tóm tắt phần transcript mới so với lần chạy trước của video này
     """
     print("=" * 70)
     print("TẠO BÀI HỌC HOÀN CHỈNH TỪ YOUTUBE VIDEO")
     print("=" * 70)
     
-    # Bước 1: Lấy video ID
-    try:
-        video_id = extract_video_id(video_url)
+    cancel = make_cli_token(deadline)
+    journal = None
+    transcript = None
+    chunk_words = None
+    if resume:
+        try:
+            journal = RunJournal.load(resume)
+        except FileNotFoundError as e:
+            print(f"✗ Lỗi: {e}")
+            return False
+        # Dùng lại đúng tham số của lần chạy cũ
+        video_id = journal.video_id
+        language = journal.params.get("language", language)
+        start = journal.params.get("start")
+        end = journal.params.get("end")
+        chunk_words = journal.params.get("chunk_words", 600)  # journal cũ luôn dùng 600
+        print(f"↺ Tiếp tục run {journal.run_id}: đã xong {journal.completed_chunks} chunk")
         print(f"✓ Video ID: {video_id}")
-    except ValueError as e:
-        print(f"✗ Lỗi: {e}")
-        return False
+        full = journal.load_transcript()
+        if full is not None:
+            transcript = full.slice_time(start, end)
+            print(f"✓ Dùng lại transcript đã lưu ({transcript.word_count} từ)")
+    else:
+        # Bước 1: Lấy video ID
+        try:
+            video_id = extract_video_id(video_url)
+            print(f"✓ Video ID: {video_id}")
+        except ValueError as e:
+            print(f"✗ Lỗi: {e}")
+            return False
     
     # Bước 2: Lấy transcript
-    print(f"⏳ Đang lấy transcript (ngôn ngữ: {language})...")
-    try:
-        transcript = fetch_transcript_text(video_id, language)
-        word_count = len(transcript.split())
-        print(f"✓ Đã lấy được {word_count} từ")
-    except Exception as e:
-        print(f"✗ Không thể lấy transcript: {e}")
-        return False
+    if transcript is None:
+        print(f"⏳ Đang lấy transcript (ngôn ngữ: {language})...")
+        try:
+            full = fetch_transcript(video_id, language)
+            transcript = full.slice_time(start, end)
+            print(f"✓ Đã lấy được {transcript.word_count} từ")
+            if start is not None or end is not None:
+                print(f"  Đoạn được dùng: {transcript.label}")
+        except Exception as e:
+            print(f"✗ Không thể lấy transcript: {e}")
+            return False
+        if journal is None:
+            # chunk_words đã autotune cho create_lesson (600 nếu chưa đo), ghi vào
+            # journal để --resume cắt chunk y như lần chạy đầu
+            chunk_words = int(entry_setting("create_lesson", "chunk_words"))
+            journal = RunJournal.create(
+                video_id,
+                {"language": language, "start": start, "end": end, "chunk_words": chunk_words},
+            )
+        journal.save_transcript(full)
+    print(f"📒 Run ID: {journal.run_id} (nếu bị gián đoạn: --resume {journal.run_id})")
+    
+    if writer:
+        writer.stage("transcript", words=transcript.word_count)
     
     # Bước 3: Tạo bài học
-    print("\n⏳ Đang tạo bài học hoàn chỉnh...")
-    print("   (Quá trình này có thể mất 5-15 phút...)\n")
+    stats = {}
+    cache = "miss"
+    if journal.result is not None:
+        cache = "resumed"
+        lesson = journal.result
+        print("\n✓ Bài học đã được tạo xong ở lần chạy trước")
+    else:
+        print("\n⏳ Đang tạo bài học hoàn chỉnh...")
+        print("   (Quá trình này có thể mất 5-15 phút...)\n")
+        
+        stream = None
+        if incremental:
+            from incremental import StreamState
+
+            stream = StreamState.open(video_id, language, "local")
+        try:
+            lesson = summarize_text(
+                transcript,
+                model_name="sshleifer/distilbart-cnn-12-6",
+                min_length=150,
+                max_length=400,
+                chunk_words=chunk_words,
+                combine=True,
+                mode="lesson",
+                language=language,
+                stats=stats,
+                journal=journal,
+                cancel=cancel,
+                max_rss_mb=max_rss,
+                incremental=stream,
+            )
+        except Exception as e:
+            print(f"✗ Lỗi khi tạo bài học: {e}")
+            print(f"  Chạy lại với --resume {journal.run_id} để tiếp tục")
+            return False
+        if stats.get("cancelled"):
+            print(f"\n⚠ Bài học chưa hoàn chỉnh (dừng do: {stats['cancelled']})")
+            print(f"  Chạy lại với --resume {journal.run_id} để làm tiếp")
+            if not lesson:
+                return False
+        elif stats.get("failed_sections"):
+            # Không lưu kết quả cuối: --resume sẽ tạo lại các phần bị lỗi
+            print(f"\n⚠ Một số phần bị lỗi: {', '.join(stats['failed_sections'])}")
+            print(f"  Chạy lại với --resume {journal.run_id} để tạo lại các phần này")
+        else:
+            journal.record_result(lesson)
+    if writer:
+        writer.stage("summarize")
     
-    try:
-        lesson = summarize_text(
-            transcript,
-            model_name="sshleifer/distilbart-cnn-12-6",
-            min_length=150,
-            max_length=400,
-            chunk_words=600,
-            combine=True,
-            mode="lesson",
+    # Bước 4: Lưu hoặc in kết quả
+    if writer and writer.structured:
+        writer.result(
+            lesson,
+            video_id=video_id,
             language=language,
+            backend="local",
+            stages=stats,
+            cache=cache,
+            run_id=journal.run_id,
+            partial=bool(stats.get("cancelled") or stats.get("failed_sections")),
+            cancelled=stats.get("cancelled"),
         )
-    except Exception as e:
-        print(f"✗ Lỗi khi tạo bài học: {e}")
-        return False
-    
-    # Bước 4: Lưu hoặc in kết quả
     if output_file:
         try:
             with open(output_file, "w", encoding="utf-8") as f:
@@ -80,7 +181,7 @@ def create_comprehensive_lesson(
         except Exception as e:
             print(f"✗ Không thể lưu file: {e}")
             return False
-    else:
+    elif not (writer and writer.structured):
         print("\n" + "=" * 70)
         print("BÀI HỌC HOÀN CHỈNH")
         print("=" * 70 + "\n")
@@ -95,7 +196,6 @@ def main():
     )
     parser.add_argument(
         "--url",
-        required=True,
         help="URL hoặc ID của video YouTube"
     )
     parser.add_argument(
@@ -108,14 +208,72 @@ def main():
         "--output", "-o",
         help="File đầu ra (nếu không chỉ định, in ra console)"
     )
+    parser.add_argument(
+        "--start",
+        type=parse_timestamp,
+        help="Bắt đầu từ mốc thời gian này (giây, mm:ss hoặc h:mm:ss)"
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_timestamp,
+        help="Kết thúc tại mốc thời gian này (giây, mm:ss hoặc h:mm:ss)"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Tiếp tục lần chạy bị gián đoạn (RUN_ID được in ra khi bắt đầu chạy)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="text = in ra console, json/ndjson = kết quả có cấu trúc trên stdout, tiến trình ra stderr"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="Số giây tối đa, quá hạn thì dừng và trả về bài học dở dang"
+    )
+    parser.add_argument(
+        "--max-rss",
+        type=float,
+        metavar="MB",
+        help="Giới hạn bộ nhớ (MB): gần tới giới hạn thì giảm batch size"
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Không kết nối Hugging Face Hub, chỉ dùng model đã prefetch (python model_store.py prefetch)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Transcript còn dài ra (VOD livestream): chỉ tóm tắt phần mới so với lần chạy trước (xem incremental.py)"
+    )
     
     args = parser.parse_args()
+    if not args.url and not args.resume:
+        parser.error("cần --url hoặc --resume RUN_ID")
     
-    success = create_comprehensive_lesson(
-        args.url,
-        args.language,
-        args.output
-    )
+    if args.offline:
+        set_offline()
+    
+    writer = OutputWriter(args.format)
+    with writer.progress_to_stderr():
+        success = create_comprehensive_lesson(
+            args.url,
+            args.language,
+            args.output,
+            start=args.start,
+            end=args.end,
+            resume=args.resume,
+            writer=writer,
+            deadline=args.deadline,
+            max_rss=args.max_rss,
+            incremental=args.incremental,
+        )
+    if not success:
+        writer.error("Lesson generation failed (see stderr)")
     
     sys.exit(0 if success else 1)
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Chọn "bằng chứng" (câu ghi chú) riêng cho từng phần của bài học.
+
+Trước đây mỗi template được format với toàn bộ combined_notes rồi tokenizer
+cắt ở model_max_length, nên phần nào cũng chỉ thấy đầu bài giảng. Ở đây:
+- Mỗi câu ghi chú được đếm token đúng một lần.
+- Mỗi phần (objectives, concepts, steps, examples, ...) chấm điểm câu theo
+  từ khóa gợi ý riêng + độ "trung tâm" (từ xuất hiện nhiều trong bài).
+- Câu được chọn xoay vòng theo từng chunk gốc để phủ toàn bộ bài giảng, dừng
+  khi hết ngân sách token, rồi giữ lại thứ tự xuất hiện ban đầu.
+
+extract_key_points (chấm điểm câu của transcript theo từ khóa) cũng nằm ở đây
+để cả đường Gemini lẫn đường model local dùng chung.
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Từ khóa gợi ý cho từng phần (en + vi), so khớp trên chữ thường
+SECTION_CUES: Dict[str, Tuple[str, ...]] = {
+    "title": (),
+    "objectives": (
+        "learn", "understand", "able to", "how to", "goal", "objective", "will",
+        "mục tiêu", "hiểu", "học", "nắm được", "biết cách",
+    ),
+    "concepts": (
+        " is a ", " are ", "means", "refers to", "defined", "definition", "called",
+        "concept", "known as", " là ", "nghĩa là", "khái niệm", "định nghĩa", "gọi là",
+    ),
+    "steps": (
+        "first", "second", "third", "then", "next", "finally", "step", "after",
+        "before", "once", "bước", "đầu tiên", "thứ hai", "tiếp theo", "sau đó",
+        "cuối cùng", "trước khi",
+    ),
+    "examples": (
+        "example", "for instance", "such as", "e.g.", "code", "function", "import ",
+        "def ", "()", " = ", "{", "case study", "ví dụ", "chẳng hạn", "minh họa",
+    ),
+    "summary": (
+        "important", "key", "remember", "main", "in summary", "overall",
+        "quan trọng", "chính", "cần nhớ", "tóm lại", "tổng kết",
+    ),
+    "questions": (
+        "why", "how", "because", "difference", "compare", "when to",
+        "tại sao", "vì", "như thế nào", "khác nhau", "so sánh",
+    ),
+}
+
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have in is it its of on or that
+    the this to was were will with you your we they can do not so if
+    và là của có cho được này những các một không thì với trong khi đã sẽ
+    """.split()
+)
+
+
+def _content_words(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 1]
+
+
+def _centrality_scores(units: Sequence[str]) -> List[float]:
+    """Điểm 0..1: câu chứa nhiều từ xuất hiện ở nhiều câu khác thì "trung tâm" hơn."""
+    bags = [set(_content_words(u)) for u in units]
+    df = Counter(w for bag in bags for w in bag)
+    raw = [sum(df[w] - 1 for w in bag) / (len(bag) or 1) for bag in bags]
+    top = max(raw, default=0.0) or 1.0
+    return [r / top for r in raw]
+
+
+def _cue_hits(text: str, cues: Sequence[str]) -> int:
+    lower = f" {text.lower()} "
+    return sum(1 for cue in cues if cue in lower)
+
+
+def select_section_evidence(
+    units: Sequence[Tuple[int, str]],
+    token_counts: Sequence[int],
+    budgets: Dict[str, int],
+) -> Dict[str, str]:
+    """
+    units: danh sách (chỉ số chunk gốc, câu ghi chú) theo thứ tự bài giảng
+    token_counts: số token của từng câu (đếm sẵn một lần)
+    budgets: ngân sách token cho phần ghi chú của từng section
+
+    Trả về {section: ghi chú đã chọn} để format vào template.
+    """
+    texts = [u for _, u in units]
+    centrality = _centrality_scores(texts)
+    evidence: Dict[str, str] = {}
+    for section, budget in budgets.items():
+        cues = SECTION_CUES.get(section, ())
+        scored = [
+            (_cue_hits(text, cues) * 2.0 + centrality[i], i)
+            for i, text in enumerate(texts)
+        ]
+        # Câu có từ khóa của section được ưu tiên, sau đó mới tới câu "trung tâm"
+        tiers = [
+            [item for item in scored if item[0] >= 2.0],
+            [item for item in scored if item[0] < 2.0],
+        ]
+        chosen: List[int] = []
+        used = 0
+        for tier in tiers:
+            used = _round_robin_fill(tier, units, token_counts, budget, used, chosen)
+        chosen.sort()
+        evidence[section] = " ".join(texts[i] for i in chosen)
+    return evidence
+
+
+def _round_robin_fill(
+    scored: List[Tuple[float, int]],
+    units: Sequence[Tuple[int, str]],
+    token_counts: Sequence[int],
+    budget: int,
+    used: int,
+    chosen: List[int],
+) -> int:
+    """Lấy lần lượt câu tốt nhất của từng chunk để bằng chứng phủ cả bài giảng."""
+    by_chunk: Dict[int, List[Tuple[float, int]]] = {}
+    for score, i in scored:
+        by_chunk.setdefault(units[i][0], []).append((score, i))
+    queues = [sorted(items, reverse=True) for items in by_chunk.values()]
+    queues.sort(key=lambda q: q[0][0], reverse=True)
+    while queues and used < budget:
+        remaining = []
+        for queue in queues:
+            score, i = queue.pop(0)
+            cost = token_counts[i]
+            if used + cost <= budget:
+                chosen.append(i)
+                used += cost
+            if queue:
+                remaining.append(queue)
+        queues = remaining
+    return used
+
+
+def split_note_units(summaries: Sequence[str], splitter: Callable[[str], List[str]]) -> List[Tuple[int, str]]:
+    """Tách ghi chú của từng chunk thành câu, giữ lại chỉ số chunk gốc."""
+    units: List[Tuple[int, str]] = []
+    for idx, block in enumerate(summaries):
+        for unit in splitter(block):
+            unit = unit.strip(" -*•\t")
+            if unit:
+                units.append((idx, unit))
+    return units
+
+
+def score_sentences(transcript: str) -> List[Tuple[int, str]]:
+    """Chia transcript thành câu và chấm điểm từng câu (theo thứ tự xuất hiện)."""
+    # Chia thành câu
+    sentences = re.split(r'[.!?]+', transcript)
+    sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+    
+    # Lọc những từ khóa quan trọng
+    important_keywords = [
+        'important', 'key', 'main', 'essential', 'critical', 'must', 'should',
+        'step', 'first', 'second', 'next', 'then', 'finally',
+        'example', 'for instance', 'such as', 'like',
+        'because', 'reason', 'why', 'how', 'what', 'when', 'where',
+        'define', 'definition', 'means', 'refers to',
+        'remember', 'note', 'tip', 'trick', 'advice',
+        'quan trọng', 'chính', 'cần', 'phải', 'nên',
+        'bước', 'đầu tiên', 'thứ hai', 'tiếp theo', 'cuối cùng',
+        'ví dụ', 'chẳng hạn', 'như',
+        'vì', 'tại sao', 'như thế nào', 'cái gì', 'khi nào',
+        'định nghĩa', 'có nghĩa là', 'đề cập đến',
+        'lưu ý', 'mẹo', 'lời khuyên'
+    ]
+    
+    # Tính điểm cho mỗi câu
+    scored_sentences = []
+    for sentence in sentences:
+        score = 0
+        lower_sent = sentence.lower()
+        
+        # Điểm dựa trên từ khóa
+        for keyword in important_keywords:
+            if keyword in lower_sent:
+                score += 1
+        
+        # Điểm dựa trên độ dài (ưu tiên câu trung bình)
+        word_count = len(sentence.split())
+        if 10 <= word_count <= 40:
+            score += 2
+        elif word_count < 10:
+            score -= 1
+        
+        # Điểm dựa trên có số (có thể là steps, data)
+        if re.search(r'\d+', sentence):
+            score += 1
+        
+        scored_sentences.append((score, sentence))
+    return scored_sentences
+
+
+def top_sentences(scored_sentences: List[Tuple[int, str]], max_points: int) -> List[Tuple[int, str]]:
+    """
+    max_points câu điểm cao nhất (cùng điểm thì câu xuất hiện trước đứng trước).
+    Vì sort ổn định, top của (top phần đầu + câu của phần mới) giống top của cả
+    transcript, nên chế độ incremental chỉ cần giữ lại danh sách này.
+    """
+    return sorted(scored_sentences, reverse=True, key=lambda x: x[0])[:max_points]
+
+
+def extract_key_points(
+    transcript: str,
+    max_points: int = 50,
+    earlier: Optional[List[Tuple[int, str]]] = None,
+) -> List[str]:
+    """
+    Trích xuất key points từ transcript
+    Chia transcript thành các câu và lọc những câu quan trọng
+
+    earlier -> top_sentences của phần transcript đứng trước (incremental),
+    `transcript` khi đó chỉ là phần mới.
+    """
+    print("🔍 Đang trích xuất key points chi tiết...")
+    
+    # Sắp xếp theo điểm và lấy top
+    top = top_sentences((earlier or []) + score_sentences(transcript), max_points)
+    key_points = [sent for score, sent in top if score > 0]
+    
+    print(f"✅ Đã trích xuất {len(key_points)} key points\n")
+    return key_points
@@ -8,19 +8,28 @@ Tạo bài học hoàn chỉnh từ YouTube bằng Gemini API
 
 import os
 import sys
+import time
 import argparse
 import re
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 try:
-    from youtube_transcript_api import YouTubeTranscriptApi
     import google.generativeai as genai
 except ImportError:
     print("❌ Thiếu thư viện! Cài đặt bằng lệnh:")
     print("pip install youtube-transcript-api google-generativeai")
     sys.exit(1)
 
+from backends import is_transient_error
+from cancellation import CancelToken
+from evidence import extract_key_points
+from lesson_output import FORMATS, OutputWriter
+from replay import generate_content
+from transcript import parse_timestamp
+from transcript_fetcher import get_fetcher
+
 
 # ============================================================================
 # CẤU HÌNH API KEY MẶC ĐỊNH
@@ -63,97 +72,207 @@ def extract_video_id(url_or_id: str) -> str:
     raise ValueError("Không thể trích xuất video ID từ URL")
 
 
-def get_transcript(video_id: str, language: str = "en") -> str:
-    """Lấy transcript từ YouTube"""
+def get_transcript(
+    video_id: str,
+    language: str = "en",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> str:
+    """Lấy transcript từ YouTube (có thể chỉ lấy đoạn [start, end) tính bằng giây)"""
     print(f"📹 Video ID: {video_id}")
     print(f"🌐 Đang lấy transcript (ngôn ngữ: {language})...")
     
-    langs = []
-    if language.startswith("vi"):
-        langs = ["vi", "vi-VN", "en", "en-US"]
-    else:
-        langs = ["en", "en-US", "en-GB", "vi", "vi-VN"]
-    
     try:
-        api = YouTubeTranscriptApi()
-        fetched = api.fetch(video_id, languages=langs)
-        raw_entries = fetched.to_raw_data()
-        text = " ".join(e.get("text", "") for e in raw_entries if e.get("text"))
-        text = re.sub(r"\s+", " ", text).strip()
+        # Session HTTP dùng chung + một lần gọi list() (xem transcript_fetcher.py)
+        span = get_fetcher().fetch(video_id, language).slice_time(start, end)
+        text = span.text
         
-        word_count = len(text.split())
-        print(f"✅ Đã lấy được {word_count} từ\n")
+        print(f"✅ Đã lấy được {span.word_count} từ")
+        if start is not None or end is not None:
+            print(f"   Đoạn được dùng: {span.label}")
+        print()
         return text
     except Exception as e:
         raise RuntimeError(f"Không thể lấy transcript: {e}")
 
 
-def extract_key_points(transcript: str, max_points: int = 50) -> List[str]:
+def _check_cancelled(cancel: Optional[CancelToken]) -> None:
+    """Dừng giữa các bước nếu job đã bị hủy / quá deadline."""
+    if cancel is not None and cancel.should_stop:
+        raise RuntimeError(f"Đã dừng ({cancel.reason})")
+
+
+def _request_options(cancel: Optional[CancelToken]) -> Optional[Dict]:
+    """Timeout của request = thời gian còn lại tới deadline (nếu có)."""
+    if cancel is None:
+        return None
+    _check_cancelled(cancel)
+    remaining = cancel.remaining()
+    return {"timeout": max(1.0, remaining)} if remaining is not None else None
+
+
+# (khóa, heading, yêu cầu) theo đúng thứ tự các phần của prompt một lần gọi
+LESSON_SECTIONS_VI = [
+    ("title", "# 📚", "Tạo tiêu đề bài học hấp dẫn, súc tích. Chỉ trả về đúng một dòng tiêu đề."),
+    ("objectives", "## 🎯 MỤC TIÊU HỌC TẬP", "Liệt kê 4-6 mục tiêu cụ thể mà người học sẽ đạt được."),
+    ("concepts", "## 💡 CÁC KHÁI NIỆM CHÍNH", "Giải thích chi tiết các khái niệm quan trọng, có định nghĩa, ví dụ minh họa."),
+    ("content", "## 📝 NỘI DUNG CHI TIẾT", (
+        "Trình bày nội dung theo từng phần logic, có thể chia thành các mục con (### Phần 1, ### Phần 2, ...). "
+        "Giữ đầy đủ thông tin kỹ thuật, code, công thức nếu có."
+    )),
+    ("examples", "## 🔍 VÍ DỤ MINH HỌA", "Đưa ra các ví dụ cụ thể, dễ hiểu để minh họa các khái niệm."),
+    ("steps", "## 📋 CÁC BƯỚC THỰC HIỆN", (
+        "Nếu video có hướng dẫn thực hành, liệt kê chi tiết từng bước. "
+        "Nếu không có, ghi một dòng ngắn rằng video không có phần thực hành."
+    )),
+    ("tips", "## 💡 TIPS & LƯU Ý", "Các mẹo, best practices, điều cần tránh."),
+    ("summary", "## 📌 TÓM TẮT", "Tóm tắt 5-7 điểm chính cần nhớ."),
+    ("questions", "## ❓ CÂU HỎI ÔN TẬP", "5-7 câu hỏi giúp người học kiểm tra kiến thức."),
+]
+
+LESSON_SECTIONS_EN = [
+    ("title", "# 📚", "Create an engaging, concise lesson title. Return only the title, on one line."),
+    ("objectives", "## 🎯 LEARNING OBJECTIVES", "List 4-6 specific objectives learners will achieve."),
+    ("concepts", "## 💡 KEY CONCEPTS", "Explain important concepts in detail with definitions and examples."),
+    ("content", "## 📝 DETAILED CONTENT", (
+        "Present the content in logical sections, with subsections if useful (### Part 1, ### Part 2, ...). "
+        "Keep all technical information, code, formulas if any."
+    )),
+    ("examples", "## 🔍 EXAMPLES", "Provide specific, easy-to-understand examples to illustrate the concepts."),
+    ("steps", "## 📋 STEP-BY-STEP GUIDE", (
+        "If the video has practical instructions, list detailed steps. "
+        "If not, write one short line saying the video has no practical part."
+    )),
+    ("tips", "## 💡 TIPS & NOTES", "Tips, best practices, common mistakes to avoid."),
+    ("summary", "## 📌 SUMMARY", "Summarize 5-7 key takeaways."),
+    ("questions", "## ❓ REVIEW QUESTIONS", "5-7 questions to help learners test their knowledge."),
+]
+
+
+def _section_prompt(heading: str, instruction: str, key_points_text: str, language: str) -> str:
+    if language.startswith("vi"):
+        return f"""
+Bạn là một chuyên gia giáo dục. Từ các key points được trích xuất từ một video YouTube,
+hãy viết MỘT PHẦN của bài học bằng tiếng Việt: "{heading.lstrip('# ')}".
+
+Yêu cầu: {instruction}
+Chỉ trả về nội dung của phần này, không lặp lại heading, không viết các phần khác.
+Giữ nguyên các thuật ngữ kỹ thuật quan trọng.
+
+KEY POINTS TỪ VIDEO:
+{key_points_text}
+"""
+    return f"""
+You are an expert educator. From the key points extracted from a YouTube video,
+write ONE SECTION of a lesson in English: "{heading.lstrip('# ')}".
+
+Task: {instruction}
+Return only the content of this section, without repeating the heading or writing other sections.
+Keep important technical terms.
+
+KEY POINTS FROM VIDEO:
+{key_points_text}
+"""
+
+
+def _strip_leading_headings(text: str) -> str:
+    lines = text.strip().splitlines()
+    while lines and (lines[0].lstrip().startswith("#") or not lines[0].strip()):
+        lines.pop(0)
+    return "\n".join(lines).strip()
+
+
+def _generate_sections(
+    model,
+    key_points_text: str,
+    language: str,
+    cancel: Optional[CancelToken],
+    workers: int,
+    retries: int,
+    stats: Optional[Dict] = None,
+) -> str:
     """
-    Trích xuất key points từ transcript
-    Chia transcript thành các câu và lọc những câu quan trọng
+    Gửi song song mỗi phần bài học một request (cùng key points), phần nào bị
+    rate limit / lỗi tạm thời thì thử lại riêng phần đó; ghép kết quả theo thứ
+    tự heading cố định. Phần vẫn lỗi được đánh dấu trong bài học và ghi vào
+    stats["failed_sections"]; chỉ khi mọi phần đều lỗi mới raise.
     """
-    print("🔍 Đang trích xuất key points chi tiết...")
-    
-    # Chia thành câu
-    sentences = re.split(r'[.!?]+', transcript)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
-    
-    # Lọc những từ khóa quan trọng
-    important_keywords = [
-        'important', 'key', 'main', 'essential', 'critical', 'must', 'should',
-        'step', 'first', 'second', 'next', 'then', 'finally',
-        'example', 'for instance', 'such as', 'like',
-        'because', 'reason', 'why', 'how', 'what', 'when', 'where',
-        'define', 'definition', 'means', 'refers to',
-        'remember', 'note', 'tip', 'trick', 'advice',
-        'quan trọng', 'chính', 'cần', 'phải', 'nên',
-        'bước', 'đầu tiên', 'thứ hai', 'tiếp theo', 'cuối cùng',
-        'ví dụ', 'chẳng hạn', 'như',
-        'vì', 'tại sao', 'như thế nào', 'cái gì', 'khi nào',
-        'định nghĩa', 'có nghĩa là', 'đề cập đến',
-        'lưu ý', 'mẹo', 'lời khuyên'
-    ]
-    
-    # Tính điểm cho mỗi câu
-    scored_sentences = []
-    for sentence in sentences:
-        score = 0
-        lower_sent = sentence.lower()
-        
-        # Điểm dựa trên từ khóa
-        for keyword in important_keywords:
-            if keyword in lower_sent:
-                score += 1
-        
-        # Điểm dựa trên độ dài (ưu tiên câu trung bình)
-        word_count = len(sentence.split())
-        if 10 <= word_count <= 40:
-            score += 2
-        elif word_count < 10:
-            score -= 1
-        
-        # Điểm dựa trên có số (có thể là steps, data)
-        if re.search(r'\d+', sentence):
-            score += 1
-        
-        scored_sentences.append((score, sentence))
-    
-    # Sắp xếp theo điểm và lấy top
-    scored_sentences.sort(reverse=True, key=lambda x: x[0])
-    key_points = [sent for score, sent in scored_sentences[:max_points] if score > 0]
-    
-    print(f"✅ Đã trích xuất {len(key_points)} key points\n")
-    return key_points
+    sections = LESSON_SECTIONS_VI if language.startswith("vi") else LESSON_SECTIONS_EN
+    failed_note = (
+        "_(Không tạo được phần này: {error})_" if language.startswith("vi")
+        else "_(This section could not be generated: {error})_"
+    )
+
+    def generate_one(heading: str, instruction: str) -> str:
+        prompt = _section_prompt(heading, instruction, key_points_text, language)
+        for attempt in range(retries + 1):
+            try:
+                response = generate_content(model, prompt, request_options=_request_options(cancel))
+                return _strip_leading_headings(response.text)
+            except Exception as e:
+                if (
+                    attempt == retries
+                    or (cancel is not None and cancel.should_stop)
+                    or not is_transient_error(f"{type(e).__name__}: {e}")
+                ):
+                    raise
+                time.sleep(min(8.0, 2.0 ** attempt))  # lùi dần khi bị rate limit
+        return ""
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sections)))) as pool:
+        futures = [
+            (key, heading, pool.submit(generate_one, heading, instruction))
+            for key, heading, instruction in sections
+        ]
+        parts: List[str] = []
+        errors: List[str] = []
+        for key, heading, future in futures:
+            try:
+                body = future.result()
+                print(f"   ✓ {key}")
+                if key == "title":
+                    body = body.splitlines()[0].strip("*_-# ") if body else ""
+            except Exception as e:
+                # Giữ các phần đã xong, đánh dấu phần lỗi thay vì bỏ cả bài học
+                error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                errors.append(f"{key}: {error}")
+                print(f"   ✗ {key}: {error}")
+                if stats is not None:
+                    stats.setdefault("failed_sections", []).append(key)
+                body = failed_note.format(error=error)
+            if key == "title":
+                parts.append(f"{heading} {body}".rstrip())
+            else:
+                parts.append(f"{heading}\n{body}")
+    if len(errors) == len(sections):
+        raise RuntimeError("; ".join(errors))
+    if stats is not None and errors:
+        stats["section_errors"] = errors
+    print(f"   ⏱ {len(sections)} sections in {time.perf_counter() - started:.1f}s")
+    return "\n\n".join(parts)
 
 
 def generate_lesson_with_gemini(
     video_title: str,
     key_points: List[str],
     language: str,
-    api_key: str
+    api_key: str,
+    cancel: Optional[CancelToken] = None,
+    sections: str = "single",
+    workers: int = 9,
+    retries: int = 2,
+    stats: Optional[Dict] = None,
 ) -> str:
-    """Generate bài học hoàn chỉnh bằng Gemini API"""
+    """
+    Generate bài học hoàn chỉnh bằng Gemini API
+
+    cancel: nếu có deadline, thời gian còn lại được dùng làm timeout của request
+    sections: "single" = một prompt cho cả bài học (như cũ), "parallel" = mỗi
+    phần một request chạy song song (tối đa `workers` request cùng lúc), phần
+    lỗi tạm thời được thử lại tối đa `retries` lần; thời gian chờ bằng phần chậm nhất.
+    Phần vẫn lỗi được đánh dấu trong bài học và ghi vào stats["failed_sections"].
+    """
     
     print("🤖 Đang kết nối với Gemini AI...")
     
@@ -164,6 +283,18 @@ def generate_lesson_with_gemini(
     # Chuẩn bị key points
     key_points_text = "\n".join([f"- {point}" for point in key_points])
     
+    if sections == "parallel":
+        print("✨ Đang tạo từng phần bài học song song với Gemini AI...")
+        try:
+            lesson = _generate_sections(model, key_points_text, language, cancel, workers, retries, stats)
+        except Exception as e:
+            raise RuntimeError(f"Lỗi khi gọi Gemini API: {e}")
+        if stats and stats.get("failed_sections"):
+            print(f"⚠ Bài học thiếu {len(stats['failed_sections'])} phần: {', '.join(stats['failed_sections'])}\n")
+        else:
+            print("✅ Đã tạo bài học thành công!\n")
+        return lesson
+    
     # Tạo prompt
     if language.startswith("vi"):
         prompt = f"""
@@ -255,8 +386,11 @@ The lesson must be COMPLETE so readers can learn WITHOUT WATCHING THE VIDEO.
     print("✨ Đang tạo bài học với Gemini AI...")
     print("   (Quá trình này mất 10-30 giây...)\n")
     
+    request_options = _request_options(cancel)
+    
     try:
-        response = model.generate_content(prompt)
+        # LESSON_REPLAY=record/replay: ghi lại hoặc phát lại response (xem replay.py)
+        response = generate_content(model, prompt, request_options=request_options)
         lesson = response.text
         print("✅ Đã tạo bài học thành công!\n")
         return lesson
@@ -292,9 +426,54 @@ def main():
         default=50,
         help="Số lượng key points tối đa (mặc định: 50)"
     )
+    parser.add_argument(
+        "--start",
+        type=parse_timestamp,
+        help="Chỉ dùng transcript từ mốc này (giây, mm:ss hoặc h:mm:ss)"
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_timestamp,
+        help="Chỉ dùng transcript đến mốc này (giây, mm:ss hoặc h:mm:ss)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="text = in ra terminal như cũ, json/ndjson = kết quả có cấu trúc trên stdout, tiến trình ra stderr"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="Số giây tối đa cho cả lần chạy (dùng làm timeout của request Gemini)"
+    )
+    parser.add_argument(
+        "--sections",
+        choices=["single", "parallel"],
+        default="single",
+        help="single = một request cho cả bài học, parallel = mỗi phần một request chạy song song (nhanh hơn)"
+    )
+    parser.add_argument(
+        "--section-workers",
+        type=int,
+        default=9,
+        help="Số request Gemini chạy cùng lúc với --sections parallel (giảm nếu hay bị rate limit)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Transcript còn dài ra (VOD livestream): chỉ xử lý phần mới so với lần chạy trước (xem incremental.py)"
+    )
     
     args = parser.parse_args()
+    writer = OutputWriter(args.format)
     
+    # Ở chế độ --format json/ndjson, tiến trình đi ra stderr, stdout chỉ có kết quả
+    with writer.progress_to_stderr():
+        return _run(args, writer)
+
+
+def _run(args: argparse.Namespace, writer: OutputWriter) -> int:
     # Lấy API key theo thứ tự ưu tiên:
     # 1. Từ tham số --api-key
     # 2. Từ biến môi trường GEMINI_API_KEY
@@ -310,6 +489,7 @@ def main():
         print("\nCách 3: Set biến môi trường:")
         print('  set GEMINI_API_KEY=your_key_here')
         print("\nLấy API key miễn phí tại: https://makersuite.google.com/app/apikey")
+        writer.error("Missing Gemini API key")
         sys.exit(1)
     
     print("=" * 70)
@@ -317,32 +497,63 @@ def main():
     print("=" * 70)
     print()
     
+    # Chỉ dùng deadline: request Gemini là một lời gọi chặn, SIGTERM vẫn kết thúc process như cũ
+    cancel = CancelToken(args.deadline)
+    video_id = ""
     try:
         # Bước 1: Lấy video ID
         video_id = extract_video_id(args.url)
         
         # Bước 2: Lấy transcript
-        transcript = get_transcript(video_id, args.language)
+        transcript = get_transcript(video_id, args.language, args.start, args.end)
+        writer.stage("transcript", words=len(transcript.split()))
+        _check_cancelled(cancel)
         
-        # Bước 3: Trích xuất key points
-        key_points = extract_key_points(transcript, args.max_points)
+        # Bước 3: Trích xuất key points (--incremental: chỉ chấm điểm câu mới)
+        if args.incremental:
+            from incremental import StreamState
+
+            state = StreamState.open(video_id, args.language, "gemini")
+            state.bind({"max_points": args.max_points, "start": args.start, "end": args.end})
+            key_points = state.key_points(transcript, args.max_points)
+        else:
+            key_points = extract_key_points(transcript, args.max_points)
+        writer.stage("key_points", count=len(key_points))
         
         # Bước 4: Generate bài học với Gemini
+        stats: Dict = {}
         lesson = generate_lesson_with_gemini(
             video_title="",
             key_points=key_points,
             language=args.language,
-            api_key=api_key
+            api_key=api_key,
+            cancel=cancel,
+            sections=args.sections,
+            workers=args.section_workers,
+            stats=stats,
         )
+        writer.stage("generate", sections=args.sections)
         
         # Bước 5: Hiển thị và lưu kết quả
-        print("=" * 70)
-        print("BÀI HỌC HOÀN CHỈNH")
-        print("=" * 70)
-        print()
-        print(lesson)
-        print()
-        print("=" * 70)
+        if writer.structured:
+            writer.result(
+                lesson,
+                video_id=video_id,
+                language=args.language,
+                backend="gemini",
+                cache="miss",
+                partial=bool(stats.get("failed_sections")),
+                failed_sections=stats.get("failed_sections"),
+                section_errors=stats.get("section_errors"),
+            )
+        else:
+            print("=" * 70)
+            print("BÀI HỌC HOÀN CHỈNH")
+            print("=" * 70)
+            print()
+            print(lesson)
+            print()
+            print("=" * 70)
         
         # Lưu file nếu được chỉ định
         if args.output:
@@ -354,6 +565,7 @@ def main():
         
     except Exception as e:
         print(f"\n❌ Lỗi: {e}")
+        writer.error(str(e), video_id=video_id)
         return 1
 
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tóm tắt tăng dần (incremental) cho transcript còn đang dài ra, vd. VOD của livestream.
+
+Mỗi video (+ ngôn ngữ, backend) có một file runs/streams/<video>__<lang>__<kind>.json
+nhớ phần đầu transcript đã xử lý:
+- local  (summarize_text): tóm tắt của từng chunk đã xong, theo dải snippet
+- gemini (gemini_lesson) : các câu key point ứng viên tốt nhất, tới dấu chấm câu cuối
+
+Lần chạy sau chỉ xử lý phần mới nối thêm vào cuối rồi làm lại bước cuối
+(combine / bài học), nên chi phí tăng theo phần mới chứ không theo cả buổi live.
+Phần đầu được kiểm tra bằng fingerprint: nếu caption cũ bị sửa, hoặc đổi cài
+đặt (model, chunk_words, ...), state cũ bị bỏ và chạy lại từ đầu.
+
+Chunk cuối có thể bị cắt ngắn vì transcript hết giữa chừng, nên nó luôn được
+tóm tắt lại ở lần sau (trừ khi đã đủ chunk_words từ). Với --chunking topics,
+phần mới được chia chủ đề riêng, tính từ cuối chunk đã xong.
+
+Usage:
+  python quickstart.py --url URL --incremental
+  python gemini_lesson.py --url URL --incremental
+  python incremental.py list
+  python incremental.py reset VIDEO_ID
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from evidence import extract_key_points, score_sentences, top_sentences
+from transcript import TranscriptSpan
+
+
+DEFAULT_STREAMS_DIR = os.path.join("runs", "streams")
+
+# Cùng cách tách câu với evidence.score_sentences
+_SENTENCE_END_RE = re.compile(r"[.!?]+")
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class StreamState:
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except ValueError:
+                self.data = {}  # file hỏng -> coi như chưa có, lần này chạy lại từ đầu
+
+    @classmethod
+    def open(
+        cls,
+        video_id: str,
+        language: Optional[str],
+        kind: str,
+        streams_dir: str = DEFAULT_STREAMS_DIR,
+    ) -> "StreamState":
+        return cls(os.path.join(streams_dir, f"{video_id}__{language or 'any'}__{kind}.json"))
+
+    def bind(self, settings: Dict) -> None:
+        """Chỉ dùng lại state được tạo với đúng các cài đặt này."""
+        settings = json.loads(json.dumps(settings))
+        if self.data and self.data.get("settings") != settings:
+            print("↺ Incremental: settings changed, starting over")
+            self.data = {}
+        self.data["settings"] = settings
+
+    # ---------- summarize_text: tóm tắt từng chunk ----------
+    def resume_chunks(self, span: TranscriptSpan) -> Tuple[List[Tuple[str, TranscriptSpan]], TranscriptSpan]:
+        """
+        Trả về (các chunk đã xong [(summary, span)], phần còn phải tóm tắt).
+        Không dùng được state cũ thì phần còn lại là cả span.
+        """
+        chunks = self.data.get("chunks") or []
+        if not chunks:
+            return [], span
+        transcript = span.transcript
+        lo, hi = self.data.get("lo"), self.data.get("hi", 0)
+        if lo != span.lo or hi > span.hi or _fingerprint(TranscriptSpan(transcript, lo, hi).text) != self.data.get("prefix"):
+            print("↺ Incremental: earlier transcript changed, starting over")
+            self.data.pop("chunks", None)
+            return [], span
+        kept = [chunk for chunk in chunks if chunk.get("closed")]
+        done = [(chunk["summary"], TranscriptSpan(transcript, chunk["lo"], chunk["hi"])) for chunk in kept]
+        rest = TranscriptSpan(transcript, kept[-1]["hi"] if kept else span.lo, span.hi)
+        print(
+            f"⏩ Incremental: reusing {len(done)} chunk summaries "
+            f"({span.word_count - rest.word_count} words), {rest.word_count} new words"
+        )
+        return done, rest
+
+    def save_chunks(
+        self,
+        span: TranscriptSpan,
+        chunks: List[Tuple[str, TranscriptSpan]],
+        chunk_words: int,
+        chunking: str,
+    ) -> None:
+        """
+        Lưu các chunk đã tóm tắt (liên tiếp từ đầu span). Chunk chạm cuối
+        transcript là "mở": lần sau tóm tắt lại, vì phần mới có thể nối vào nó.
+        """
+        records = []
+        expected = span.lo
+        for summary, chunk in chunks:
+            if chunk.lo != expected:
+                break  # bị dừng giữa chừng -> chỉ giữ phần liên tiếp
+            at_end = chunk.hi >= span.hi
+            records.append({
+                "lo": chunk.lo,
+                "hi": chunk.hi,
+                "summary": summary,
+                "closed": not (at_end and (chunking != "words" or chunk.word_count < chunk_words)),
+            })
+            expected = chunk.hi
+        if not records:
+            return
+        self.data.update({
+            "lo": span.lo,
+            "hi": expected,
+            "prefix": _fingerprint(TranscriptSpan(span.transcript, span.lo, expected).text),
+            "chunks": records,
+        })
+        self.save()
+
+    # ---------- gemini: key point ứng viên ----------
+    def resume_key_points(self, text: str) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Trả về (ứng viên đã chấm điểm của phần đầu, vị trí ký tự bắt đầu phần mới).
+        """
+        consumed = self.data.get("consumed", 0)
+        candidates = self.data.get("candidates")
+        if candidates is None or consumed > len(text) or _fingerprint(text[:consumed]) != self.data.get("prefix"):
+            if candidates is not None:
+                print("↺ Incremental: earlier transcript changed, starting over")
+            return [], 0
+        print(
+            f"⏩ Incremental: reusing {len(candidates)} key point candidates, "
+            f"{len(text) - consumed} new characters"
+        )
+        return [(score, sentence) for score, sentence in candidates], consumed
+
+    def save_key_points(self, text: str, consumed: int, candidates: List[Tuple[int, str]]) -> None:
+        self.data.update({
+            "consumed": consumed,
+            "prefix": _fingerprint(text[:consumed]),
+            "candidates": [list(item) for item in candidates],
+        })
+        self.save()
+
+    def key_points(self, text: str, max_points: int) -> List[str]:
+        """
+        Như evidence.extract_key_points(text, max_points) nhưng chỉ chấm điểm
+        phần text mới. State lưu tới dấu chấm câu cuối cùng: câu đang dở ở
+        cuối vẫn được dùng lần này nhưng sẽ được chấm lại khi có phần tiếp theo.
+        """
+        earlier, offset = self.resume_key_points(text)
+        boundary = sentence_boundary(text, offset)
+        complete = top_sentences(earlier + score_sentences(text[offset:boundary]), max_points)
+        self.save_key_points(text, boundary, complete)
+        return extract_key_points(text[boundary:], max_points, earlier=complete)
+
+    # ---------- lưu ----------
+    def save(self) -> None:
+        self.data["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def sentence_boundary(text: str, start: int = 0) -> int:
+    """Vị trí ngay sau dấu chấm câu cuối cùng từ `start` (start nếu không có)."""
+    end = start
+    for match in _SENTENCE_END_RE.finditer(text, start):
+        end = match.end()
+    return end
+
+
+def list_streams(streams_dir: str = DEFAULT_STREAMS_DIR) -> List[Dict]:
+    entries = []
+    if not os.path.isdir(streams_dir):
+        return entries
+    for name in sorted(os.listdir(streams_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(streams_dir, name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "chunks" in data:
+            progress = f"{len(data['chunks'])} chunks, snippets {data.get('lo')}-{data.get('hi')}"
+        else:
+            progress = f"{len(data.get('candidates') or [])} key points, {data.get('consumed', 0)} chars"
+        entries.append({"name": name[:-5], "progress": progress, "updated_at": data.get("updated_at")})
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect incremental summarization state")
+    parser.add_argument("--dir", default=DEFAULT_STREAMS_DIR, help="State directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List videos with saved progress")
+    p_reset = sub.add_parser("reset", help="Forget saved progress of a video (next run starts over)")
+    p_reset.add_argument("video_id")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_streams(args.dir)
+        if not entries:
+            print(f"(no incremental state in {args.dir})")
+        for entry in entries:
+            print(f"{entry['name']:<36} {entry['progress']:<40} {entry['updated_at']}")
+        return 0
+
+    removed = 0
+    if os.path.isdir(args.dir):
+        for name in os.listdir(args.dir):
+            if name.startswith(args.video_id + "__"):
+                os.remove(os.path.join(args.dir, name))
+                removed += 1
+    print(f"✓ Removed {removed} state file(s) for {args.video_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Cấu hình suy luận (inference profile) cho model chạy local.
+
+Các giá trị mặc định trước đây được chỉnh tay ("Giảm từ 400 xuống 300 cho
+nhanh hơn", "Giảm từ 4 xuống 2", SAFE_MAX_SOURCE_LEN = 512). `autotune.py`
+đo trên chính máy đang chạy và ghi profile nhanh nhất (trong ngưỡng chất
+lượng) vào inference_profile.json; build_summarizer và summarize_text tự
+đọc file này. Không có file thì dùng đúng các giá trị cũ.
+
+chunk_words phụ thuộc độ dài tóm tắt nên được đo riêng cho từng entry point
+có cấu hình khác quickstart (ENTRY_DEFAULTS, vd. create_lesson dùng
+min/max 150/400): `autotune.py --entry create_lesson` ghi vào mục
+"entry_points" của file; chưa đo thì entry point đó giữ giá trị cũ.
+
+Đường dẫn file: biến môi trường LESSON_PROFILE, mặc định
+<repo>/inference_profile.json.
+"""
+
+import json
+import os
+import platform
+from typing import Dict, Optional
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFILE_PATH = os.path.join(REPO_ROOT, "inference_profile.json")
+
+# Giá trị chỉnh tay trước đây - dùng khi chưa chạy autotune
+DEFAULT_PROFILE: Dict = {
+    "torch_threads": None,      # None = để torch tự chọn
+    "interop_threads": None,
+    "batch_size": 1,            # số chunk mỗi lần gọi pipeline ở bước map
+    "chunk_words": 300,
+    "max_source_len": None,     # None = giới hạn của tokenizer (512 nếu tokenizer không khai báo)
+    "num_beams": 2,
+    "precision": "fp32",        # fp32 | bf16 | fp16 (GPU) | int8 (CPU, dynamic quantization)
+}
+
+PRECISIONS = ("fp32", "bf16", "fp16", "int8")
+
+# Giá trị cũ của các entry point có cấu hình riêng - dùng khi chưa autotune cho entry point đó
+ENTRY_DEFAULTS: Dict[str, Dict] = {
+    "create_lesson": {"chunk_words": 600},
+}
+
+_active: Optional[Dict] = None
+_threads_applied = False
+
+
+def profile_path() -> str:
+    return os.environ.get("LESSON_PROFILE") or DEFAULT_PROFILE_PATH
+
+
+def host_info() -> Dict:
+    """Thông tin máy để biết profile được đo ở đâu."""
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "cuda": None,
+    }
+    try:
+        import torch  # type: ignore
+
+        if torch.cuda.is_available():
+            info["cuda"] = torch.cuda.get_device_name(0)
+    except Exception:
+        pass
+    return info
+
+
+def load_profile(path: Optional[str] = None) -> Dict:
+    """
+    Profile đang dùng (đọc file một lần rồi giữ lại). Khóa lạ bị bỏ qua,
+    khóa thiếu lấy từ DEFAULT_PROFILE.
+    """
+    global _active
+    if _active is not None and path is None:
+        return _active
+
+    profile = dict(DEFAULT_PROFILE)
+    path = path or profile_path()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            profile.update({k: v for k, v in saved.get("profile", {}).items() if k in DEFAULT_PROFILE})
+            tuned_on = saved.get("host", {})
+            if tuned_on.get("cpu_count") not in (None, os.cpu_count()):
+                print(f"ℹ Inference profile was tuned on another machine ({path}), run autotune.py again")
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring invalid inference profile {path}: {e}")
+            profile = dict(DEFAULT_PROFILE)
+    if profile["precision"] not in PRECISIONS:
+        profile["precision"] = "fp32"
+    _active = profile
+    return profile
+
+
+def _read_file(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def entry_setting(entry: str, name: str, path: Optional[str] = None):
+    """
+    Giá trị `name` đã autotune cho entry point `entry` (autotune.py --entry),
+    hoặc ENTRY_DEFAULTS nếu chưa đo. Không lấy từ profile chung vì profile
+    chung được đo với cấu hình của quickstart.
+    """
+    saved = _read_file(path or profile_path()).get("entry_points", {}).get(entry, {})
+    value = saved.get("profile", {}).get(name)
+    return value if value is not None else ENTRY_DEFAULTS[entry][name]
+
+
+def use_profile(profile: Dict) -> Dict:
+    """Dùng profile cho trước thay vì file (autotune chạy thử từng cấu hình)."""
+    global _active
+    _active = dict(DEFAULT_PROFILE, **{k: v for k, v in profile.items() if k in DEFAULT_PROFILE})
+    return _active
+
+
+def save_profile(profile: Dict, path: Optional[str] = None, **extra) -> str:
+    path = path or profile_path()
+    data = {
+        "profile": {k: profile.get(k, DEFAULT_PROFILE[k]) for k in DEFAULT_PROFILE},
+        "host": host_info(),
+        **extra,
+    }
+    # Giữ kết quả autotune riêng của các entry point
+    entry_points = _read_file(path).get("entry_points")
+    if entry_points:
+        data["entry_points"] = entry_points
+    return _write_file(path, data)
+
+
+def save_entry_setting(entry: str, settings: Dict, path: Optional[str] = None, **extra) -> str:
+    """Ghi kết quả autotune của một entry point, giữ nguyên profile chung."""
+    path = path or profile_path()
+    data = _read_file(path)
+    data.setdefault("entry_points", {})[entry] = {
+        "profile": {k: v for k, v in settings.items() if k in ENTRY_DEFAULTS[entry]},
+        "host": host_info(),
+        **extra,
+    }
+    return _write_file(path, data)
+
+
+def _write_file(path: str, data: Dict) -> str:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def apply_thread_settings(profile: Dict) -> None:
+    """
+    Đặt số thread của torch. set_num_interop_threads chỉ gọi được một lần và
+    trước khi torch chạy song song, nên chỉ áp dụng lần đầu trong process.
+    """
+    global _threads_applied
+    if _threads_applied:
+        return
+    _threads_applied = True
+    try:
+        import torch  # type: ignore
+    except Exception:
+        return
+    if profile.get("torch_threads"):
+        torch.set_num_threads(int(profile["torch_threads"]))
+    if profile.get("interop_threads"):
+        try:
+            torch.set_num_interop_threads(int(profile["interop_threads"]))
+        except RuntimeError:
+            pass  # torch đã khởi tạo thread pool trước đó
+
+
+def prepare_model(model, precision: str, on_gpu: bool):
+    """Đổi precision của model đã load theo profile."""
+    import torch  # type: ignore
+
+    if precision == "fp16" and on_gpu:
+        return model.half()
+    if precision == "bf16":
+        return model.to(torch.bfloat16)
+    if precision == "int8" and not on_gpu:
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
@@ -0,0 +1,789 @@
+#!/usr/bin/env python3
+"""
+Hàng đợi job cục bộ (SQLite) cho web front end.
+
+Thay vì chạy gemini_lesson.py ngay trong HTTP request, web chỉ cần:
+  python job_service.py submit --url URL --language vi   -> {"job_id": ..., "status": ...}
+  python job_service.py status JOB_ID                    -> {"status": "done", "output": ...}
+
+và một tiến trình worker chạy nền xử lý hàng đợi:
+  python job_service.py worker --workers 2
+
+Các job giống hệt nhau (cùng video, ngôn ngữ, backend, tham số) đang chờ hoặc
+đang chạy được gộp làm một: submit trả về job_id của job đang có thay vì tạo
+job mới, nên nhiều người gửi cùng một video chỉ tốn một lần xử lý. Video đã
+có job xong (dù gửi bằng link youtu.be, /shorts/ hay watch?v=) được trả lại
+kết quả cũ ngay, trừ khi submit với --fresh, kết quả cũ hơn --max-age, hoặc
+job có --param incremental=true (VOD livestream còn dài ra: luôn chạy lại, chỉ
+phần transcript mới được xử lý). Job xong được thêm vào chỉ mục tìm kiếm
+(lesson_index.py). Bài học dở dang (script dừng vì --deadline hoặc có phần
+bị lỗi, record có "partial": true) vẫn được trả cho người gửi nhưng không
+được dùng lại và không được đưa vào chỉ mục.
+
+Backend "auto": worker chọn local hoặc Gemini lúc nhận job (xem backends.Router)
+theo độ sâu hàng đợi local và phân vị độ trễ của các job đã xong; job Gemini
+bị rate limit được đưa lại hàng đợi và chạy bằng local.
+
+Hủy job:
+  python job_service.py cancel JOB_ID
+Job đang chờ bị hủy ngay; job đang chạy chuyển sang 'cancelling', worker gửi
+SIGTERM cho script con (script dừng ở bước token kế tiếp và in phần kết quả đã
+có), quá thời gian chờ mới kill. Phần kết quả dở dang được lưu vào job. Job
+được gộp từ nhiều request chỉ bị hủy khi người gửi cuối cùng hủy.
+
+Worker cập nhật heartbeat của job đang chạy; khi khởi động, worker chỉ đưa lại
+hàng đợi các job mà worker cũ đã ngừng gửi heartbeat (job đang hủy dở thì
+thành 'cancelled'), nên job local chạy lâu không bị chạy hai lần.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from backends import LatencyTracker, Router, is_rate_limit_error
+from lesson_index import LessonIndex
+from memory_guard import SOFT_LIMIT_RATIO, rss_bytes, total_rss_bytes
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(REPO_ROOT, "runs", "jobs.sqlite3")
+
+# backend -> script xử lý job
+BACKEND_SCRIPTS = {
+    "gemini": "gemini_lesson.py",
+    "local": "create_lesson.py",
+    "stub": "lesson_pipeline.py",
+}
+BACKEND_EXTRA_ARGS = {
+    "stub": ["--backend", "stub"],
+}
+# Backend được router chọn khi worker nhận job
+AUTO_BACKEND = "auto"
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Kết quả job đã xong chỉ được dùng lại trong khoảng thời gian này (giây)
+DEFAULT_REUSE_MAX_AGE = 24 * 3600.0
+
+# Thời gian chờ script con tự dừng sau SIGTERM trước khi kill
+TERMINATE_GRACE = 10.0
+
+# Worker cập nhật heartbeat của job đang chạy mỗi HEARTBEAT_INTERVAL giây;
+# job không có heartbeat lâu hơn stale_after mới bị coi là worker đã chết
+HEARTBEAT_INTERVAL = 5.0
+DEFAULT_STALE_AFTER = 120.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    job_key     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    video_id    TEXT NOT NULL,
+    language    TEXT NOT NULL,
+    backend     TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    submitters  INTEGER NOT NULL DEFAULT 1,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    worker      TEXT,
+    exit_code   INTEGER,
+    output      TEXT,
+    result      TEXT,
+    error       TEXT,
+    routed_backend TEXT,
+    heartbeat   REAL,
+    partial     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_key_status ON jobs (job_key, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# Cột được thêm sau khi bảng đã có trong các DB cũ
+_ADDED_COLUMNS = {
+    "result": "TEXT",
+    "routed_backend": "TEXT",
+    "heartbeat": "REAL",
+    "partial": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def job_key(video_id: str, language: str, backend: str, params: Dict) -> str:
+    """Khóa gộp job: hai request cùng khóa cho ra cùng kết quả."""
+    canonical = json.dumps(
+        {"video_id": video_id, "language": language, "backend": backend, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobService:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, index_path: Optional[str] = None):
+        self.db_path = db_path
+        # Chỉ mục tìm kiếm nằm cạnh DB hàng đợi (runs/index.sqlite3)
+        self.index_path = index_path or os.path.join(
+            os.path.dirname(os.path.abspath(db_path)), "index.sqlite3"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, decl in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Mỗi thread / process mở kết nối riêng; WAL cho phép đọc khi đang ghi
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    # ---------- phía web ----------
+    def submit(
+        self,
+        video_id: str,
+        language: str,
+        backend: str = "gemini",
+        params: Optional[Dict] = None,
+        reuse_done: bool = True,
+        max_age: Optional[float] = DEFAULT_REUSE_MAX_AGE,
+    ) -> Tuple[str, bool]:
+        """
+        Thêm job vào hàng đợi. Trả về (job_id, coalesced): coalesced=True nếu
+        đã có job giống hệt đang chờ/chạy (hoặc đã xong trong vòng `max_age`
+        giây, khi reuse_done) và ta dùng lại job đó. Job incremental không
+        dùng lại kết quả cũ vì transcript có thể đã dài thêm.
+        """
+        if backend not in BACKEND_SCRIPTS and backend != AUTO_BACKEND:
+            raise ValueError(f"Unknown backend: {backend}")
+        params = params or {}
+        key = job_key(video_id, language, backend, params)
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE: khóa ghi ngay để hai submit đồng thời không cùng tạo job
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE job_key = ? AND status IN (?, ?) "
+                "ORDER BY created_at LIMIT 1",
+                (key, *ACTIVE_STATUSES),
+            ).fetchone()
+            if row is None and reuse_done and not params.get("incremental"):
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE job_key = ? AND status = 'done' AND partial = 0 "
+                    "AND finished_at >= ? ORDER BY finished_at DESC LIMIT 1",
+                    (key, time.time() - max_age if max_age is not None else 0.0),
+                ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET submitters = submitters + 1 WHERE id = ?", (row["id"],)
+                )
+                conn.execute("COMMIT")
+                return row["id"], True
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute(
+                "INSERT INTO jobs (id, job_key, status, video_id, language, backend, params, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, key, video_id, language, backend, json.dumps(params, sort_keys=True), time.time()),
+            )
+            conn.execute("COMMIT")
+            return job_id, False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            if job["status"] == "queued":
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?",
+                    (job["created_at"],),
+                ).fetchone()[0]
+            return job
+        finally:
+            conn.close()
+
+    def queue_depth(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN (?, ?) GROUP BY status",
+                ACTIVE_STATUSES,
+            ).fetchall()
+            depth = {status: 0 for status in ACTIVE_STATUSES}
+            depth.update({row["status"]: row["n"] for row in rows})
+            return depth
+        finally:
+            conn.close()
+
+    def backend_depth(self, backend: str, include_unrouted: bool = False) -> int:
+        """
+        Số job đang chờ / chạy sẽ dùng `backend` (tính cả job auto đã được định tuyến).
+        include_unrouted: cộng thêm các job auto chưa được định tuyến (kể cả job
+        đang được định tuyến), vì nếu không chuyển đi thì chúng sẽ chạy ở đây.
+        """
+        conn = self._connect()
+        try:
+            depth = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) "
+                "AND COALESCE(routed_backend, backend) = ?",
+                (*ACTIVE_STATUSES, backend),
+            ).fetchone()[0]
+            if include_unrouted:
+                depth += conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) "
+                    "AND backend = ? AND routed_backend IS NULL",
+                    (*ACTIVE_STATUSES, AUTO_BACKEND),
+                ).fetchone()[0]
+            return depth
+        finally:
+            conn.close()
+
+    def latency_tracker(self, window: int = 200) -> LatencyTracker:
+        """LatencyTracker nạp sẵn thời gian chạy của các job đã xong gần đây."""
+        tracker = LatencyTracker(window)
+        conn = self._connect()
+        try:
+            for backend in BACKEND_SCRIPTS:
+                rows = conn.execute(
+                    "SELECT finished_at - started_at AS seconds FROM jobs "
+                    "WHERE status = 'done' AND COALESCE(routed_backend, backend) = ? "
+                    "AND started_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?",
+                    (backend, window),
+                ).fetchall()
+                for row in reversed(rows):
+                    tracker.record(backend, row["seconds"])
+        finally:
+            conn.close()
+        return tracker
+
+    # ---------- phía worker ----------
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Lấy job cũ nhất đang chờ và đánh dấu running (nguyên tử)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat = ?, worker = ? WHERE id = ?",
+                (now, now, worker, row["id"]),
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def finish(
+        self,
+        job_id: str,
+        exit_code: int,
+        output: str,
+        error: str,
+        status: Optional[str] = None,
+    ) -> None:
+        """
+        Lưu kết quả job. Script chạy với --format json nên stdout là một record
+        JSON: lưu nguyên record vào `result` và phần markdown vào `output`.
+        `status` mặc định là done/failed theo exit_code. Record có "partial"
+        (bài học dở dang) được đánh dấu partial: không dùng lại, không index.
+        """
+        result = None
+        partial = False
+        try:
+            record = json.loads(output) if output else None
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            result = json.dumps(record, ensure_ascii=False)
+            output = record.get("markdown", "")
+            partial = bool(record.get("partial"))
+            if not record.get("ok", True) and record.get("error"):
+                error = (error + "\n" + record["error"]).strip()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, exit_code = ?, output = ?, result = ?, error = ?, "
+                "partial = ? WHERE id = ?",
+                (
+                    status or ("done" if exit_code == 0 else "failed"),
+                    time.time(), exit_code, output, result, error, int(partial), job_id,
+                ),
+            )
+        finally:
+            conn.close()
+        if status is None and exit_code == 0 and not partial:
+            try:
+                LessonIndex(self.index_path).add_job(self.get(job_id))
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠ Could not index job {job_id}: {e}")
+
+    def route(self, job_id: str, backend: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET routed_backend = ? WHERE id = ?", (backend, job_id))
+        finally:
+            conn.close()
+
+    def reroute(self, job_id: str, backend: str) -> None:
+        """Đưa job về hàng đợi với backend khác (giữ created_at nên được chạy lại sớm)."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', routed_backend = ?, started_at = NULL, heartbeat = NULL, "
+                "finished_at = NULL, worker = NULL, exit_code = NULL, output = NULL, result = NULL, "
+                "error = NULL, partial = 0 WHERE id = ?",
+                (backend, job_id),
+            )
+        finally:
+            conn.close()
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Một người gửi bỏ job. Job được gộp từ nhiều request chỉ bị hủy khi người
+        gửi cuối cùng bỏ nó; trước đó chỉ giảm `submitters` và trả về trạng thái
+        hiện tại ('queued' / 'running'). Khi hủy thật: 'cancelled' cho job đang
+        chờ, 'cancelling' cho job đang chạy. None nếu job đã xong / không tồn tại.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, submitters FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] not in ACTIVE_STATUSES:
+                conn.execute("COMMIT")
+                return None
+            if row["submitters"] > 1:
+                conn.execute("UPDATE jobs SET submitters = submitters - 1 WHERE id = ?", (job_id,))
+                conn.execute("COMMIT")
+                return row["status"]
+            conn.execute("UPDATE jobs SET submitters = 0 WHERE id = ?", (job_id,))
+            if row["status"] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+                status = "cancelled"
+            else:
+                conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ?", (job_id,))
+                status = "cancelling"
+            conn.execute("COMMIT")
+            return status
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return row is not None and row["status"] == "cancelling"
+        finally:
+            conn.close()
+
+    def beat(self, job_id: str) -> None:
+        """Worker vẫn đang chạy job này."""
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+        finally:
+            conn.close()
+
+    def requeue_stale(self, older_than: float) -> int:
+        """
+        Job của worker đã chết (không có heartbeat trong `older_than` giây):
+        job 'running' về lại hàng đợi, job 'cancelling' thành 'cancelled' (giữ
+        phần kết quả đã lưu, không chạy lại job người dùng đã hủy).
+        """
+        cutoff = time.time() - older_than
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat = NULL, worker = NULL "
+                "WHERE status = 'running' AND COALESCE(heartbeat, started_at) < ?",
+                (cutoff,),
+            ).rowcount
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, "
+                "error = TRIM(COALESCE(error, '') || char(10) || 'Cancelled (worker stopped)') "
+                "WHERE status = 'cancelling' AND COALESCE(heartbeat, started_at) < ?",
+                (time.time(), cutoff),
+            )
+            conn.execute("COMMIT")
+            return requeued
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+def build_command(
+    job: Dict,
+    python: str = sys.executable,
+    deadline: Optional[float] = None,
+    max_rss_mb: Optional[float] = None,
+) -> List[str]:
+    backend = job.get("routed_backend") or job["backend"]
+    script = os.path.join(REPO_ROOT, BACKEND_SCRIPTS[backend])
+    cmd = [
+        python, script,
+        *BACKEND_EXTRA_ARGS.get(backend, []),
+        "--url", job["video_id"],
+        "--language", job["language"],
+        "--format", "json",
+    ]
+    if deadline:
+        # Script tự dừng trước khi worker phải kill, nên vẫn còn phần kết quả
+        cmd.extend(["--deadline", str(deadline)])
+    if max_rss_mb and backend == "local":
+        # Model local tự giảm batch size khi gần tới giới hạn
+        cmd.extend(["--max-rss", str(max_rss_mb)])
+    for name, value in sorted(job["params"].items()):
+        flag = "--" + name.replace("_", "-")
+        if value is True:
+            cmd.append(flag)
+        elif value not in (None, False):
+            cmd.extend([flag, str(value)])
+    return cmd
+
+
+def run_job(
+    service: JobService,
+    job: Dict,
+    timeout: Optional[float],
+    poll_interval: float = 0.5,
+    max_rss_mb: Optional[float] = None,
+    running_pids: Optional[Set[int]] = None,
+) -> None:
+    """
+    Chạy script của job. Trong lúc chờ, kiểm tra yêu cầu hủy và timeout; khi
+    cần dừng thì gửi SIGTERM để script trả về phần đã có, sau TERMINATE_GRACE
+    giây mới kill.
+    """
+    deadline = max(1.0, timeout - TERMINATE_GRACE) if timeout else None
+    cmd = build_command(job, deadline=deadline, max_rss_mb=max_rss_mb)
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=REPO_ROOT,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+    except Exception as e:
+        service.finish(job["id"], -1, "", f"Failed to start job: {e}")
+        return
+
+    if running_pids is not None:
+        running_pids.add(proc.pid)
+    try:
+        stdout, stderr, stop_reason = _wait_job(service, job, proc, timeout, poll_interval)
+    finally:
+        if running_pids is not None:
+            running_pids.discard(proc.pid)
+
+    if stop_reason is None and service.cancel_requested(job["id"]):
+        stop_reason = "Cancelled"  # script đã xong đúng lúc bị hủy
+    if stop_reason is None:
+        service.finish(job["id"], proc.returncode, stdout, stderr)
+        return
+    error = (stderr + "\n" + stop_reason).strip()
+    status = "cancelled" if stop_reason == "Cancelled" else "failed"
+    service.finish(job["id"], proc.returncode, stdout, error, status=status)
+
+
+def _wait_job(
+    service: JobService,
+    job: Dict,
+    proc: subprocess.Popen,
+    timeout: Optional[float],
+    poll_interval: float,
+) -> Tuple[str, str, Optional[str]]:
+    """Chờ script con, gửi SIGTERM khi job bị hủy / quá giờ. Trả về (stdout, stderr, lý do dừng)."""
+    started = time.monotonic()
+    last_beat = started
+    stop_reason: Optional[str] = None
+    terminated_at: Optional[float] = None
+    while True:
+        try:
+            stdout, stderr = proc.communicate(timeout=poll_interval)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        now = time.monotonic()
+        if now - last_beat >= HEARTBEAT_INTERVAL:
+            service.beat(job["id"])
+            last_beat = now
+        if stop_reason is None:
+            if service.cancel_requested(job["id"]):
+                stop_reason = "Cancelled"
+            elif timeout and now - started >= timeout:
+                stop_reason = f"Timed out after {timeout}s"
+            if stop_reason is not None:
+                proc.terminate()
+                terminated_at = now
+        elif terminated_at is not None and now - terminated_at >= TERMINATE_GRACE:
+            proc.kill()
+            terminated_at = None
+    return stdout, stderr, stop_reason
+
+
+def make_router(service: JobService, workers: int = 2, remote_available: Optional[bool] = None) -> Router:
+    """
+    Router cho job auto. Độ sâu hàng đợi local gồm cả các job auto chưa được
+    định tuyến: nếu chỉ đếm job đã chọn local thì với deep_queue = workers
+    độ sâu không bao giờ tới ngưỡng và mọi job đều chạy local. `workers`
+    mặc định bằng số worker mặc định của lệnh `worker`.
+    """
+    return Router(
+        queue_depth=lambda: service.backend_depth("local", include_unrouted=True),
+        tracker=service.latency_tracker(),
+        local_workers=workers,
+        deep_queue=workers,
+        remote_available=remote_available,
+    )
+
+
+def run_workers(
+    service: JobService,
+    workers: int = 2,
+    poll_interval: float = 0.5,
+    job_timeout: Optional[float] = None,
+    stale_after: float = DEFAULT_STALE_AFTER,
+    max_rss_mb: Optional[float] = None,
+) -> None:
+    """
+    max_rss_mb: giới hạn bộ nhớ chung cho worker + các job đang chạy. Gần tới
+    giới hạn thì worker rảnh không nhận thêm job (luôn cho phép ít nhất một
+    job chạy); mỗi job local nhận phần giới hạn của nó qua --max-rss.
+    """
+    requeued = service.requeue_stale(stale_after)
+    if requeued:
+        print(f"↺ Requeued {requeued} stale job(s)")
+    stop = threading.Event()
+    running_pids: Set[int] = set()
+    per_job_rss = max_rss_mb / max(1, workers) if max_rss_mb else None
+    router = make_router(service, workers)
+
+    def memory_full() -> bool:
+        if not max_rss_mb or not running_pids:
+            return False
+        used = (rss_bytes() or 0) + total_rss_bytes(list(running_pids))
+        return used >= max_rss_mb * 1024 * 1024 * SOFT_LIMIT_RATIO
+
+    def loop(name: str) -> None:
+        waiting = False
+        while not stop.is_set():
+            if memory_full():
+                if not waiting:
+                    print(f"⏸ [{name}] memory near --max-rss, waiting for running jobs")
+                    waiting = True
+                stop.wait(poll_interval)
+                continue
+            waiting = False
+            job = service.claim(name)
+            if job is None:
+                stop.wait(poll_interval)
+                continue
+            backend = job.get("routed_backend") or job["backend"]
+            if backend == AUTO_BACKEND:
+                backend = router.choose()
+                service.route(job["id"], backend)
+                job["routed_backend"] = backend
+            print(f"▶ [{name}] job {job['id']} ({backend}, {job['video_id']}, {job['language']})")
+            started = time.perf_counter()
+            run_job(service, job, job_timeout, poll_interval, per_job_rss, running_pids)
+            elapsed = time.perf_counter() - started
+            done = service.get(job["id"])
+            rate_limited = done["status"] == "failed" and is_rate_limit_error(done["error"] or "")
+            router.record(backend, elapsed, ok=done["status"] == "done", rate_limited=rate_limited)
+            if rate_limited and job["backend"] == AUTO_BACKEND and router.fallback(backend):
+                service.reroute(job["id"], router.fallback(backend))
+                print(f"↪ [{name}] job {job['id']} rate limited on {backend}, requeued")
+                continue
+            print(f"■ [{name}] job {job['id']} {done['status']} in {elapsed:.1f}s")
+
+    threads = [
+        threading.Thread(target=loop, args=(f"{os.getpid()}-w{i + 1}",), daemon=True)
+        for i in range(max(1, workers))
+    ]
+    for t in threads:
+        t.start()
+    print(f"✓ {len(threads)} worker(s) polling {service.db_path}")
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        print("⏹ Stopping workers (running jobs finish first)...")
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def _print_json(data) -> None:
+    print(json.dumps(data, ensure_ascii=False))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local job queue for lesson generation")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_submit = sub.add_parser("submit", help="Queue a job (identical in-flight jobs are merged)")
+    p_submit.add_argument("--url", required=True, help="YouTube URL or video ID")
+    p_submit.add_argument("--language", "-l", default="vi")
+    p_submit.add_argument("--backend", choices=sorted(BACKEND_SCRIPTS) + [AUTO_BACKEND], default="gemini")
+    p_submit.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Extra option passed to the backend script, e.g. --param max_points=80",
+    )
+    p_submit.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Regenerate even if this video already has a finished job with the same settings",
+    )
+    p_submit.add_argument(
+        "--max-age",
+        type=float,
+        default=DEFAULT_REUSE_MAX_AGE,
+        help="Only reuse a finished job younger than this many seconds (default: one day)",
+    )
+
+    p_status = sub.add_parser("status", help="Show a job as JSON")
+    p_status.add_argument("job_id")
+
+    p_cancel = sub.add_parser(
+        "cancel", help="Cancel a queued or running job (merged jobs stop when their last submitter cancels)"
+    )
+    p_cancel.add_argument("job_id")
+
+    sub.add_parser("depth", help="Show queued/running counts as JSON")
+
+    p_worker = sub.add_parser("worker", help="Run the worker pool")
+    p_worker.add_argument("--workers", type=int, default=2)
+    p_worker.add_argument("--poll-interval", type=float, default=0.5)
+    p_worker.add_argument("--job-timeout", type=float, default=None, help="Seconds before a job is killed")
+    p_worker.add_argument(
+        "--stale-after",
+        type=float,
+        default=DEFAULT_STALE_AFTER,
+        help="At startup, requeue running jobs whose worker has sent no heartbeat for this many seconds",
+    )
+    p_worker.add_argument(
+        "--max-rss",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Memory budget for the worker and its jobs; stop taking jobs when close to it",
+    )
+
+    args = parser.parse_args()
+    service = JobService(args.db)
+
+    if args.command == "submit":
+        from quickstart import extract_video_id
+
+        try:
+            video_id = extract_video_id(args.url)
+        except ValueError as e:
+            _print_json({"error": str(e)})
+            return 2
+        params: Dict[str, str] = {}
+        for item in args.param:
+            name, sep, value = item.partition("=")
+            if not sep or not name:
+                _print_json({"error": f"Invalid --param: {item}"})
+                return 2
+            value = value.strip()
+            # true/false -> cờ bật/tắt của script (vd. --param incremental=true)
+            if value.lower() in ("true", "false"):
+                value = value.lower() == "true"
+            params[name.strip()] = value
+        job_id, coalesced = service.submit(
+            video_id, args.language, args.backend, params,
+            reuse_done=not args.fresh, max_age=args.max_age,
+        )
+        job = service.get(job_id)
+        _print_json({"job_id": job_id, "status": job["status"], "coalesced": coalesced})
+        return 0
+
+    if args.command == "status":
+        job = service.get(args.job_id)
+        if job is None:
+            _print_json({"error": f"Job not found: {args.job_id}"})
+            return 1
+        _print_json(job)
+        return 0
+
+    if args.command == "cancel":
+        status = service.cancel(args.job_id)
+        if status is None:
+            job = service.get(args.job_id)
+            if job is None:
+                _print_json({"error": f"Job not found: {args.job_id}"})
+                return 1
+            _print_json({"job_id": args.job_id, "status": job["status"], "cancelled": False})
+            return 0
+        # Job còn người gửi khác: vẫn chạy, chỉ bỏ phần của người này
+        _print_json({"job_id": args.job_id, "status": status, "cancelled": status not in ACTIVE_STATUSES})
+        return 0
+
+    if args.command == "depth":
+        _print_json(service.queue_depth())
+        return 0
+
+    run_workers(
+        service,
+        workers=args.workers,
+        poll_interval=args.poll_interval,
+        job_timeout=args.job_timeout,
+        stale_after=args.stale_after,
+        max_rss_mb=args.max_rss,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Chỉ mục full-text (SQLite FTS5) cho các transcript và bài học đã xử lý.
+
+Nguồn được đưa vào chỉ mục:
+- job đã xong trong hàng đợi (runs/jobs.sqlite3) - job_service tự thêm ngay khi job xong
+- các lần chạy có --journal (runs/<RUN_ID>/: transcript + kết quả)
+- transcript đã ghi bằng replay.py (fixtures/transcripts)
+
+`sync` chỉ đọc những gì mới hoặc đã thay đổi từ lần trước (mốc thời gian lưu
+trong bảng sync_state), nên chạy lại thường xuyên vẫn nhanh. Bài học được tách
+theo phần (title, objectives, concepts, ...) để kết quả tìm kiếm chỉ ra đúng
+phần chứa từ khóa. Tìm kiếm bỏ dấu tiếng Việt: "bai hoc" khớp "bài học".
+
+Nếu SQLite không có FTS5 thì dùng bảng thường + LIKE (chậm hơn): mỗi phần lưu
+thêm bản đã bỏ dấu và viết thường (cột `folded`), từ khóa cũng được bỏ dấu, nên
+vẫn khớp "vong lap" với "Vòng lặp" như FTS5. Khác FTS5: LIKE khớp cả chuỗi con
+("lap" khớp "lập trình" lẫn "clap") và kết quả xếp theo thời gian, không theo bm25.
+
+Usage:
+  python lesson_index.py sync
+  python lesson_index.py get <URL hoặc video ID> [--language vi]
+  python lesson_index.py search "vòng lặp for" [--limit 10] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+from lesson_output import split_lesson_sections
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(REPO_ROOT, "runs", "index.sqlite3")
+
+KINDS = ("lesson", "transcript")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id          INTEGER PRIMARY KEY,
+    source      TEXT NOT NULL,
+    source_id   TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    video_id    TEXT NOT NULL,
+    language    TEXT,
+    backend     TEXT,
+    title       TEXT,
+    created_at  REAL,
+    indexed_at  REAL NOT NULL,
+    fingerprint TEXT NOT NULL,
+    body        TEXT NOT NULL,
+    UNIQUE (source, source_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_video ON documents (video_id, kind, created_at);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name  TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(
+    section, body, doc_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_PLAIN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (section TEXT, body TEXT, doc_id INTEGER, folded TEXT);
+CREATE INDEX IF NOT EXISTS idx_sections_doc ON sections (doc_id);
+"""
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _fold(text: str) -> str:
+    """Bỏ dấu + viết thường, giống tokenizer unicode61 remove_diacritics 2 (đ giữ nguyên)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return unicodedata.normalize("NFC", "".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def _fts_query(query: str) -> str:
+    """Mỗi từ thành một chuỗi trong ngoặc kép, để ký tự lạ không phá cú pháp FTS."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def _mtime(*paths: str) -> float:
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+def _read_run(path: str):
+    """
+    (meta, text transcript, kết quả cuối) của một thư mục run. Chỉ đọc - không
+    dùng RunJournal.load vì nó cắt dòng ghi dở của run có thể vẫn đang chạy.
+    """
+    from transcript import Transcript
+
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    transcript_text = ""
+    transcript_path = os.path.join(path, "transcript.json")
+    if os.path.exists(transcript_path):
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            transcript_text = Transcript.from_raw_data(json.load(f)).text
+    result = None
+    log_path = os.path.join(path, "journal.jsonl")
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("stage") == "result":
+                    result = record.get("text")
+    return meta, transcript_text, result
+
+
+class LessonIndex:
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            exists = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'sections'"
+            ).fetchone()
+            if exists is not None:
+                self.fts = "fts5" in (exists["sql"] or "").lower()
+                if not self.fts:
+                    self._add_folded_column(conn)
+            else:
+                try:
+                    conn.executescript(_FTS_SCHEMA)
+                    self.fts = True
+                except sqlite3.OperationalError:
+                    conn.executescript(_PLAIN_SCHEMA)
+                    self.fts = False
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _add_folded_column(conn: sqlite3.Connection) -> None:
+        """Index LIKE tạo trước khi có cột `folded`: thêm cột và điền cho các phần đã có."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sections)")}
+        if "folded" in columns:
+            return
+        conn.execute("ALTER TABLE sections ADD COLUMN folded TEXT")
+        rows = conn.execute("SELECT rowid, body FROM sections").fetchall()
+        conn.executemany(
+            "UPDATE sections SET folded = ? WHERE rowid = ?",
+            [(_fold(row["body"] or ""), row["rowid"]) for row in rows],
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    # ---------- ghi ----------
+    def add(
+        self,
+        source: str,
+        source_id: str,
+        kind: str,
+        video_id: str,
+        body: str,
+        language: Optional[str] = None,
+        backend: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> bool:
+        """
+        Thêm / cập nhật một tài liệu. Trả về False nếu nội dung không đổi so với
+        lần index trước (không ghi gì).
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind: {kind}")
+        if not body or not body.strip():
+            return False
+        fingerprint = _fingerprint(body)
+        if kind == "lesson":
+            sections = split_lesson_sections(body)
+            title = sections.get("title")
+        else:
+            sections = {"transcript": body}
+            title = None
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, fingerprint FROM documents WHERE source = ? AND source_id = ? AND kind = ?",
+                (source, source_id, kind),
+            ).fetchone()
+            if row is not None and row["fingerprint"] == fingerprint:
+                conn.execute("COMMIT")
+                return False
+            if row is not None:
+                conn.execute("DELETE FROM sections WHERE doc_id = ?", (row["id"],))
+                conn.execute("DELETE FROM documents WHERE id = ?", (row["id"],))
+            cur = conn.execute(
+                "INSERT INTO documents (source, source_id, kind, video_id, language, backend, title, "
+                "created_at, indexed_at, fingerprint, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    source, source_id, kind, video_id, language, backend, title,
+                    created_at or time.time(), time.time(), fingerprint, body,
+                ),
+            )
+            rows = [(name, text, cur.lastrowid) for name, text in sections.items() if text]
+            if self.fts:
+                conn.executemany("INSERT INTO sections (section, body, doc_id) VALUES (?, ?, ?)", rows)
+            else:
+                conn.executemany(
+                    "INSERT INTO sections (section, body, doc_id, folded) VALUES (?, ?, ?, ?)",
+                    [row + (_fold(row[1]),) for row in rows],
+                )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def add_job(self, job: Dict) -> bool:
+        """Index bài học của một job đã xong (dict như JobService.get); bỏ qua bài học dở dang."""
+        if job.get("status") != "done" or not job.get("output") or job.get("partial"):
+            return False
+        return self.add(
+            "job",
+            job["id"],
+            "lesson",
+            job["video_id"],
+            job["output"],
+            language=job.get("language"),
+            backend=job.get("routed_backend") or job.get("backend"),
+            created_at=job.get("finished_at"),
+        )
+
+    def _state(self, conn: sqlite3.Connection, name: str) -> float:
+        row = conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else 0.0
+
+    def _set_state(self, conn: sqlite3.Connection, name: str, value: float) -> None:
+        conn.execute(
+            "INSERT INTO sync_state (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    # ---------- đồng bộ từ đĩa ----------
+    def sync_jobs(self, jobs_db: str) -> int:
+        """Index các job 'done' xong sau lần sync trước."""
+        if not os.path.exists(jobs_db):
+            return 0
+        conn = self._connect()
+        try:
+            since = self._state(conn, "jobs")
+        finally:
+            conn.close()
+        source = sqlite3.connect(jobs_db, timeout=30)
+        source.row_factory = sqlite3.Row
+        try:
+            rows = source.execute(
+                "SELECT * FROM jobs WHERE status = 'done' AND finished_at > ? ORDER BY finished_at",
+                (since,),
+            ).fetchall()
+        finally:
+            source.close()
+        added = 0
+        latest = since
+        for row in rows:
+            added += self.add_job(dict(row))
+            latest = max(latest, row["finished_at"])
+        conn = self._connect()
+        try:
+            self._set_state(conn, "jobs", latest)
+        finally:
+            conn.close()
+        return added
+
+    def sync_runs(self, runs_dir: str) -> int:
+        """Index transcript + kết quả của các thư mục run có thay đổi từ lần sync trước."""
+        if not os.path.isdir(runs_dir):
+            return 0
+        conn = self._connect()
+        try:
+            since = self._state(conn, "runs")
+        finally:
+            conn.close()
+        started = time.time()
+        added = 0
+        for run_id in sorted(os.listdir(runs_dir)):
+            path = os.path.join(runs_dir, run_id)
+            files = [os.path.join(path, n) for n in ("meta.json", "journal.jsonl", "transcript.json")]
+            if not os.path.exists(files[0]) or _mtime(*files) <= since:
+                continue
+            try:
+                meta, transcript_text, result = _read_run(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Skipping run {run_id}: {e}")
+                continue
+            video_id = meta.get("video_id", "")
+            language = meta.get("params", {}).get("language")
+            created_at = _mtime(files[0])
+            if transcript_text:
+                added += self.add(
+                    "run", run_id, "transcript", video_id, transcript_text,
+                    language=language, backend="local", created_at=created_at,
+                )
+            if result:
+                added += self.add(
+                    "run", run_id, "lesson", video_id, result,
+                    language=language, backend="local", created_at=created_at,
+                )
+        conn = self._connect()
+        try:
+            self._set_state(conn, "runs", started)
+        finally:
+            conn.close()
+        return added
+
+    def sync_fixtures(self, fixtures_dir: str) -> int:
+        """Index transcript đã ghi bởi replay.py (LESSON_REPLAY=record)."""
+        from transcript import Transcript
+
+        folder = os.path.join(fixtures_dir, "transcripts")
+        if not os.path.isdir(folder):
+            return 0
+        conn = self._connect()
+        try:
+            since = self._state(conn, "fixtures")
+        finally:
+            conn.close()
+        started = time.time()
+        added = 0
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not name.endswith(".json") or _mtime(path) <= since:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            text = Transcript.from_raw_data(data.get("raw_data", [])).text
+            languages = data.get("languages") or []
+            added += self.add(
+                "fixture", name[:-5], "transcript", data.get("video_id", ""), text,
+                language=languages[0] if languages else None, created_at=_mtime(path),
+            )
+        conn = self._connect()
+        try:
+            self._set_state(conn, "fixtures", started)
+        finally:
+            conn.close()
+        return added
+
+    # ---------- đọc ----------
+    def lookup(
+        self,
+        video_id: str,
+        language: Optional[str] = None,
+        kind: str = "lesson",
+    ) -> List[Dict]:
+        """Các tài liệu của video (mới nhất trước), tra bằng index trên video_id."""
+        sql = "SELECT * FROM documents WHERE video_id = ? AND kind = ?"
+        args: List = [video_id, kind]
+        if language:
+            sql += " AND language = ?"
+            args.append(language)
+        sql += " ORDER BY created_at DESC"
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        kind: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> List[Dict]:
+        """Tìm theo từ khóa trong mọi phần bài học / transcript (tất cả các từ phải có)."""
+        if not query.split():
+            return []
+        filters = ""
+        args: List = []
+        if kind:
+            filters += " AND d.kind = ?"
+            args.append(kind)
+        if language:
+            filters += " AND d.language = ?"
+            args.append(language)
+        if self.fts:
+            sql = (
+                "SELECT d.id, d.video_id, d.kind, d.language, d.backend, d.title, d.source, "
+                "d.source_id, d.created_at, s.section, "
+                "snippet(sections, 1, '[', ']', ' … ', 12) AS snippet, bm25(sections) AS rank "
+                "FROM sections s JOIN documents d ON d.id = s.doc_id "
+                "WHERE sections MATCH ?" + filters + " ORDER BY rank LIMIT ?"
+            )
+            args = [_fts_query(query)] + args + [limit]
+        else:
+            terms = _fold(query).split()
+            sql = (
+                "SELECT d.id, d.video_id, d.kind, d.language, d.backend, d.title, d.source, "
+                "d.source_id, d.created_at, s.section, substr(s.body, 1, 160) AS snippet, 0 AS rank "
+                "FROM sections s JOIN documents d ON d.id = s.doc_id WHERE "
+                + " AND ".join("s.folded LIKE ?" for _ in terms)
+                + filters + " ORDER BY d.created_at DESC LIMIT ?"
+            )
+            args = [f"%{term}%" for term in terms] + args + [limit]
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT kind, COUNT(*) AS n FROM documents GROUP BY kind").fetchall()
+            counts = {kind: 0 for kind in KINDS}
+            counts.update({row["kind"]: row["n"] for row in rows})
+            counts["videos"] = conn.execute(
+                "SELECT COUNT(DISTINCT video_id) FROM documents"
+            ).fetchone()[0]
+            return counts
+        finally:
+            conn.close()
+
+
+def sync_all(index: LessonIndex) -> Dict[str, int]:
+    from job_service import DEFAULT_DB_PATH
+    from replay import fixtures_dir
+    from run_journal import DEFAULT_RUNS_DIR
+
+    return {
+        "jobs": index.sync_jobs(DEFAULT_DB_PATH),
+        "runs": index.sync_runs(os.path.join(REPO_ROOT, DEFAULT_RUNS_DIR)),
+        "fixtures": index.sync_fixtures(fixtures_dir()),
+    }
+
+
+def _print_json(data) -> None:
+    print(json.dumps(data, ensure_ascii=False))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Full-text index over processed transcripts and lessons")
+    parser.add_argument("--db", default=DEFAULT_INDEX_PATH, help="Index database path")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sync", help="Index new or changed jobs, journaled runs and recorded transcripts")
+
+    p_get = sub.add_parser("get", help="Show the latest stored lesson for a video")
+    p_get.add_argument("url", help="YouTube URL (any form) or video ID")
+    p_get.add_argument("--language", "-l", default=None)
+    p_get.add_argument("--kind", choices=KINDS, default="lesson")
+
+    p_search = sub.add_parser("search", help="Keyword search across lessons and transcripts")
+    p_search.add_argument("query")
+    p_search.add_argument("--limit", type=int, default=10)
+    p_search.add_argument("--kind", choices=KINDS, default=None)
+    p_search.add_argument("--language", "-l", default=None)
+
+    args = parser.parse_args()
+    index = LessonIndex(args.db)
+
+    if args.command == "sync":
+        started = time.perf_counter()
+        added = sync_all(index)
+        stats = index.stats()
+        if args.json:
+            _print_json({"added": added, "totals": stats})
+        else:
+            print(
+                f"✓ Indexed {sum(added.values())} new/changed document(s) "
+                f"({', '.join(f'{k}: {v}' for k, v in added.items())}) "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+            print(f"   {stats['videos']} videos, {stats['lesson']} lessons, {stats['transcript']} transcripts")
+        return 0
+
+    if args.command == "get":
+        from quickstart import extract_video_id
+
+        try:
+            video_id = extract_video_id(args.url)
+        except ValueError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 2
+        docs = index.lookup(video_id, args.language, args.kind)
+        if args.json:
+            _print_json(docs[0] if docs else {"error": f"No {args.kind} indexed for {video_id}"})
+        elif docs:
+            print(docs[0]["body"])
+        else:
+            print(f"(no {args.kind} indexed for {video_id})", file=sys.stderr)
+        return 0 if docs else 1
+
+    hits = index.search(args.query, args.limit, args.kind, args.language)
+    if args.json:
+        _print_json(hits)
+        return 0
+    if not hits:
+        print("(no matches)")
+    for hit in hits:
+        title = f" - {hit['title']}" if hit["title"] else ""
+        print(f"{hit['video_id']} [{hit['kind']}/{hit['section']}]{title}")
+        print(f"    {hit['snippet']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Xuất kết quả dạng máy đọc được (--format json | ndjson).
+
+- text   : như cũ, kết quả nằm giữa các dòng "=====" trên stdout
+- json   : mọi dòng tiến trình chuyển sang stderr, stdout chỉ có một object JSON
+- ndjson : stdout là các dòng JSON {"event": ...} cho từng bước, dòng cuối là
+           {"event": "result", ...}; tiến trình dạng chữ vẫn đi ra stderr
+
+Bài học markdown được tách thành các phần (title, objectives, concepts, ...)
+để web / service phía sau không phải tự parse lại.
+"""
+
+import contextlib
+import json
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+FORMATS = ("text", "json", "ndjson")
+
+# (khóa chuẩn, các từ khóa nhận diện trong heading) - kiểm tra theo thứ tự
+_SECTION_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("title", ("tiêu đề", "title")),
+    ("objectives", ("mục tiêu", "objective")),
+    ("concepts", ("khái niệm", "concept")),
+    ("content", ("nội dung", "content")),
+    ("examples", ("ví dụ", "example")),
+    ("steps", ("bước", "step")),
+    ("tips", ("tips", "lưu ý", "mẹo")),
+    ("summary", ("tóm tắt", "summary")),
+    ("questions", ("câu hỏi", "question")),
+]
+
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.*?)\s*#*\s*$")
+_LEADING_SYMBOLS_RE = re.compile(r"^[^\w]+", re.UNICODE)
+
+
+def _section_key(heading: str) -> str:
+    lower = heading.lower()
+    for key, keywords in _SECTION_KEYWORDS:
+        if any(k in lower for k in keywords):
+            return key
+    slug = re.sub(r"[^\w]+", "_", _LEADING_SYMBOLS_RE.sub("", lower), flags=re.UNICODE)
+    return slug.strip("_") or "section"
+
+
+def split_lesson_sections(markdown: str) -> Dict[str, str]:
+    """
+    Tách bài học markdown theo heading (#, ##, ###) thành {khóa: nội dung}.
+    "title" là dòng đầu tiên trong phần tiêu đề (hoặc chính heading nếu phần đó rỗng).
+    """
+    sections: Dict[str, str] = {}
+    current: Optional[str] = None
+    title_heading = ""
+    buffer: List[str] = []
+
+    def flush() -> None:
+        if current is not None:
+            body = "\n".join(buffer).strip()
+            if current in sections and body:
+                sections[current] = sections[current] + "\n\n" + body
+            elif body or current not in sections:
+                sections[current] = body
+
+    for line in (markdown or "").splitlines():
+        m = _HEADING_RE.match(line.strip())
+        if m and (len(m.group(1)) <= 2 or current is None):
+            flush()
+            heading = m.group(2)
+            current = "title" if (len(m.group(1)) == 1 and "title" not in sections) else _section_key(heading)
+            if current == "title":
+                title_heading = _LEADING_SYMBOLS_RE.sub("", heading).strip()
+            buffer = []
+        elif current is not None:
+            buffer.append(line)
+    flush()
+
+    title_body = sections.get("title", "")
+    first_line = next((l.strip() for l in title_body.splitlines() if l.strip()), "")
+    if first_line.startswith("[") and first_line.endswith("]"):
+        first_line = ""  # chỗ giữ chỗ như "[Tạo tiêu đề hấp dẫn]"
+    title = first_line.strip("*_ ") or title_heading
+    if title:
+        sections["title"] = title
+    return sections
+
+
+class OutputWriter:
+    """Gom sự kiện tiến trình + kết quả cuối cùng theo --format."""
+
+    def __init__(self, fmt: str = "text", stream: Optional[TextIO] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+        self.format = fmt
+        self.stream = stream or sys.stdout
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self._stage_started = self.started
+
+    @property
+    def structured(self) -> bool:
+        return self.format != "text"
+
+    @contextlib.contextmanager
+    def progress_to_stderr(self) -> Iterator[None]:
+        """Ở chế độ json/ndjson, mọi print() tiến trình đi ra stderr."""
+        if not self.structured:
+            yield
+            return
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+
+    def stage(self, name: str, **data) -> None:
+        """Ghi thời gian của bước vừa xong; ndjson thì phát một dòng sự kiện."""
+        now = time.perf_counter()
+        self.timings[name] = round(now - self._stage_started, 3)
+        self._stage_started = now
+        if self.format == "ndjson":
+            self._write({"event": "stage", "stage": name, "seconds": self.timings[name], **data})
+
+    def error(self, message: str, **data) -> None:
+        if self.structured:
+            record = {"event": "error", "error": message, **data}
+            if self.format == "json":
+                record.pop("event")
+                record["ok"] = False
+            self._write(record)
+
+    def result(self, markdown: str, **data) -> None:
+        record = {
+            "ok": True,
+            **data,
+            "sections": split_lesson_sections(markdown),
+            "markdown": markdown,
+            "timings": dict(self.timings, total=round(time.perf_counter() - self.started, 3)),
+        }
+        if self.format == "ndjson":
+            record = {"event": "result", **record}
+        self._write(record, indent=2 if self.format == "json" else None)
+
+    def _write(self, record: dict, indent: Optional[int] = None) -> None:
+        self.stream.write(json.dumps(record, ensure_ascii=False, indent=indent) + "\n")
+        self.stream.flush()
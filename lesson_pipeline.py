@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Một pipeline cho mọi backend: lấy transcript -> backend.generate -> bài học.
+
+  python lesson_pipeline.py --url URL --backend local     # model HF local
+  python lesson_pipeline.py --url URL --backend gemini    # Gemini API
+  python lesson_pipeline.py --url URL --backend stub      # giả lập, không cần model / API key
+  python lesson_pipeline.py --url URL --backend auto      # router chọn theo tải + độ trễ
+
+Với --backend auto, router đọc độ sâu hàng đợi local và lịch sử độ trễ từ
+job_service (runs/jobs.sqlite3) nếu có. Gemini bị rate limit thì tự chạy lại
+bằng local.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from backends import BACKEND_NAMES, RateLimited, Router, get_backend
+from cancellation import make_cli_token
+from lesson_output import FORMATS, OutputWriter
+from quickstart import extract_video_id, fetch_transcript
+from transcript import parse_timestamp
+
+
+def build_router() -> Router:
+    """Router dùng số liệu của hàng đợi job (nếu đã có DB)."""
+    from job_service import DEFAULT_DB_PATH, JobService, make_router
+
+    if not os.path.exists(DEFAULT_DB_PATH):
+        return Router(queue_depth=lambda: 0)
+    return make_router(JobService(DEFAULT_DB_PATH))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a lesson with a pluggable backend")
+    parser.add_argument("--url", required=True, help="YouTube URL or video ID")
+    parser.add_argument("--language", "-l", default="vi")
+    parser.add_argument("--backend", choices=BACKEND_NAMES + ("auto",), default="auto")
+    parser.add_argument("--start", type=parse_timestamp, default=None)
+    parser.add_argument("--end", type=parse_timestamp, default=None)
+    parser.add_argument("--deadline", type=float, default=None)
+    parser.add_argument("--delay", type=float, default=0.0, help="Simulated work time for --backend stub")
+    parser.add_argument("--output", "-o", help="Write the lesson to this file")
+    parser.add_argument("--format", choices=FORMATS, default="text")
+    args = parser.parse_args()
+
+    writer = OutputWriter(args.format)
+    with writer.progress_to_stderr():
+        return _run(args, writer)
+
+
+def _run(args: argparse.Namespace, writer: OutputWriter) -> int:
+    cancel = make_cli_token(args.deadline)
+    try:
+        video_id = extract_video_id(args.url)
+        transcript = fetch_transcript(video_id, args.language).slice_time(args.start, args.end)
+    except Exception as e:
+        print(f"✗ {e}")
+        writer.error(str(e))
+        return 1
+    if not transcript:
+        writer.error("Empty transcript", video_id=video_id)
+        return 1
+    writer.stage("transcript", words=transcript.word_count)
+
+    router = build_router() if args.backend == "auto" else None
+    backend_name = router.choose() if router else args.backend
+    print(f"🔀 Backend: {backend_name}")
+    params = {"cancel": cancel, "delay": args.delay}
+
+    started = time.perf_counter()
+    try:
+        try:
+            lesson = get_backend(backend_name).generate(transcript, args.language, **params)
+        except RateLimited:
+            fallback = router.fallback(backend_name) if router else None
+            if fallback is None:
+                raise
+            router.record(backend_name, time.perf_counter() - started, ok=False, rate_limited=True)
+            print(f"↪ {backend_name} rate limited, retrying with {fallback}")
+            backend_name = fallback
+            lesson = get_backend(backend_name).generate(transcript, args.language, **params)
+    except Exception as e:
+        print(f"✗ {e}")
+        writer.error(
+            str(e), video_id=video_id, backend=backend_name, rate_limited=isinstance(e, RateLimited)
+        )
+        return 1
+    writer.stage("generate", backend=backend_name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(lesson)
+        print(f"💾 Saved to {args.output}")
+    if writer.structured:
+        writer.result(
+            lesson,
+            video_id=video_id,
+            language=args.language,
+            backend=backend_name,
+            cancelled=cancel.reason if cancel.cancelled else None,
+        )
+    elif not args.output:
+        print("\n" + "=" * 60)
+        print(lesson)
+        print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+Load test cho đường đi của một request bài học, từ đầu tới cuối.
+
+Gửi request theo đúng cách web/index.php làm:
+  --mode direct : mỗi request chạy script backend (như index.php khi job_queue = false)
+                  python <script> --url ... --language ... --format json --deadline 270
+  --mode queue  : job_service.py submit, rồi hỏi job_service.py status mỗi --poll giây
+                  tới khi xong (như index.php khi job_queue = true); tự chạy một worker
+                  với DB tạm, trừ khi có --db
+  --mode http   : POST form (url, language) tới một endpoint, vd. http://localhost/web/index.php
+
+Transcript lấy từ server YouTube giả lập (transcript_fetcher.StandInServer) chạy
+trong process này: fixture đã ghi bằng replay.py nếu có, không thì transcript
+sinh sẵn. Backend mặc định là stub (lesson_pipeline.py --backend stub) để đo
+riêng phần hàng đợi / process; dùng --backend local hoặc gemini (với
+LESSON_REPLAY=replay) để đo summarizer / Gemini.
+
+Tải:
+  --concurrency N          : N request chạy cùng lúc, xong cái này gửi cái kế (closed loop)
+  --rate R                 : R request/giây, đến theo phân phối Poisson (open loop);
+                             --concurrency khi đó là số request đang chạy tối đa
+  --requests / --duration  : dừng sau số request / số giây
+
+Báo cáo: throughput, p50/p95/p99 độ trễ, tỉ lệ lỗi, và CPU / RSS (toàn bộ cây
+process) theo thời gian. --json ghi thêm báo cáo + timeline ra file.
+
+Usage:
+  python loadtest.py --concurrency 8 --requests 200 --delay 0.5
+  python loadtest.py --mode queue --rate 4 --duration 120 --workers 4
+  python loadtest.py --mode direct --backend local --concurrency 2 --requests 10 --json local.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from backends import LatencyTracker
+from job_service import BACKEND_SCRIPTS, REPO_ROOT, build_command
+from memory_guard import rss_bytes
+
+
+WEB_DEADLINE = 270  # index.php: --deadline 270 (dừng trước set_time_limit(300))
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+# ---------- CPU / RSS của cả cây process ----------
+def _child_pids(pid: int) -> List[int]:
+    """Mọi process con / cháu của pid (psutil nếu có, /proc trên Linux)."""
+    try:
+        import psutil  # type: ignore
+
+        return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+    parents: Dict[int, List[int]] = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return []
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(name))
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """
+    CPU user + system (giây) của pid: psutil nếu có, /proc trên Linux, os.times()
+    cho chính process này. None nếu không đọc được (process đã kết thúc, hoặc
+    process con trên hệ không có /proc mà chưa cài psutil).
+    """
+    try:
+        import psutil  # type: ignore
+
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if pid == os.getpid():
+        times = os.times()
+        return times.user + times.system
+    return None
+
+
+def _can_see_children() -> bool:
+    try:
+        import psutil  # type: ignore  # noqa: F401
+
+        return True
+    except ImportError:
+        return os.path.isdir("/proc")
+
+
+def _cpu_snapshot(pids: List[int]) -> Dict[int, float]:
+    snapshot: Dict[int, float] = {}
+    for pid in pids:
+        seconds = _cpu_seconds(pid)
+        if seconds is not None:
+            snapshot[pid] = seconds
+    return snapshot
+
+
+class ResourceSampler:
+    """
+    Mỗi `interval` giây ghi lại CPU (% của một core, cộng cả cây process) và
+    RSS. CPU của process con đã kết thúc không đếm được, nên với request rất
+    ngắn con số CPU thấp hơn thực tế; RSS luôn là tổng tại thời điểm lấy mẫu.
+    """
+
+    def __init__(self, interval: float, status):
+        self.interval = interval
+        self.status = status
+        self.timeline: List[Dict] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._cpu: Dict[int, float] = {}
+
+    def start(self) -> None:
+        if not _can_see_children():
+            print("ℹ CPU/RSS of child processes cannot be read on this system (pip install psutil)")
+        # Mốc CPU ban đầu: mẫu đầu tiên chỉ tính CPU dùng trong khoảng đầu tiên
+        self._cpu = _cpu_snapshot([os.getpid()] + _child_pids(os.getpid()))
+        self.started = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            pids = [os.getpid()] + _child_pids(os.getpid())
+            # Process mới xuất hiện bắt đầu sau mẫu trước, nên tính từ 0
+            cpu_now = _cpu_snapshot(pids)
+            cpu_used = sum(seconds - self._cpu.get(pid, 0.0) for pid, seconds in cpu_now.items())
+            self._cpu = cpu_now
+            rss = sum(rss_bytes(pid) or 0 for pid in pids)
+            sample = {
+                "t": round(now - self.started, 1),
+                "cpu_percent": round(100.0 * max(0.0, cpu_used) / (now - last), 1),
+                "rss_mb": round(rss / 2**20, 1),
+                "processes": len(pids),
+                **self.status(),
+            }
+            last = now
+            self.timeline.append(sample)
+            print(
+                f"  t={sample['t']:>6.1f}s  in-flight={sample['in_flight']:<3} done={sample['done']:<5} "
+                f"errors={sample['errors']:<4} cpu={sample['cpu_percent']:>6.1f}%  rss={sample['rss_mb']:.0f} MB"
+            )
+
+
+# ---------- các cách gửi request ----------
+class Target:
+    """Gửi một request và chờ kết quả. Trả về (ok, mô tả lỗi)."""
+
+    def setup(self) -> None:
+        pass
+
+    def teardown(self) -> None:
+        pass
+
+    def request(self, video_id: str) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+
+def _run_cli(cmd: List[str], env: Dict[str, str], timeout: Optional[float] = None) -> Tuple[int, str, str]:
+    proc = subprocess.run(
+        cmd,
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        timeout=timeout,
+    )
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def _last_line(text: str) -> str:
+    lines = [line for line in (text or "").strip().splitlines() if line.strip()]
+    return lines[-1][:200] if lines else ""
+
+
+class DirectTarget(Target):
+    """Như index.php khi job_queue = false: chạy script backend cho mỗi request."""
+
+    def __init__(self, backend: str, language: str, params: Dict, env: Dict[str, str]):
+        self.backend = backend
+        self.language = language
+        self.params = params
+        self.env = env
+
+    def request(self, video_id: str) -> Tuple[bool, str]:
+        job = {"backend": self.backend, "video_id": video_id, "language": self.language, "params": self.params}
+        code, stdout, stderr = _run_cli(build_command(job, deadline=WEB_DEADLINE), self.env, WEB_DEADLINE + 30)
+        try:
+            record = json.loads(stdout)
+        except ValueError:
+            record = None
+        if code != 0:
+            error = record.get("error") if isinstance(record, dict) else None
+            return False, _last_line(error or stderr) or f"exit code {code}"
+        if not isinstance(record, dict):
+            return False, "invalid JSON on stdout"
+        return bool(record.get("ok", True)), record.get("error") or ""
+
+
+class QueueTarget(Target):
+    """Như index.php khi job_queue = true: submit rồi hỏi status cho tới khi xong."""
+
+    def __init__(
+        self,
+        backend: str,
+        language: str,
+        params: Dict,
+        env: Dict[str, str],
+        poll: float,
+        db: Optional[str],
+        workers: int,
+    ):
+        self.backend = backend
+        self.language = language
+        self.params = params
+        self.env = env
+        self.poll = poll
+        self.workers = workers
+        self.own_db = db is None
+        self.tmpdir = tempfile.mkdtemp(prefix="loadtest-") if db is None else None
+        self.db = db or os.path.join(self.tmpdir, "jobs.sqlite3")
+        self.worker: Optional[subprocess.Popen] = None
+
+    def _cli(self, *args: str) -> Dict:
+        cmd = [sys.executable, os.path.join(REPO_ROOT, "job_service.py"), "--db", self.db, *args]
+        code, stdout, stderr = _run_cli(cmd, self.env, 60)
+        try:
+            return json.loads(stdout)
+        except ValueError:
+            return {"error": _last_line(stderr) or f"exit code {code}"}
+
+    def setup(self) -> None:
+        if not self.own_db:
+            return
+        self.worker = subprocess.Popen(
+            [sys.executable, os.path.join(REPO_ROOT, "job_service.py"), "--db", self.db,
+             "worker", "--workers", str(self.workers), "--poll-interval", "0.2"],
+            cwd=REPO_ROOT,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        print(f"✓ Worker started ({self.workers} workers, DB {self.db})")
+
+    def teardown(self) -> None:
+        if self.worker is not None:
+            self.worker.terminate()
+            try:
+                self.worker.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.worker.kill()
+        if self.tmpdir:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def request(self, video_id: str) -> Tuple[bool, str]:
+        args = ["submit", "--url", video_id, "--language", self.language, "--backend", self.backend]
+        for name, value in self.params.items():
+            args += ["--param", f"{name}={value}"]
+        submitted = self._cli(*args)
+        job_id = submitted.get("job_id")
+        if not job_id:
+            return False, submitted.get("error", "submit failed")
+        status = submitted.get("status")
+        while status not in TERMINAL_STATUSES:
+            time.sleep(self.poll)
+            job = self._cli("status", job_id)
+            if "error" in job and "status" not in job:
+                return False, job["error"]
+            status = job.get("status")
+            error = job.get("error") or ""
+        if status != "done":
+            return False, _last_line(error) or status
+        return True, ""
+
+
+class HttpTarget(Target):
+    """POST form như trình duyệt gửi tới index.php (hoặc service sau này)."""
+
+    def __init__(self, endpoint: str, language: str):
+        self.endpoint = endpoint
+        self.language = language
+
+    def request(self, video_id: str) -> Tuple[bool, str]:
+        data = urllib.parse.urlencode({"url": f"https://youtu.be/{video_id}", "language": self.language}).encode()
+        try:
+            with urllib.request.urlopen(self.endpoint, data=data, timeout=WEB_DEADLINE + 30) as response:
+                response.read()
+                return 200 <= response.status < 300, ""
+        except Exception as e:
+            return False, str(e)[:200]
+
+
+# ---------- bộ tạo tải ----------
+class LoadGenerator:
+    def __init__(
+        self,
+        target: Target,
+        concurrency: int,
+        rate: Optional[float],
+        total: Optional[int],
+        duration: Optional[float],
+        videos: int,
+        seed: Optional[int] = None,
+    ):
+        self.target = target
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.total = total
+        self.duration = duration
+        self.videos = videos
+        self.rng = random.Random(seed)
+        self.latency = LatencyTracker(window=10**7)
+        self.results: List[Dict] = []
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._in_flight = 0
+        self._slots = threading.Semaphore(self.concurrency)
+
+    def video_id(self, n: int) -> str:
+        # --videos 0: mỗi request một video riêng (không bị gộp job / dùng lại kết quả)
+        key = n % self.videos if self.videos else n
+        return f"lt{key:09d}"
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "done": len(self.results),
+                "errors": sum(self.errors.values()),
+            }
+
+    def _next(self) -> Optional[int]:
+        with self._lock:
+            if self.total is not None and self._issued >= self.total:
+                return None
+            if self.duration is not None and time.monotonic() - self.started >= self.duration:
+                return None
+            self._issued += 1
+            return self._issued - 1
+
+    def _one(self, n: int) -> None:
+        with self._lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            ok, error = self.target.request(self.video_id(n))
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            self.results.append({"n": n, "ok": ok, "seconds": round(elapsed, 3)})
+            if ok:
+                self.latency.record("ok", elapsed)
+            else:
+                self.errors[error or "error"] = self.errors.get(error or "error", 0) + 1
+            self.latency.record("all", elapsed)
+
+    def run(self) -> float:
+        self.started = time.monotonic()
+        threads: List[threading.Thread] = []
+        if self.rate:
+            # Open loop: request đến theo Poisson, không chờ request trước xong
+            while True:
+                n = self._next()
+                if n is None:
+                    break
+                self._slots.acquire()
+
+                def task(n: int = n) -> None:
+                    try:
+                        self._one(n)
+                    finally:
+                        self._slots.release()
+
+                thread = threading.Thread(target=task, daemon=True)
+                thread.start()
+                threads.append(thread)
+                time.sleep(self.rng.expovariate(self.rate))
+        else:
+            # Closed loop: mỗi "người dùng" gửi request kế tiếp ngay khi xong
+            def user() -> None:
+                while True:
+                    n = self._next()
+                    if n is None:
+                        return
+                    self._one(n)
+
+            threads = [threading.Thread(target=user, daemon=True) for _ in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - self.started
+
+    def report(self, wall: float) -> Dict:
+        done = len(self.results)
+        failed = sum(self.errors.values())
+
+        def pct(name: str, q: float) -> Optional[float]:
+            value = self.latency.percentile(name, q)
+            return round(value, 3) if value is not None else None
+
+        return {
+            "requests": done,
+            "ok": done - failed,
+            "errors": failed,
+            "error_rate": round(failed / done, 4) if done else 0.0,
+            "wall_seconds": round(wall, 2),
+            "throughput_rps": round(done / wall, 3) if wall > 0 else 0.0,
+            "latency": {
+                name: {"p50": pct(name, 50), "p95": pct(name, 95), "p99": pct(name, 99), "max": pct(name, 100)}
+                for name in ("ok", "all")
+                if self.latency.count(name)
+            },
+            "error_kinds": dict(sorted(self.errors.items(), key=lambda kv: -kv[1])[:10]),
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test for lesson requests")
+    parser.add_argument("--mode", choices=["direct", "queue", "http"], default="direct")
+    parser.add_argument("--backend", choices=sorted(BACKEND_SCRIPTS) + ["auto"], default="stub")
+    parser.add_argument("--language", "-l", default="vi")
+    parser.add_argument("--delay", type=float, default=0.5, help="Simulated work per request for --backend stub (seconds)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Concurrent requests (max in flight with --rate)")
+    parser.add_argument("--rate", type=float, default=None, help="Open-loop arrival rate (requests/second, Poisson)")
+    parser.add_argument("--requests", "-n", type=int, default=None, help="Stop after this many requests (default 50)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop issuing requests after this many seconds")
+    parser.add_argument("--videos", type=int, default=0, help="Distinct video IDs to cycle through (0 = one per request)")
+    parser.add_argument("--poll", type=float, default=2.0, help="--mode queue: status poll interval (index.php uses 2s)")
+    parser.add_argument("--workers", type=int, default=2, help="--mode queue: worker threads of the spawned worker")
+    parser.add_argument("--db", default=None, help="--mode queue: use this job DB and an already running worker")
+    parser.add_argument("--endpoint", default=None, help="--mode http: URL to POST to")
+    parser.add_argument("--transcript-latency", type=float, default=0.05, help="Stand-in YouTube delay per HTTP request")
+    parser.add_argument("--sample-interval", type=float, default=2.0, help="CPU/RSS sampling period (seconds)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", metavar="PATH", help="Write the report and the CPU/RSS timeline to this file")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        args.requests = 50
+    if args.mode == "http" and not args.endpoint:
+        parser.error("--mode http needs --endpoint")
+    if args.mode == "direct" and args.backend == "auto":
+        parser.error("--backend auto is only routed by the job queue; use --mode queue")
+
+    from replay import fixtures_dir
+    from transcript_fetcher import StandInServer
+
+    standin = StandInServer(latency=args.transcript_latency, fixtures_dir=fixtures_dir())
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", LESSON_YOUTUBE_BASE_URL=standin.start())
+    params = {"delay": args.delay} if args.backend == "stub" else {}
+
+    if args.mode == "direct":
+        target: Target = DirectTarget(args.backend, args.language, params, env)
+    elif args.mode == "queue":
+        target = QueueTarget(args.backend, args.language, params, env, args.poll, args.db, args.workers)
+    else:
+        target = HttpTarget(args.endpoint, args.language)
+
+    load = (
+        f"rate={args.rate}/s (max {args.concurrency} in flight)" if args.rate else f"concurrency={args.concurrency}"
+    )
+    limit = f"{args.requests} requests" if args.requests is not None else f"{args.duration}s"
+    print(f"🚦 Load test: mode={args.mode} backend={args.backend} {load}, {limit}")
+    print(f"   Stand-in YouTube at {standin.base_url}\n")
+
+    generator = LoadGenerator(
+        target, args.concurrency, args.rate, args.requests, args.duration, args.videos, args.seed
+    )
+    sampler = ResourceSampler(args.sample_interval, generator.status)
+    target.setup()
+    try:
+        sampler.start()
+        wall = generator.run()
+    finally:
+        sampler.stop()
+        target.teardown()
+        standin.stop()
+
+    report = generator.report(wall)
+    peak_rss = max((s["rss_mb"] for s in sampler.timeline), default=None)
+    peak_cpu = max((s["cpu_percent"] for s in sampler.timeline), default=None)
+    report["peak_rss_mb"] = peak_rss
+    report["peak_cpu_percent"] = peak_cpu
+
+    print("\n" + "=" * 60)
+    print(f"Requests   : {report['requests']} ({report['errors']} errors, {report['error_rate'] * 100:.1f}%)")
+    print(f"Throughput : {report['throughput_rps']:.2f} req/s over {report['wall_seconds']:.1f}s")
+    for name, lat in report["latency"].items():
+        print(
+            f"Latency {name:<3}: p50 {lat['p50']:.2f}s  p95 {lat['p95']:.2f}s  "
+            f"p99 {lat['p99']:.2f}s  max {lat['max']:.2f}s"
+        )
+    if peak_rss is not None:
+        print(f"Peak       : CPU {peak_cpu:.0f}%  RSS {peak_rss:.0f} MB")
+    for error, count in report["error_kinds"].items():
+        print(f"  ✗ {count}x {error}")
+    print("=" * 60)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"config": vars(args), "report": report, "timeline": sampler.timeline, "requests": generator.results},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"💾 Report saved to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
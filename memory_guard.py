@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Giới hạn bộ nhớ (--max-rss) cho các job dài.
+
+MemoryGuard đọc RSS hiện tại của process (psutil nếu có, /proc trên Linux).
+Khi RSS vượt ~85% giới hạn, nơi gọi giảm batch size (summarize_text) hoặc
+ngừng nhận thêm job (worker trong job_service.py) cho tới khi bộ nhớ giảm.
+Nếu không đọc được RSS trên hệ điều hành hiện tại thì guard không làm gì.
+"""
+
+import gc
+import sys
+from typing import Iterable, Optional
+
+
+SOFT_LIMIT_RATIO = 0.85
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """RSS hiện tại của process `pid` (mặc định process này), None nếu không đọc được."""
+    try:
+        import psutil  # type: ignore
+
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def total_rss_bytes(pids: Iterable[int]) -> int:
+    return sum(rss_bytes(pid) or 0 for pid in pids)
+
+
+class MemoryGuard:
+    def __init__(self, max_rss_mb: Optional[float]):
+        self.limit = int(max_rss_mb * 1024 * 1024) if max_rss_mb else None
+        self.enabled = self.limit is not None and rss_bytes() is not None
+        if self.limit is not None and not self.enabled:
+            print("ℹ --max-rss ignored: cannot read process memory on this system (pip install psutil)")
+
+    @property
+    def soft_limit(self) -> Optional[int]:
+        return int(self.limit * SOFT_LIMIT_RATIO) if self.limit else None
+
+    def under_pressure(self) -> bool:
+        """True nếu RSS đã vượt ngưỡng mềm (sau khi thử gc một lần)."""
+        if not self.enabled:
+            return False
+        if (rss_bytes() or 0) < self.soft_limit:
+            return False
+        self.release()
+        return (rss_bytes() or 0) >= self.soft_limit
+
+    @staticmethod
+    def release() -> None:
+        """Trả bộ nhớ rảnh: gc + cache CUDA (nếu torch đã được load)."""
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def describe(self) -> str:
+        rss = rss_bytes() or 0
+        return f"{rss / 2**20:.0f}/{self.limit / 2**20:.0f} MB" if self.limit else f"{rss / 2**20:.0f} MB"
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Kho model local để khởi động nhanh, không cần mạng.
+
+`python model_store.py prefetch` tải trước các model đang dùng, lưu dưới dạng
+safetensors (kèm tokenizer) vào models/<tên model>/. Khi đó build_summarizer
+load thẳng từ thư mục này với local_files_only + low_cpu_mem_usage: file
+safetensors được mmap nên thời gian khởi động chỉ phụ thuộc tốc độ đọc đĩa, và
+nhiều process (worker, web) dùng chung page cache thay vì mỗi process một bản.
+
+Chế độ offline (--offline hoặc LESSON_OFFLINE=1): không bao giờ gọi Hugging
+Face Hub; model chưa có trong kho (hoặc cache HF) sẽ báo lỗi ngay.
+
+Thư mục kho: biến môi trường LESSON_MODEL_STORE, mặc định <repo>/models.
+
+Usage:
+  python model_store.py prefetch                      # model mặc định + model trong inference profile
+  python model_store.py prefetch t5-small facebook/bart-large-cnn
+  python model_store.py list
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(REPO_ROOT, "models")
+
+# Model mặc định của quickstart.py / create_lesson.py
+DEFAULT_MODELS = ("sshleifer/distilbart-cnn-12-6",)
+
+_offline = False
+
+
+def store_dir() -> str:
+    return os.environ.get("LESSON_MODEL_STORE") or DEFAULT_STORE_DIR
+
+
+def set_offline(enabled: bool = True) -> None:
+    """
+    Bật chế độ chỉ dùng file local. Đặt luôn HF_HUB_OFFLINE để thư viện HF
+    không thử kết nối (phải gọi trước khi import transformers).
+    """
+    global _offline
+    _offline = enabled
+    if enabled:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+
+def is_offline() -> bool:
+    return _offline or os.environ.get("LESSON_OFFLINE", "") not in ("", "0")
+
+
+def model_dir(model_name: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or store_dir(), model_name.replace("/", "--"))
+
+
+def local_model_path(model_name: str, root: Optional[str] = None) -> Optional[str]:
+    """Thư mục model trong kho nếu đã prefetch xong, ngược lại None."""
+    if os.path.isdir(model_name):
+        return model_name  # đã là đường dẫn local
+    path = model_dir(model_name, root)
+    if os.path.exists(os.path.join(path, "store.json")):
+        return path
+    return None
+
+
+def resolve_model(model_name: str) -> Tuple[str, Dict]:
+    """
+    (đường dẫn hoặc tên model, kwargs cho from_pretrained). Model trong kho
+    được load bằng mmap, không qua mạng.
+    """
+    path = local_model_path(model_name)
+    if path is not None:
+        return path, {"local_files_only": True, "low_cpu_mem_usage": True}
+    if is_offline():
+        return model_name, {"local_files_only": True, "low_cpu_mem_usage": True}
+    return model_name, {}
+
+
+def configured_models() -> List[str]:
+    """Model mặc định + model đã dùng khi chạy autotune (nếu có)."""
+    models = list(DEFAULT_MODELS)
+    from inference_profile import profile_path
+
+    try:
+        with open(profile_path(), "r", encoding="utf-8") as f:
+            tuned = json.load(f).get("tuned", {}).get("model")
+    except (OSError, ValueError):
+        tuned = None
+    if tuned and tuned not in models:
+        models.append(tuned)
+    return models
+
+
+def prefetch(model_name: str, root: Optional[str] = None, force: bool = False) -> str:
+    """Tải model + tokenizer và lưu vào kho dưới dạng safetensors."""
+    target = model_dir(model_name, root)
+    if not force and local_model_path(model_name, root):
+        print(f"✓ {model_name} already in store ({target})")
+        return target
+
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    print(f"⏳ Fetching {model_name}...")
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name, low_cpu_mem_usage=True)
+
+    # Ghi vào thư mục tạm rồi đổi tên, process khác không bao giờ thấy kho ghi dở
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    model.save_pretrained(tmp, safe_serialization=True)
+    tokenizer.save_pretrained(tmp)
+    with open(os.path.join(tmp, "store.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"model": model_name, "format": "safetensors", "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S")},
+            f,
+            indent=2,
+        )
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+
+    size = sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, names in os.walk(target)
+        for name in names
+    )
+    print(f"✓ {model_name} → {target} ({size / 1e6:.0f} MB, {time.perf_counter() - started:.1f}s)")
+    return target
+
+
+def list_store(root: Optional[str] = None) -> List[Dict]:
+    root = root or store_dir()
+    if not os.path.isdir(root):
+        return []
+    entries = []
+    for name in sorted(os.listdir(root)):
+        meta_path = os.path.join(root, name, "store.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entries.append(dict(json.load(f), path=os.path.join(root, name)))
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prefetch models into the local safetensors store")
+    parser.add_argument("--store", default=None, help=f"Store directory (default: {store_dir()})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_fetch = sub.add_parser("prefetch", help="Download models and save them as safetensors")
+    p_fetch.add_argument("models", nargs="*", help="Model names (default: configured models)")
+    p_fetch.add_argument("--force", action="store_true", help="Re-download even if already in the store")
+
+    sub.add_parser("list", help="Show models in the store")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_store(args.store)
+        if not entries:
+            print("(store is empty)")
+        for entry in entries:
+            print(f"{entry['model']:<45} {entry['fetched_at']}  {entry['path']}")
+        return 0
+
+    failed = 0
+    for model_name in args.models or configured_models():
+        try:
+            prefetch(model_name, args.store, force=args.force)
+        except Exception as e:
+            print(f"✗ {model_name}: {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
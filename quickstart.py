@@ -11,6 +11,9 @@ Usage examples:
   # Tóm tắt bình thường
   python quickstart.py --url https://www.youtube.com/watch?v=8Jx6gN7ZFKk --mode plain --combine
 
+  # Chỉ tóm tắt một đoạn của video (từ phút 10 đến phút 25)
+  python quickstart.py --url https://www.youtube.com/watch?v=8Jx6gN7ZFKk --start 10:00 --end 25:00
+
 Requirements (install first):
   pip install youtube-transcript-api transformers torch
 """
@@ -18,16 +21,25 @@ Requirements (install first):
 import argparse
 import re
 import sys
-from typing import List
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from urllib.parse import urlparse, parse_qs
 
 from youtube_transcript_api import (
-    YouTubeTranscriptApi,
     TranscriptsDisabled,
     NoTranscriptFound,
 )
 
+from cancellation import CancelToken, make_cli_token
+from evidence import extract_key_points, select_section_evidence, split_note_units
+from inference_profile import apply_thread_settings, load_profile, prepare_model
+from lesson_output import FORMATS, OutputWriter
+from memory_guard import MemoryGuard
+from model_store import resolve_model, set_offline
+from transcript import Transcript, TranscriptSpan, parse_timestamp
+from transcript_fetcher import get_fetcher
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -36,6 +48,11 @@ def parse_args() -> argparse.Namespace:
     src = parser.add_mutually_exclusive_group(required=True)
     src.add_argument("--url", type=str, help="YouTube video URL")
     src.add_argument("--id", dest="video_id", type=str, help="YouTube video ID")
+    src.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Continue an interrupted --journal run (reuses its transcript and settings)",
+    )
 
     parser.add_argument(
         "--language",
@@ -48,6 +65,24 @@ def parse_args() -> argparse.Namespace:
         default="sshleifer/distilbart-cnn-12-6",  # Mô hình nhỏ hơn, nhanh hơn
         help="Transformers summarization model (t5-small=fast, sshleifer/distilbart-cnn-12-6=balanced, facebook/bart-large-cnn=best quality but slow)",
     )
+    parser.add_argument(
+        "--map-model",
+        default=None,
+        help="Model for the per-chunk step (many calls, e.g. t5-small). Default: --model",
+    )
+    parser.add_argument(
+        "--reduce-model",
+        default=None,
+        help="Model for the combine/lesson-section step (few calls, e.g. facebook/bart-large-cnn). Default: --model",
+    )
+    parser.add_argument(
+        "--draft-model",
+        default=None,
+        help=(
+            "Small model with the same tokenizer for assisted decoding, e.g. sshleifer/distilbart-cnn-12-6 "
+            "with --model facebook/bart-large-cnn (greedy, num_beams=1)"
+        ),
+    )
     parser.add_argument(
         "--min-length",
         type=int,
@@ -63,8 +98,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--chunk-words",
         type=int,
-        default=300,  # Giảm từ 400 xuống 300 cho nhanh hơn
-        help="Approx word count per chunk before summarization (lower=faster but more chunks)",
+        default=None,  # None = lấy từ inference profile (mặc định 300, xem autotune.py)
+        help="Approx word count per chunk before summarization (lower=faster but more chunks). Default: inference profile",
+    )
+    parser.add_argument(
+        "--chunking",
+        choices=["words", "topics"],
+        default="words",
+        help=(
+            "words = fixed --chunk-words chunks, "
+            "topics = cut at topic shifts (TextTiling), --chunk-words is the minimum size"
+        ),
     )
     parser.add_argument(
         "--combine",
@@ -80,6 +124,63 @@ def parse_args() -> argparse.Namespace:
             "lesson = structured lesson-style output (slower, more detailed)"
         ),
     )
+    parser.add_argument(
+        "--outputs",
+        type=parse_outputs,
+        default=None,
+        metavar="KINDS",
+        help=(
+            "Several results from one run, e.g. plain,lesson,key_points "
+            "(chunks are summarized once and shared; implies --combine, overrides --mode)"
+        ),
+    )
+    parser.add_argument(
+        "--start",
+        type=parse_timestamp,
+        default=None,
+        help="Only summarize from this time (seconds, mm:ss or h:mm:ss)",
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_timestamp,
+        default=None,
+        help="Only summarize up to this time (seconds, mm:ss or h:mm:ss)",
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="Checkpoint each finished chunk/section under runs/<RUN_ID>/ so the run can be resumed",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Growing transcript (e.g. livestream VOD): reuse chunk summaries from the previous run "
+        "of this video and only summarize new snippets (state in runs/streams/)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="text = banner output, json/ndjson = structured result on stdout, progress on stderr",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Stop generation after this many seconds and return the partial result (SIGTERM does the same)",
+    )
+    parser.add_argument(
+        "--max-rss",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Memory limit: lower the map batch size when the process RSS gets close to it",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never contact the Hugging Face Hub; load models from the local store (python model_store.py prefetch)",
+    )
     return parser.parse_args()
 
 
@@ -115,46 +216,94 @@ def extract_video_id(url_or_id: str) -> str:
     raise ValueError("Could not extract a valid YouTube video ID from input.")
 
 
-def fetch_transcript_text(video_id: str, preferred_language: str) -> str:
+def fetch_transcript(video_id: str, preferred_language: str) -> Transcript:
     """
-    Lấy transcript bằng youtube-transcript-api (API mới):
-    - Dùng YouTubeTranscriptApi().fetch(video_id, languages=[...])
-    - Trả về 1 chuỗi text nối từ các snippet.
+    Lấy transcript bằng youtube-transcript-api qua TranscriptFetcher dùng chung
+    (một HTTP session, một lần gọi list() rồi chọn bản tốt nhất, xem
+    transcript_fetcher.py). Trả về Transcript giữ nguyên timestamp của từng snippet.
     """
-    langs: List[str] = []
-    if preferred_language:
-        langs.append(preferred_language)
-    for l in ("vi", "vi-VN", "en", "en-US", "en-GB"):
-        if l not in langs:
-            langs.append(l)
-
-    api = YouTubeTranscriptApi()
-
     try:
-        fetched = api.fetch(video_id, languages=langs)
-        raw_entries = fetched.to_raw_data()
-        return " ".join(
-            _clean_text(e.get("text", "")) for e in raw_entries if e.get("text")
-        )
+        return get_fetcher().fetch(video_id, preferred_language)
     except (NoTranscriptFound, TranscriptsDisabled):
         raise
     except Exception as e:
         raise RuntimeError(f"No usable transcript found: {e}")
 
 
+def fetch_transcript_text(video_id: str, preferred_language: str) -> str:
+    """Trả về 1 chuỗi text nối từ các snippet (bỏ timestamp)."""
+    return fetch_transcript(video_id, preferred_language).text
+
+
 def _clean_text(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
 
+_WORD_RE = re.compile(r"\S+")
+
+
+def iter_chunks_by_words(text: str, chunk_words: int) -> Iterator[str]:
+    """
+    Như chunk_by_words nhưng sinh từng chunk một (không tách toàn bộ text
+    thành list từ), dùng cho transcript rất dài.
+    """
+    chunk_words = max(1, chunk_words)
+    words: List[str] = []
+    for m in _WORD_RE.finditer(text):
+        words.append(m.group())
+        if len(words) == chunk_words:
+            yield " ".join(words)
+            words = []
+    if words:
+        yield " ".join(words)
+
+
+def count_word_chunks(text: str, chunk_words: int) -> int:
+    words = sum(1 for _ in _WORD_RE.finditer(text))
+    return -(-words // max(1, chunk_words))
+
+
 def chunk_by_words(text: str, chunk_words: int) -> List[str]:
-    words = text.split()
-    if not words:
-        return []
-    chunks: List[str] = []
-    for i in range(0, len(words), chunk_words):
-        chunks.append(" ".join(words[i : i + chunk_words]))
-    return chunks
+    return list(iter_chunks_by_words(text, chunk_words))
+
+
+def chunk_transcript(
+    span: TranscriptSpan,
+    chunk_words: int,
+    chunking: str = "words",
+    max_words: Optional[int] = None,
+) -> List[TranscriptSpan]:
+    """
+    Như chunk_by_words nhưng cắt theo snippet, mỗi chunk giữ khoảng thời gian.
+    chunking="topics" -> cắt tại chỗ chuyển chủ đề (xem segmenter.py),
+    mỗi chunk dài từ chunk_words đến max_words từ.
+    """
+    if chunking == "topics":
+        from segmenter import topic_boundaries
+
+        cuts = topic_boundaries(
+            span.text.split(), max_words or chunk_words, min_words=chunk_words
+        )
+        return list(span.split_at_words(cuts))
+    return list(span.chunks(chunk_words))
+
+
+def _topic_word_budget(summarizer, mode: str, chunk_words: int) -> int:
+    """
+    Số từ tối đa mỗi chunk khi chia theo chủ đề: vừa với giới hạn input của
+    tokenizer (trừ phần prompt của lesson mode), ~0.75 từ mỗi token.
+    """
+    max_tokens = getattr(summarizer.tokenizer, "model_max_length", 512) or 512
+    if mode == "lesson":
+        max_tokens -= 128  # phần hướng dẫn trong notes_prompt
+    return max(chunk_words, int(max_tokens * 0.75))
+
+
+def _tag_summary(summary: str, span: Optional[TranscriptSpan]) -> str:
+    if span is None:
+        return summary
+    return f"[{span.label}] {summary}"
 
 
 def _split_text_units(text: str) -> List[str]:
@@ -226,7 +375,24 @@ def _format_questions(units: List[str], lang_code: str) -> str:
     return "\n".join(questions)
 
 
-def build_summarizer(model_name: str):
+# Giữ các pipeline đã load trong bộ nhớ (map model + reduce model) để không load lại
+_SUMMARIZER_CACHE: Dict[str, object] = {}
+
+
+def build_summarizer(model_name: str, draft_model: Optional[str] = None):
+    """
+    Pipeline summarization cho model_name (có cache). draft_model -> bật
+    assisted decoding: model nháp nhỏ cùng tokenizer đề xuất token, model chính
+    chỉ kiểm tra (xem assisted_decoding.py). Pipeline có thuộc tính `assisted`
+    (AssistedDecoding hoặc None).
+    """
+    if draft_model == model_name:
+        draft_model = None
+    cache_key = f"{model_name}+{draft_model}" if draft_model else model_name
+    cached = _SUMMARIZER_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     from transformers import (
         AutoTokenizer,
         AutoModelForSeq2SeqLM,
@@ -235,6 +401,8 @@ def build_summarizer(model_name: str):
 
     print(f"⏳ Loading model: {model_name}...")
     
+    profile = load_profile()
+    apply_thread_settings(profile)
     device = -1
     try:
         import torch  # type: ignore
@@ -248,9 +416,24 @@ def build_summarizer(model_name: str):
         device = -1
         print("ℹ Using CPU (slower)")
 
-    # Tự tải tokenizer + model
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    # Model đã prefetch (model_store.py) được load từ kho local qua mmap,
+    # còn lại tự tải tokenizer + model như cũ
+    source, load_kwargs = resolve_model(model_name)
+    if source != model_name:
+        print(f"✓ Local store: {source}")
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=load_kwargs.get("local_files_only", False))
+        model = AutoModelForSeq2SeqLM.from_pretrained(source, **load_kwargs)
+    except OSError as e:
+        if load_kwargs.get("local_files_only"):
+            raise RuntimeError(
+                f"{model_name} is not available offline, run: python model_store.py prefetch {model_name}"
+            ) from e
+        raise
+    if profile["precision"] != "fp32":
+        model = prepare_model(model, profile["precision"], on_gpu=device >= 0)
+        print(f"✓ Precision: {profile['precision']}")
+    assisted = _load_draft(draft_model, model, tokenizer, profile, device) if draft_model else None
 
     # Một số tokenizer set model_max_length rất lớn (int(1e30)),
     # khiến truncation không hoạt động => ta ép về 1024 cho an toàn.
@@ -264,108 +447,412 @@ def build_summarizer(model_name: str):
             tokenizer.model_max_length = SAFE_MAX_SOURCE_LEN
     except Exception:
         tokenizer.model_max_length = SAFE_MAX_SOURCE_LEN
+    # Ngân sách token đầu vào do autotune chọn (chỉ thu nhỏ, không vượt giới hạn model)
+    if profile["max_source_len"]:
+        tokenizer.model_max_length = min(tokenizer.model_max_length, int(profile["max_source_len"]))
 
     print("✓ Model loaded successfully\n")
     
-    return pipeline(
+    summarizer = pipeline(
         "summarization",
         model=model,
         tokenizer=tokenizer,
         device=device,
-        batch_size=1,  # Xử lý từng batch để tiết kiệm RAM
+        # Mặc định 1 để tiết kiệm RAM; assisted decoding chỉ chạy với batch 1
+        batch_size=1 if assisted else int(profile["batch_size"]),
     )
+    summarizer.assisted = assisted
+    _SUMMARIZER_CACHE[cache_key] = summarizer
+    return summarizer
+
+
+def _load_draft(draft_model: str, model, tokenizer, profile: Dict, device: int):
+    """Load model nháp cho assisted decoding; None nếu không dùng được."""
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    from assisted_decoding import AssistedDecoding, tokenizers_compatible
+
+    print(f"⏳ Loading draft model: {draft_model}...")
+    source, load_kwargs = resolve_model(draft_model)
+    try:
+        draft_tokenizer = AutoTokenizer.from_pretrained(
+            source, local_files_only=load_kwargs.get("local_files_only", False)
+        )
+        draft = AutoModelForSeq2SeqLM.from_pretrained(source, **load_kwargs)
+    except OSError as e:
+        print(f"⚠ Draft model unavailable ({e}), using normal decoding")
+        return None
+    if not tokenizers_compatible(tokenizer, draft_tokenizer):
+        print(f"⚠ {draft_model} does not share the main model's tokenizer, using normal decoding")
+        return None
+    if profile["precision"] != "fp32":
+        draft = prepare_model(draft, profile["precision"], on_gpu=device >= 0)
+    if device >= 0:
+        draft = draft.to(f"cuda:{device}")
+    draft.eval()
+    print("✓ Assisted decoding on (num_beams=1, batch size 1)")
+    return AssistedDecoding(model, draft, draft_model, pad_token_id=tokenizer.pad_token_id)
+
+
+class _StageTimer:
+    """Đo thời gian một bước (map / reduce), in ra và ghi vào `stats` nếu có."""
+
+    def __init__(self, stage: str, model_name: str, stats: Optional[dict], summarizer=None):
+        self.stage = stage
+        self.model_name = model_name
+        self.stats = stats
+        self.calls = 0
+        # Pipeline có model nháp -> báo tỉ lệ chấp nhận / speedup của bước này
+        self.assisted = getattr(summarizer, "assisted", None)
+        self.assisted_since = self.assisted.snapshot() if self.assisted else None
+        self.started = time.perf_counter()
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        print(f"⏱ {self.stage} ({self.model_name}): {elapsed:.1f}s, {self.calls} calls")
+        report = self.assisted.report(self.assisted_since, elapsed) if self.assisted else None
+        if report:
+            from assisted_decoding import describe
+
+            print(f"   ⚡ {describe(report)}")
+        if self.stats is not None:
+            self.stats[self.stage] = {
+                "model": self.model_name,
+                "seconds": round(elapsed, 3),
+                "calls": self.calls,
+            }
+            if report:
+                self.stats[self.stage]["assisted"] = report
+
+
+def _build_section_evidence(
+    tokenizer, templates: Dict[str, str], summaries: List[str], is_t5_like: bool
+) -> Dict[str, str]:
+    """
+    Chọn ghi chú riêng cho từng template (xem evidence.py) thay vì đưa toàn bộ
+    combined_notes vào rồi để tokenizer cắt mất phần sau của bài giảng.
+    Mỗi câu ghi chú chỉ được tokenize một lần.
+    """
+    units = split_note_units(summaries, _split_text_units)
+    if not units:
+        return {section: " ".join(summaries) for section in templates}
+
+    token_counts = [
+        len(ids)
+        for ids in tokenizer(
+            [unit for _, unit in units], add_special_tokens=False
+        )["input_ids"]
+    ]
+    max_source = getattr(tokenizer, "model_max_length", 512) or 512
+    prefix = "summarize: " if is_t5_like else ""
+    budgets: Dict[str, int] = {}
+    for section, template in templates.items():
+        overhead = len(tokenizer(prefix + template.format(notes=""))["input_ids"])
+        # Chừa thêm 1 token cho mỗi dấu cách nối câu (ước lượng dư) và vài token an toàn
+        budgets[section] = max(32, max_source - overhead - 8)
+    return select_section_evidence(units, [c + 1 for c in token_counts], budgets)
 
 
 def summarize_text(
-    text: str,
+    text: Union[str, Transcript, TranscriptSpan],
     model_name: str,
     min_length: int,
     max_length: int,
-    chunk_words: int,
+    chunk_words: Optional[int],
     combine: bool,
     mode: str = "lesson",
     language: str = "en",
+    chunking: str = "words",
+    map_model: Optional[str] = None,
+    reduce_model: Optional[str] = None,
+    stats: Optional[dict] = None,
+    journal=None,
+    cancel: Optional[CancelToken] = None,
+    max_rss_mb: Optional[float] = None,
+    outputs: Optional[Dict[str, str]] = None,
+    draft_model: Optional[str] = None,
+    incremental=None,
 ) -> str:
     """
     mode = "plain"  -> tóm tắt bình thường (gần giống code gốc)
     mode = "lesson" -> tạo bài học có cấu trúc từ transcript dạy học
+
+    map_model    -> model cho bước tóm tắt từng chunk (nhiều lần gọi, nên dùng model nhỏ)
+    reduce_model -> model cho bước combine / từng phần bài học (ít lần gọi, model lớn)
+    Cả hai mặc định là model_name. Thời gian từng bước được in ra và ghi vào
+    `stats` (nếu truyền dict) để so sánh với chạy một model.
+    draft_model  -> model nháp cho assisted decoding của map / reduce model
+    (khác draft_model); tỉ lệ chấp nhận và speedup ghi vào stats[bước]["assisted"].
+
+    journal (RunJournal) -> ghi từng tóm tắt chunk / phần bài học ngay khi xong
+    và bỏ qua các bước đã có trong journal (resume).
+
+    cancel (CancelToken) -> kiểm tra giữa các chunk / phần và trong lúc generate
+    (stopping criteria); khi bị hủy hoặc quá deadline thì trả về kết quả dở dang
+    đã có và ghi lý do vào stats["cancelled"].
+
+    Chunk được sinh dần (generator), text của chunk chỉ được ghép khi tới lượt
+    và bỏ đi ngay sau khi tóm tắt, nên bộ nhớ không tăng theo độ dài video.
+    max_rss_mb -> khi RSS gần tới giới hạn thì giảm batch size của bước map.
+
+    chunk_words = None -> lấy từ inference profile (xem autotune.py); số beam và
+    số chunk mỗi lần gọi pipeline (batch_size) cũng lấy từ profile.
+
+    chunking = "words"  -> cắt cứng mỗi chunk_words từ
+    chunking = "topics" -> cắt tại chỗ chuyển chủ đề (TextTiling), chunk ít và đặc hơn
+
+    outputs (dict, lesson mode + combine) -> ghi thêm outputs["plain"]: bản tóm
+    tắt thường tạo từ chính các ghi chú của bước map (xem summarize_outputs).
+
+    incremental (incremental.StreamState, chỉ với Transcript/TranscriptSpan) ->
+    dùng lại tóm tắt chunk của phần transcript đã xử lý ở lần chạy trước, chỉ
+    tóm tắt phần mới nối thêm rồi làm lại bước combine / bài học.
+
+    Nếu `text` là Transcript/TranscriptSpan, chunk được cắt theo snippet và
+    các tóm tắt từng chunk (khi không combine) được gắn nhãn [mm:ss-mm:ss].
     """
-    if not text or not text.strip():
+    if isinstance(text, Transcript):
+        text = text.span()
+    if isinstance(text, TranscriptSpan):
+        if not text:
+            return ""
+    elif not text or not text.strip():
         return ""
 
-    summarizer = build_summarizer(model_name)
-    chunks = chunk_by_words(text, chunk_words)
-    if not chunks:
+    map_model = map_model or model_name
+    reduce_model = reduce_model or model_name
+    summarizer = build_summarizer(map_model, draft_model)
+
+    profile = load_profile()
+    chunk_words = chunk_words or int(profile["chunk_words"])
+    num_beams = int(profile["num_beams"])
+    batch_size = 1 if getattr(summarizer, "assisted", None) else max(1, int(profile["batch_size"]))
+
+    max_words = None
+    if chunking == "topics":
+        max_words = _topic_word_budget(summarizer, mode, chunk_words)
+        print(f"🧩 Topic chunking: {chunk_words}-{max_words} words per chunk")
+
+    # Các chunk đã tóm tắt ở lần chạy trước (--incremental)
+    done_chunks: List[Tuple[str, TranscriptSpan]] = []
+    if incremental is not None and not isinstance(text, TranscriptSpan):
+        print("⚠ Incremental mode needs a timestamped transcript, processing everything")
+        incremental = None
+
+    # chunk_source() sinh (số thứ tự, text, span) từng chunk một
+    if isinstance(text, TranscriptSpan):
+        remaining = text
+        if incremental is not None:
+            incremental.bind({
+                "mode": mode, "map_model": map_model, "draft_model": draft_model,
+                "chunk_words": chunk_words, "chunking": chunking, "max_words": max_words,
+                "min_length": min_length, "max_length": max_length, "num_beams": num_beams,
+            })
+            done_chunks, remaining = incremental.resume_chunks(text)
+        # Span chỉ là view (3 số nguyên), text được ghép khi tới lượt chunk đó
+        spans = chunk_transcript(remaining, chunk_words, chunking, max_words) if remaining else []
+        total_chunks = len(done_chunks) + len(spans)
+
+        def chunk_source() -> Iterator[Tuple[int, str, Optional[TranscriptSpan]]]:
+            for idx, span in enumerate(spans, len(done_chunks) + 1):
+                yield idx, span.text, span
+    elif chunking == "topics":
+        from segmenter import chunk_by_topics
+
+        topic_chunks = chunk_by_topics(text, max_words, min_words=chunk_words)
+        total_chunks = len(topic_chunks)
+
+        def chunk_source() -> Iterator[Tuple[int, str, Optional[TranscriptSpan]]]:
+            for idx, chunk in enumerate(topic_chunks, 1):
+                yield idx, chunk, None
+    else:
+        total_chunks = count_word_chunks(text, chunk_words)
+
+        def chunk_source() -> Iterator[Tuple[int, str, Optional[TranscriptSpan]]]:
+            for idx, chunk in enumerate(iter_chunks_by_words(text, chunk_words), 1):
+                yield idx, chunk, None
+    if not total_chunks:
         return ""
 
-    is_t5_like = "t5" in model_name.lower()
+    is_t5_like = "t5" in map_model.lower()
+    reduce_is_t5_like = "t5" in reduce_model.lower()
 
-    # ---------- PLAIN MODE ----------
-    if mode == "plain":
-        summaries: List[str] = []
-        total_chunks = len(chunks)
-        print(f"📝 Processing {total_chunks} chunks...")
-        
-        for idx, chunk in enumerate(chunks, 1):
-            print(f"  Chunk {idx}/{total_chunks}...", end=" ", flush=True)
+    gen_kwargs = cancel.generate_kwargs() if cancel else {}
+
+    reported: List[str] = []
+
+    def stopped() -> bool:
+        if cancel is None or not cancel.should_stop:
+            return False
+        if not reported:
+            reported.append(cancel.reason or "cancelled")
+            print(f"\n⏹ Stopped early ({cancel.reason}), returning partial result")
+            if stats is not None:
+                stats["cancelled"] = cancel.reason
+        return True
+
+    def partial(summaries: List[str], spans: List[Optional[TranscriptSpan]]) -> str:
+        return "\n\n".join(
+            _tag_summary(summary, span) for summary, span in zip(summaries, spans)
+        )
+
+    guard = MemoryGuard(max_rss_mb)
+
+    def run_map(make_prompt, sec_max: int, sec_min: int):
+        """
+        Bước map: tóm tắt từng chunk, gom tối đa `batch_size` chunk mỗi lần gọi
+        pipeline (chỉ giữ text của các chunk đang chờ trong batch). Trả về
+        (summaries, spans) theo thứ tự chunk.
+        """
+        results: Dict[int, Tuple[str, Optional[TranscriptSpan]]] = {
+            idx: (summary, span) for idx, (summary, span) in enumerate(done_chunks, 1)
+        }
+        pending: List[Tuple[int, str, Optional[TranscriptSpan]]] = []
+        limit = [batch_size]
+        warned: List[bool] = []
+        map_timer = _StageTimer("map", map_model, stats, summarizer)
+
+        def relieve_memory() -> None:
+            if not guard.under_pressure():
+                return
+            if limit[0] > 1:
+                limit[0] = max(1, limit[0] // 2)
+                print(f"\n⚠ Memory {guard.describe()}: batch size -> {limit[0]}")
+            elif not warned:
+                warned.append(True)
+                print(f"\n⚠ Memory {guard.describe()} at batch size 1")
+                if stats is not None:
+                    stats["memory_warning"] = guard.describe()
+
+        def flush() -> bool:
+            if not pending:
+                return True
+            first, last = pending[0][0], pending[-1][0]
+            if first == last:
+                span = pending[0][2]
+                span_label = f" [{span.label}]" if span else ""
+                print(f"  Chunk {first}/{total_chunks}{span_label}...", end=" ", flush=True)
+            else:
+                print(f"  Chunks {first}-{last}/{total_chunks}...", end=" ", flush=True)
+            prompts = [make_prompt(chunk) for _, chunk, _ in pending]
             try:
-                prompt = ("summarize: " + chunk) if is_t5_like else chunk
                 res = summarizer(
-                    prompt,
-                    max_length=max_length,   # output summary length
-                    min_length=min_length,
+                    prompts if len(prompts) > 1 else prompts[0],
+                    max_length=sec_max,
+                    min_length=sec_min,
                     truncation=True,         # input sẽ bị cắt theo tokenizer.model_max_length
-                    num_beams=2,             # Giảm từ 4 xuống 2 cho nhanh hơn
+                    num_beams=num_beams,     # Mặc định 2 (giảm từ 4 cho nhanh hơn)
                     early_stopping=True,     # Dừng sớm khi tìm được kết quả tốt
+                    **gen_kwargs,
                 )
-                summaries.append(res[0]["summary_text"].strip())
-                print("✓")
+                map_timer.calls += 1
             except Exception as e:
                 print(f"✗ Error")
-                raise RuntimeError(f"Summarization failed on chunk {idx}: {e}")
-
-        if not combine:
-            return "\n\n".join(summaries)
-
+                raise RuntimeError(f"Summarization failed on chunk {first}: {e}")
+            if stopped():
+                print("⏹")
+                return False  # generate bị cắt giữa chừng -> bỏ tóm tắt dở
+            for (idx, chunk, span), out in zip(pending, res):
+                if isinstance(out, list):
+                    out = out[0]
+                summary = out["summary_text"].strip()
+                results[idx] = (summary, span)
+                if journal:
+                    journal.record_chunk(idx, chunk, summary)
+            pending.clear()
+            print("✓")
+            return True
+
+        for idx, chunk, span in chunk_source():
+            if not chunk.strip():
+                continue
+            saved = journal.chunk_summary(idx, chunk) if journal else None
+            if saved is not None:
+                results[idx] = (saved, span)
+                span_label = f" [{span.label}]" if span else ""
+                print(f"  Chunk {idx}/{total_chunks}{span_label}... ✓ (resumed)")
+                continue
+            if stopped():
+                break
+            pending.append((idx, chunk, span))
+            if len(pending) >= limit[0]:
+                relieve_memory()
+                if not flush():
+                    break
+        else:
+            flush()
+        map_timer.finish()
+
+        ordered = [results[i] for i in sorted(results)]
+        if incremental is not None:
+            incremental.save_chunks(text, ordered, chunk_words, chunking)
+        return [summary for summary, _ in ordered], [span for _, span in ordered]
+
+    def combine_plain(
+        summaries: List[str],
+        spans: List[Optional[TranscriptSpan]],
+        section: str = "final",
+        stage: str = "reduce",
+    ) -> str:
+        """Tóm tắt lại các tóm tắt / ghi chú chunk thành một bản tóm tắt cuối."""
         if len(summaries) == 1:
             return summaries[0] if summaries else ""
 
         print("🔄 Combining summaries into final summary...")
         combined = " ".join(summaries)
 
+        if journal and journal.section(section) is not None:
+            print("✓ Final summary (resumed)\n")
+            return journal.section(section)
+
         final_max = max(max_length, min(300, max_length * 2))
         final_min = min_length
+        reducer = build_summarizer(reduce_model, draft_model)
+        reduce_timer = _StageTimer(stage, reduce_model, stats, reducer)
         try:
-            final_prompt = ("summarize: " + combined) if is_t5_like else combined
-            res = summarizer(
+            final_prompt = ("summarize: " + combined) if reduce_is_t5_like else combined
+            res = reducer(
                 final_prompt,
                 max_length=final_max,
                 min_length=final_min,
                 truncation=True,
-                num_beams=2,
+                num_beams=num_beams,
                 early_stopping=True,
+                **gen_kwargs,
             )
+            reduce_timer.calls += 1
+            if stopped():
+                return partial(summaries, spans)
+            final_summary = res[0]["summary_text"].strip()
+            if journal:
+                journal.record_section(section, final_summary)
             print("✓ Final summary complete\n")
-            return res[0]["summary_text"].strip()
+            return final_summary
         except Exception:
             return combined
+        finally:
+            reduce_timer.finish()
 
-    # ---------- LESSON MODE ----------
-    summaries: List[str] = []
+    # ---------- PLAIN MODE ----------
+    if mode == "plain":
+        print(f"📝 Processing {total_chunks} chunks...")
+        summaries, summary_spans = run_map(
+            lambda chunk: ("summarize: " + chunk) if is_t5_like else chunk,
+            max_length,   # output summary length
+            min_length,
+        )
+
+        if not combine or stopped():
+            return partial(summaries, summary_spans)
+        return combine_plain(summaries, summary_spans)
 
-    total_chunks = len(chunks)
+    # ---------- LESSON MODE ----------
     print(f"📚 Processing {total_chunks} chunks in lesson mode...")
     print("   Creating comprehensive learning material...\n")
 
-    # Bước 1: từ mỗi chunk tạo ra "study notes" chi tiết với steps và examples
-    for idx, chunk in enumerate(chunks, 1):
-        if not chunk.strip():
-            continue
-
-        print(f"  Chunk {idx}/{total_chunks}...", end=" ", flush=True)
-
+    def notes_prompt(chunk: str) -> str:
         # Enhanced prompt để lấy nhiều chi tiết hơn
-        notes_prompt = (
+        prompt = (
             "You are an expert educator creating detailed learning materials. "
             "Analyze this lecture transcript and extract:\n"
             "1. Key concepts and definitions\n"
@@ -378,34 +865,35 @@ def summarize_text(
             "Lecture transcript:\n"
             f"{chunk}"
         )
-
         if is_t5_like:
-            notes_prompt = "summarize: " + notes_prompt
+            prompt = "summarize: " + prompt
+        return prompt
 
-        try:
-            res = summarizer(
-                notes_prompt,
-                max_length=max_length * 2,  # Tăng gấp đôi để lấy nhiều chi tiết hơn
-                min_length=min_length * 2,
-                truncation=True,
-                num_beams=2,
-                early_stopping=True,
-            )
-            summaries.append(res[0]["summary_text"].strip())
-            print("✓")
-        except Exception as e:
-            print(f"✗ Error")
-            raise RuntimeError(f"Summarization failed on chunk {idx}: {e}")
+    # Bước 1: từ mỗi chunk tạo ra "study notes" chi tiết với steps và examples
+    summaries, summary_spans = run_map(
+        notes_prompt,
+        max_length * 2,  # Tăng gấp đôi để lấy nhiều chi tiết hơn
+        min_length * 2,
+    )
 
     if not summaries:
         return ""
 
-    if not combine:
-        return "\n\n".join(summaries)
+    if not combine or stopped():
+        return partial(summaries, summary_spans)
+
+    if outputs is not None:
+        # Tóm tắt thường dùng lại ghi chú của bước map, chỉ tốn thêm một lần reduce
+        outputs["plain"] = combine_plain(
+            summaries, summary_spans, section="plain", stage="reduce_plain"
+        )
+        if stopped():
+            return partial(summaries, summary_spans)
 
     # Bước 2: Combine tất cả ghi chú và nhờ model viết lại thành bài học hoàn chỉnh
     print("🔄 Building structured lesson...")
     combined_notes = " ".join(summaries)
+    reducer = build_summarizer(reduce_model, draft_model)
 
     final_max = max(max_length, min(512, max_length * 3))
     final_min = min_length
@@ -417,21 +905,40 @@ def summarize_text(
         sec_min = max(5, min(desired_min, sec_max - 5))
         return sec_max, sec_min
 
-    def run_prompt(template: str, sec_max: int, sec_min: int) -> str:
-        prompt = template.format(notes=combined_notes)
-        if is_t5_like:
+    def run_prompt(section: str, sec_max: int, sec_min: int) -> str:
+        saved = journal.section(section) if journal else None
+        if saved is not None:
+            return saved
+        if stopped():
+            return ""  # phần còn lại lấy từ ghi chú (fallback bên dưới)
+        text = _run_section_prompt(section, sec_max, sec_min)
+        if stopped():
+            return ""
+        # Phần lỗi / rỗng không ghi vào journal để --resume chạy lại phần đó
+        if journal and text:
+            journal.record_section(section, text)
+        return text
+
+    def _run_section_prompt(section: str, sec_max: int, sec_min: int) -> str:
+        prompt = templates[section].format(notes=section_notes[section])
+        if reduce_is_t5_like:
             prompt = "summarize: " + prompt
         try:
-            res = summarizer(
+            reduce_timer.calls += 1
+            res = reducer(
                 prompt,
                 max_length=sec_max,
                 min_length=sec_min,
                 truncation=True,
-                num_beams=2,
+                num_beams=num_beams,
                 early_stopping=True,
+                **gen_kwargs,
             )
             return res[0]["summary_text"].strip()
-        except Exception:
+        except Exception as e:
+            print(f"⚠ Section '{section}' failed: {e}")
+            if stats is not None:
+                stats.setdefault("failed_sections", []).append(section)
             return ""
 
     if lang_code.startswith("vi"):
@@ -526,21 +1033,28 @@ def summarize_text(
     summary_max, summary_min = adjust_lengths(min(final_max, 250), max(20, min_length // 2 or 10))
     question_max, question_min = adjust_lengths(min(final_max, 300), max(20, min_length // 2 or 10))
 
+    # Mỗi phần chỉ nhận những câu ghi chú liên quan nhất, vừa ngân sách token
+    section_notes = _build_section_evidence(
+        reducer.tokenizer, templates, summaries, reduce_is_t5_like
+    )
+    reduce_timer = _StageTimer("reduce", reduce_model, stats, reducer)
+
     print("  Generating lesson components...")
-    lesson_title = run_prompt(templates["title"], title_max, title_min)
+    lesson_title = run_prompt("title", title_max, title_min)
     print("    ✓ Title")
-    objectives_block = run_prompt(templates["objectives"], obj_max, obj_min)
+    objectives_block = run_prompt("objectives", obj_max, obj_min)
     print("    ✓ Objectives")
-    concepts_block = run_prompt(templates["concepts"], concept_max, concept_min)
+    concepts_block = run_prompt("concepts", concept_max, concept_min)
     print("    ✓ Key concepts")
-    steps_block = run_prompt(templates["steps"], steps_max, steps_min)
+    steps_block = run_prompt("steps", steps_max, steps_min)
     print("    ✓ Steps/Important points")
-    examples_block = run_prompt(templates["examples"], examples_max, examples_min)
+    examples_block = run_prompt("examples", examples_max, examples_min)
     print("    ✓ Examples")
-    summary_block = run_prompt(templates["summary"], summary_max, summary_min)
+    summary_block = run_prompt("summary", summary_max, summary_min)
     print("    ✓ Summary")
-    questions_block = run_prompt(templates["questions"], question_max, question_min)
+    questions_block = run_prompt("questions", question_max, question_min)
     print("    ✓ Review questions\n")
+    reduce_timer.finish()
 
     if not lesson_title:
         units = _split_text_units(combined_notes)
@@ -605,53 +1119,219 @@ def summarize_text(
     ]
     return "\n".join(part for part in sections if part is not None and part.strip() != "")
 
+OUTPUT_KINDS = ("plain", "lesson", "key_points")
+_OUTPUT_HEADINGS = {"plain": "## 📝 Summary", "key_points": "## 🔑 Key points"}
+
+
+def parse_outputs(value: str) -> List[str]:
+    kinds = [kind.strip() for kind in value.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in OUTPUT_KINDS]
+    if unknown or not kinds:
+        raise argparse.ArgumentTypeError(
+            f"--outputs must be a comma-separated list of {', '.join(OUTPUT_KINDS)}"
+        )
+    return list(dict.fromkeys(kinds))
+
+
+def summarize_outputs(
+    text: Union[str, Transcript, TranscriptSpan],
+    outputs: List[str],
+    max_points: int = 50,
+    **kwargs,
+) -> Dict[str, str]:
+    """
+    Tạo nhiều kết quả từ một lần chạy trên cùng transcript:
+      plain      -> tóm tắt thường
+      lesson     -> bài học có cấu trúc
+      key_points -> các câu quan trọng (giống đầu vào của gemini_lesson.py)
+
+    Khi cần cả plain và lesson, transcript chỉ được chunk và map một lần (ghi
+    chú lesson); plain được tạo bằng một lần reduce thêm trên các ghi chú đó
+    thay vì chạy lại toàn bộ map với prompt tóm tắt. key_points là bước chấm
+    điểm câu, không gọi model. kwargs giống summarize_text (trừ mode / combine).
+    """
+    if isinstance(text, Transcript):
+        text = text.span()
+    results: Dict[str, str] = {}
+    if "key_points" in outputs:
+        source = text.text if isinstance(text, TranscriptSpan) else text
+        results["key_points"] = "\n".join(
+            f"- {point}" for point in extract_key_points(source, max_points)
+        )
+
+    if "lesson" in outputs:
+        extra: Optional[Dict[str, str]] = {} if "plain" in outputs else None
+        results["lesson"] = summarize_text(
+            text, combine=True, mode="lesson", outputs=extra, **kwargs
+        )
+        if extra is not None:
+            results["plain"] = extra.get("plain", "")
+    elif "plain" in outputs:
+        results["plain"] = summarize_text(text, combine=True, mode="plain", **kwargs)
+
+    return {kind: results[kind] for kind in outputs if kind in results}
+
+
+def join_outputs(results: Dict[str, str]) -> str:
+    """Ghép các kết quả thành một markdown (lesson đã có heading riêng)."""
+    parts = []
+    for kind, text in results.items():
+        heading = _OUTPUT_HEADINGS.get(kind)
+        parts.append(f"{heading}\n{text}" if heading else text)
+    return "\n\n".join(part for part in parts if part.strip())
+
+
+# Các tham số được lưu vào journal để --resume chạy lại đúng cấu hình cũ
+_JOURNAL_PARAMS = (
+    "language", "model", "map_model", "reduce_model", "min_length", "max_length",
+    "chunk_words", "combine", "mode", "chunking", "start", "end", "outputs",
+    "draft_model",
+)
+
+
 def main():
     args = parse_args()
-    
+    writer = OutputWriter(args.format)
+
+    # Ở chế độ --format json/ndjson, tiến trình đi ra stderr, stdout chỉ có kết quả
+    with writer.progress_to_stderr():
+        _run(args, writer)
+
+
+def _run(args: argparse.Namespace, writer: OutputWriter) -> None:
+    def fail(message: str, code: int = 1, **data) -> None:
+        sys.stderr.write(message + "\n")
+        writer.error(message, **data)
+        sys.exit(code)
+
     print("=" * 60)
     print("YouTube Transcript Summarizer")
     print("=" * 60)
     
-    try:
-        video_id = extract_video_id(args.url or args.video_id)
+    cancel = make_cli_token(args.deadline)
+    if args.offline:
+        set_offline()
+    journal = None
+    if args.resume:
+        from run_journal import RunJournal
+
+        try:
+            journal = RunJournal.load(args.resume)
+        except FileNotFoundError as e:
+            fail(f"Error: {e}", 2)
+        for key, value in journal.params.items():
+            if key in _JOURNAL_PARAMS:
+                setattr(args, key, value)
+        video_id = journal.video_id
+        print(f"↺ Resuming run {journal.run_id} ({journal.completed_chunks} chunks done)")
         print(f"📹 Video ID: {video_id}")
-    except ValueError as e:
-        sys.stderr.write(f"Error: {e}\n")
-        sys.exit(2)
+    else:
+        try:
+            video_id = extract_video_id(args.url or args.video_id)
+            print(f"📹 Video ID: {video_id}")
+        except ValueError as e:
+            fail(f"Error: {e}", 2)
 
     print(f"🌐 Fetching transcript (language: {args.language})...")
+    resumed_transcript = False
     try:
-        transcript_text = fetch_transcript_text(video_id, args.language)
-        word_count = len(transcript_text.split())
-        print(f"✓ Got transcript: {word_count} words\n")
+        transcript = journal.load_transcript() if journal else None
+        resumed_transcript = transcript is not None
+        if transcript is None:
+            transcript = fetch_transcript(video_id, args.language)
+        transcript_span = transcript.slice_time(args.start, args.end)
+        if args.start is not None or args.end is not None:
+            print(
+                f"✓ Got transcript: {transcript.word_count} words, "
+                f"using {transcript_span.word_count} words [{transcript_span.label}]\n"
+            )
+        else:
+            print(f"✓ Got transcript: {transcript.word_count} words\n")
     except (TranscriptsDisabled, NoTranscriptFound) as e:
-        sys.stderr.write(f"Transcript unavailable: {e}\n")
-        sys.exit(1)
+        fail(f"Transcript unavailable: {e}", video_id=video_id)
     except Exception as e:
-        sys.stderr.write(f"Failed to fetch transcript: {e}\n")
-        sys.exit(1)
+        fail(f"Failed to fetch transcript: {e}", video_id=video_id)
+
+    if not transcript_span:
+        fail("Empty transcript or failed to assemble text.", video_id=video_id)
+    writer.stage("transcript", words=transcript_span.word_count)
+
+    if args.chunk_words is None:
+        args.chunk_words = int(load_profile()["chunk_words"])
 
-    if not transcript_text:
-        sys.stderr.write("Empty transcript or failed to assemble text.\n")
-        sys.exit(1)
+    if args.journal and journal is None:
+        from run_journal import RunJournal
 
+        journal = RunJournal.create(
+            video_id, {key: getattr(args, key) for key in _JOURNAL_PARAMS}
+        )
+    if journal:
+        journal.save_transcript(transcript)
+        print(f"📒 Run ID: {journal.run_id} (resume with --resume {journal.run_id})\n")
+
+    incremental = None
+    if args.incremental:
+        from incremental import StreamState
+
+        incremental = StreamState.open(video_id, args.language, "local")
+
+    stats: dict = {}
+    results: Optional[Dict[str, str]] = None
+    options = dict(
+        model_name=args.model,
+        min_length=args.min_length,
+        max_length=args.max_length,
+        chunk_words=args.chunk_words,
+        language=args.language,
+        chunking=args.chunking,
+        map_model=args.map_model,
+        reduce_model=args.reduce_model,
+        draft_model=args.draft_model,
+        stats=stats,
+        journal=journal,
+        cancel=cancel,
+        max_rss_mb=args.max_rss,
+        incremental=incremental,
+    )
     try:
-        summary = summarize_text(
-            transcript_text,
-            model_name=args.model,
-            min_length=args.min_length,
-            max_length=args.max_length,
-            chunk_words=args.chunk_words,
-            combine=args.combine,
-            mode=args.mode,
+        if args.outputs:
+            results = summarize_outputs(transcript_span, args.outputs, **options)
+            summary = join_outputs(results)
+        else:
+            summary = summarize_text(
+                transcript_span, combine=args.combine, mode=args.mode, **options
+            )
+    except Exception as e:
+        message = f"Summarization failed: {e}"
+        if journal:
+            message += f"\nResume with: --resume {journal.run_id}"
+        fail(message, video_id=video_id)
+    cancelled = stats.get("cancelled")
+    if cancelled and not summary:
+        fail(f"Stopped before any result was produced ({cancelled})", video_id=video_id)
+    if journal and not cancelled and not stats.get("failed_sections"):
+        journal.record_result(summary)
+    writer.stage("summarize")
+
+    if writer.structured:
+        writer.result(
+            summary,
+            video_id=video_id,
             language=args.language,
+            backend="local",
+            mode=args.mode,
+            outputs=results,
+            models={"map": args.map_model or args.model, "reduce": args.reduce_model or args.model},
+            stages=stats,
+            cache="resumed" if resumed_transcript else "miss",
+            run_id=journal.run_id if journal else None,
+            partial=bool(cancelled or stats.get("failed_sections")),
+            cancelled=cancelled,
         )
-    except Exception as e:
-        sys.stderr.write(f"Summarization failed: {e}\n")
-        sys.exit(1)
+        return
 
     print("\n" + "=" * 60)
-    print("SUMMARY")
+    print("SUMMARY" + (f" (PARTIAL - stopped: {cancelled})" if cancelled else ""))
     print("=" * 60 + "\n")
     print(summary)
     print("\n" + "=" * 60)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Ghi lại / phát lại (record / replay) transcript YouTube và response Gemini.
+
+Bật bằng biến môi trường (được truyền xuống cả các job do job_service chạy):
+  LESSON_REPLAY=record   gọi YouTube / Gemini thật và lưu kết quả + độ trễ vào kho fixture
+  LESSON_REPLAY=replay   không gọi mạng, trả lại đúng dữ liệu đã ghi
+
+Tùy chọn khi replay:
+  LESSON_REPLAY_LATENCY=1.0      nhân độ trễ đã ghi (0 = trả ngay, đo overhead của pipeline)
+  LESSON_REPLAY_ERROR_RATE=0.1   tỉ lệ lỗi giả lập (Gemini: lỗi 429, transcript: lỗi mạng)
+  LESSON_REPLAY_SEED=42          seed cho lỗi giả lập để chạy lại giống hệt
+  LESSON_FIXTURES=<dir>          kho fixture (mặc định <repo>/fixtures)
+
+Usage:
+  LESSON_REPLAY=record python gemini_lesson.py --url <URL>
+  LESSON_REPLAY=replay LESSON_REPLAY_LATENCY=0 python gemini_lesson.py --url <URL>
+  python replay.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES_DIR = os.path.join(REPO_ROOT, "fixtures")
+
+MODES = ("off", "record", "replay")
+
+
+class FixtureMissing(RuntimeError):
+    pass
+
+
+def mode() -> str:
+    value = os.environ.get("LESSON_REPLAY", "off").strip().lower() or "off"
+    if value not in MODES:
+        raise ValueError(f"LESSON_REPLAY must be one of {', '.join(MODES)}")
+    return value
+
+
+def fixtures_dir() -> str:
+    return os.environ.get("LESSON_FIXTURES") or DEFAULT_FIXTURES_DIR
+
+
+_rng: Optional[random.Random] = None
+_rng_lock = threading.Lock()
+
+
+def _inject_error() -> bool:
+    global _rng
+    rate = float(os.environ.get("LESSON_REPLAY_ERROR_RATE", "0") or 0)
+    if rate <= 0:
+        return False
+    with _rng_lock:
+        if _rng is None:
+            seed = os.environ.get("LESSON_REPLAY_SEED")
+            _rng = random.Random(int(seed) if seed else None)
+        return _rng.random() < rate
+
+
+def _simulate_latency(recorded: float) -> None:
+    scale = float(os.environ.get("LESSON_REPLAY_LATENCY", "1") or 0)
+    if scale > 0 and recorded > 0:
+        time.sleep(recorded * scale)
+
+
+def _path(kind: str, key: str) -> str:
+    return os.path.join(fixtures_dir(), kind, key + ".json")
+
+
+def _save(kind: str, key: str, data: Dict) -> None:
+    path = _path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _load(kind: str, key: str, what: str) -> Dict:
+    path = _path(kind, key)
+    if not os.path.exists(path):
+        raise FixtureMissing(f"No recorded {what} ({path}); run once with LESSON_REPLAY=record")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------- transcript ----------
+def _transcript_key(video_id: str, languages: List[str]) -> str:
+    return f"{video_id}__{'-'.join(languages) or 'any'}"
+
+
+def fetch_transcript_entries(video_id: str, languages: List[str], fetch: Callable[[], object]):
+    """
+    Bọc lời gọi `api.fetch(video_id, languages=...)`. Trả về các dict
+    text/start/duration (như to_raw_data) để đưa vào Transcript.from_raw_data.
+    """
+    current = mode()
+    if current == "off":
+        # Đọc thẳng từng snippet, không tạo thêm list dict như to_raw_data()
+        return (
+            {"text": snippet.text, "start": snippet.start, "duration": snippet.duration}
+            for snippet in fetch()
+        )
+    key = _transcript_key(video_id, languages)
+    if current == "record":
+        started = time.perf_counter()
+        raw = fetch().to_raw_data()
+        _save("transcripts", key, {
+            "video_id": video_id,
+            "languages": languages,
+            "latency": round(time.perf_counter() - started, 4),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "raw_data": raw,
+        })
+        return raw
+    fixture = _load("transcripts", key, f"transcript for {video_id}")
+    _simulate_latency(fixture.get("latency", 0.0))
+    if _inject_error():
+        raise RuntimeError("Simulated transcript fetch error (replay)")
+    return fixture["raw_data"]
+
+
+# ---------- Gemini ----------
+def _prompt_key(model_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()[:24]
+
+
+def generate_content(model, prompt: str, **kwargs):
+    """Bọc `model.generate_content(prompt, ...)`; kết quả có thuộc tính .text như response thật."""
+    current = mode()
+    if current == "off":
+        return model.generate_content(prompt, **kwargs)
+    model_name = getattr(model, "model_name", "") or ""
+    key = _prompt_key(model_name, prompt)
+    if current == "record":
+        started = time.perf_counter()
+        response = model.generate_content(prompt, **kwargs)
+        _save("gemini", key, {
+            "model": model_name,
+            "latency": round(time.perf_counter() - started, 4),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "prompt_chars": len(prompt),
+            "text": response.text,
+        })
+        return response
+    fixture = _load("gemini", key, "Gemini response for this prompt")
+    _simulate_latency(fixture.get("latency", 0.0))
+    if _inject_error():
+        raise RuntimeError("429 Resource has been exhausted (simulated by replay)")
+    return SimpleNamespace(text=fixture["text"])
+
+
+def list_fixtures() -> List[Dict]:
+    entries = []
+    for kind in ("transcripts", "gemini"):
+        folder = os.path.join(fixtures_dir(), kind)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries.append({
+                "kind": kind,
+                "key": name[:-5],
+                "latency": data.get("latency"),
+                "recorded_at": data.get("recorded_at"),
+            })
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect the record/replay fixture store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List recorded transcripts and Gemini responses")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_fixtures()
+        if not entries:
+            print(f"(no fixtures in {fixtures_dir()})")
+        for entry in entries:
+            print(f"{entry['kind']:<12} {entry['key']:<40} {entry['latency']:>8.3f}s  {entry['recorded_at']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
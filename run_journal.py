@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Nhật ký chạy (run journal) để tiếp tục các lần chạy dài bị gián đoạn.
+
+Mỗi lần chạy có một thư mục runs/<RUN_ID>/:
+- meta.json        : tham số của lần chạy (video, ngôn ngữ, model, ...)
+- transcript.json  : transcript gốc (to_raw_data) để resume không phải tải lại
+- journal.jsonl    : mỗi dòng là một bước đã xong (tóm tắt chunk, phần bài học,
+                     kết quả cuối), được flush + fsync ngay khi ghi
+
+Nếu process chết giữa chừng, `--resume RUN_ID` đọc lại journal và bỏ qua các
+bước đã xong, nên tối đa chỉ mất công của một chunk.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from transcript import Transcript
+
+
+DEFAULT_RUNS_DIR = "runs"
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    def __init__(self, run_id: str, runs_dir: str = DEFAULT_RUNS_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(runs_dir, run_id)
+        self.meta: Dict = {}
+        self.chunks: Dict[int, dict] = {}
+        self.sections: Dict[str, str] = {}
+        self.result: Optional[str] = None
+
+    @classmethod
+    def create(cls, video_id: str, params: Dict, runs_dir: str = DEFAULT_RUNS_DIR) -> "RunJournal":
+        run_id = f"{video_id}-{time.strftime('%Y%m%d-%H%M%S')}"
+        journal = cls(run_id, runs_dir)
+        suffix = 1
+        while os.path.exists(journal.path):
+            suffix += 1
+            journal = cls(f"{run_id}-{suffix}", runs_dir)
+        os.makedirs(journal.path)
+        journal.meta = {"run_id": journal.run_id, "video_id": video_id, "params": params}
+        journal._write_json("meta.json", journal.meta)
+        return journal
+
+    @classmethod
+    def load(cls, run_id: str, runs_dir: str = DEFAULT_RUNS_DIR) -> "RunJournal":
+        journal = cls(run_id, runs_dir)
+        meta_path = os.path.join(journal.path, "meta.json")
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Run not found: {run_id} ({journal.path})")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            journal.meta = json.load(f)
+
+        log_path = os.path.join(journal.path, "journal.jsonl")
+        if os.path.exists(log_path):
+            good_bytes = 0
+            with open(log_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        break  # dòng cuối bị ghi dở khi process chết
+                    journal._apply(record)
+                    good_bytes += len(line)
+            # Cắt bỏ phần ghi dở để các dòng mới không bị dính vào nó
+            if good_bytes < os.path.getsize(log_path):
+                with open(log_path, "r+b") as f:
+                    f.truncate(good_bytes)
+        return journal
+
+    @property
+    def video_id(self) -> str:
+        return self.meta.get("video_id", "")
+
+    @property
+    def params(self) -> Dict:
+        return self.meta.get("params", {})
+
+    # ---------- transcript ----------
+    def save_transcript(self, transcript: Transcript) -> None:
+        self._write_json("transcript.json", transcript.to_raw_data())
+
+    def load_transcript(self) -> Optional[Transcript]:
+        path = os.path.join(self.path, "transcript.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return Transcript.from_raw_data(json.load(f))
+
+    # ---------- các bước ----------
+    def chunk_summary(self, index: int, chunk_text: str) -> Optional[str]:
+        """Tóm tắt đã lưu của chunk `index`, chỉ dùng nếu nội dung chunk không đổi."""
+        record = self.chunks.get(index)
+        if record and record.get("fingerprint") == _fingerprint(chunk_text):
+            return record["summary"]
+        return None
+
+    def record_chunk(self, index: int, chunk_text: str, summary: str) -> None:
+        self._append(
+            {
+                "stage": "chunk",
+                "index": index,
+                "fingerprint": _fingerprint(chunk_text),
+                "summary": summary,
+            }
+        )
+
+    def section(self, name: str) -> Optional[str]:
+        return self.sections.get(name)
+
+    def record_section(self, name: str, text: str) -> None:
+        self._append({"stage": "section", "name": name, "text": text})
+
+    def record_result(self, text: str) -> None:
+        self._append({"stage": "result", "text": text})
+
+    @property
+    def completed_chunks(self) -> int:
+        return len(self.chunks)
+
+    # ---------- nội bộ ----------
+    def _apply(self, record: dict) -> None:
+        stage = record.get("stage")
+        if stage == "chunk":
+            self.chunks[int(record["index"])] = record
+        elif stage == "section":
+            self.sections[record["name"]] = record.get("text", "")
+        elif stage == "result":
+            self.result = record.get("text", "")
+
+    def _append(self, record: dict) -> None:
+        record["ts"] = round(time.time(), 3)
+        line = json.dumps(record, ensure_ascii=False)
+        with open(os.path.join(self.path, "journal.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(record)
+
+    def _write_json(self, name: str, data) -> None:
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, name))
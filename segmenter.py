@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Chia transcript theo chủ đề (TextTiling, vector hóa bằng NumPy).
+
+Thay vì cắt cứng mỗi N từ như chunk_by_words, ta:
+1. Chia văn bản thành các "pseudo-sentence" dài `w` từ (transcript thường
+   không có dấu câu nên không dựa vào câu thật).
+2. Với mỗi khe giữa hai pseudo-sentence, so sánh cosine giữa khối `k`
+   pseudo-sentence bên trái và bên phải (dùng tổng tích lũy, không lặp Python).
+3. Tính "depth score": khe càng nằm sâu trong thung lũng độ tương đồng thì
+   càng có khả năng là chỗ chuyển chủ đề.
+4. Chọn ranh giới trong ngân sách [min_words, max_words]: lấy khe sâu nhất
+   trong cửa sổ nếu nó vượt ngưỡng (mean + std/2), nếu không có chỗ chuyển
+   chủ đề rõ ràng thì cắt ở khe xa nhất (chunk ít và đặc hơn).
+"""
+
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"[.!?…][\"')\]]*$")
+
+# Stopword ngắn gọn (en + vi) để độ tương đồng dựa trên từ mang nội dung
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have he her his i if in into is it
+    its me my no not of on or our she so that the their them then there these
+    they this to up was we were what when which who will with you your do does
+    did just like okay ok yeah um uh gonna going get got can could would should
+    và là của có cho được này những các một không thì với trong khi đã sẽ rất
+    cũng như để mà nó ta tôi bạn chúng ra vào lại đó đây thế nào gì nhé ạ à ừ
+    """.split()
+)
+
+
+def _normalize_token(word: str) -> str:
+    m = _TOKEN_RE.search(word.lower())
+    return m.group(0) if m else ""
+
+
+def gap_depth_scores(
+    words: Sequence[str],
+    pseudo_sentence_words: int = 20,
+    block_size: int = 6,
+    max_dims: int = 4096,
+) -> np.ndarray:
+    """
+    Trả về depth score cho từng khe giữa các pseudo-sentence.
+    Khe thứ g nằm ở vị trí từ g * pseudo_sentence_words (g = 1..n-1).
+    """
+    w = max(1, pseudo_sentence_words)
+    n_ps = (len(words) + w - 1) // w
+    if n_ps < 2:
+        return np.zeros(0, dtype=np.float32)
+
+    tokens = [_normalize_token(word) for word in words]
+    positions = np.array(
+        [i for i, tok in enumerate(tokens) if tok and tok not in _STOPWORDS],
+        dtype=np.int64,
+    )
+    if positions.size == 0:
+        return np.zeros(n_ps - 1, dtype=np.float32)
+    vocab, ids = np.unique(
+        np.array([tokens[i] for i in positions], dtype=object), return_inverse=True
+    )
+    # Giới hạn số chiều để bộ nhớ không phụ thuộc kích thước từ vựng
+    dims = min(len(vocab), max_dims)
+    ids = ids % dims
+
+    counts = np.zeros((n_ps + 1, dims), dtype=np.float32)
+    np.add.at(counts, (positions // w + 1, ids), 1.0)
+    cumulative = np.cumsum(counts, axis=0)
+
+    gaps = np.arange(1, n_ps)
+    k = max(1, block_size)
+    left = cumulative[gaps] - cumulative[np.maximum(gaps - k, 0)]
+    right = cumulative[np.minimum(gaps + k, n_ps)] - cumulative[gaps]
+    denom = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+    sims = np.divide(
+        np.einsum("ij,ij->i", left, right),
+        denom,
+        out=np.zeros(len(gaps), dtype=np.float32),
+        where=denom > 0,
+    )
+
+    # Làm mượt nhẹ rồi tính độ sâu so với đỉnh gần nhất mỗi bên (trong k khe)
+    if sims.size >= 3:
+        padded = np.pad(sims, 1, mode="edge")
+        sims = (padded[:-2] + padded[1:-1] + padded[2:]) / 3.0
+    padded = np.pad(sims, k, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, k + 1)
+    left_peak = windows[: len(sims)].max(axis=1)
+    right_peak = windows[k : k + len(sims)].max(axis=1)
+    return ((left_peak - sims) + (right_peak - sims)).astype(np.float32)
+
+
+def topic_boundaries(
+    words: Sequence[str],
+    max_words: int,
+    min_words: Optional[int] = None,
+    pseudo_sentence_words: int = 20,
+    block_size: int = 6,
+) -> List[int]:
+    """
+    Trả về danh sách vị trí từ (word offset) để cắt, không gồm 0 và len(words).
+    Mọi đoạn đều <= max_words; các đoạn (trừ đoạn cuối) >= min_words.
+    """
+    total = len(words)
+    max_words = max(1, max_words)
+    if total <= max_words:
+        return []
+    if min_words is None:
+        min_words = max_words // 2
+    min_words = max(1, min(min_words, max_words))
+
+    w = max(1, pseudo_sentence_words)
+    depths = gap_depth_scores(words, w, block_size)
+    gap_pos = np.arange(1, len(depths) + 1, dtype=np.int64) * w
+    if depths.size and depths.std() > 0:
+        threshold = float(depths.mean() + depths.std() / 2)
+    else:
+        # Độ sâu phẳng (vd. toàn stopword): không có khe nào nổi bật
+        threshold = float("inf")
+
+    # Nếu có dấu câu, dời ranh giới về cuối câu gần nhất (trong nửa pseudo-sentence)
+    sentence_ends = np.array(
+        [i + 1 for i, word in enumerate(words) if _SENTENCE_END_RE.search(word)],
+        dtype=np.int64,
+    )
+    if sentence_ends.size and gap_pos.size:
+        idx = np.clip(np.searchsorted(sentence_ends, gap_pos), 1, sentence_ends.size) - 1
+        candidates = np.stack(
+            [sentence_ends[idx], sentence_ends[np.minimum(idx + 1, sentence_ends.size - 1)]]
+        )
+        nearest = candidates[np.argmin(np.abs(candidates - gap_pos), axis=0), np.arange(gap_pos.size)]
+        gap_pos = np.where(np.abs(nearest - gap_pos) <= w // 2, nearest, gap_pos)
+
+    cuts: List[int] = []
+    start = 0
+    while total - start > max_words:
+        lo, hi = start + min_words, start + max_words
+        in_window = (gap_pos >= lo) & (gap_pos <= hi)
+        if not in_window.any():
+            cut = hi
+        else:
+            cand_pos = gap_pos[in_window]
+            cand_depth = depths[in_window]
+            if cand_depth.max() >= threshold:
+                # Nhiều khe sâu bằng nhau thì lấy khe xa nhất (chunk ít hơn)
+                cut = int(cand_pos[len(cand_depth) - 1 - int(np.argmax(cand_depth[::-1]))])
+            else:
+                # Không có chỗ chuyển chủ đề rõ ràng: lấy chunk dài nhất có thể
+                cut = int(cand_pos[-1])
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def chunk_by_topics(
+    text: str,
+    max_words: int,
+    min_words: Optional[int] = None,
+) -> List[str]:
+    """Thay thế chunk_by_words: cắt tại chỗ chuyển chủ đề trong ngân sách từ."""
+    words = text.split()
+    if not words:
+        return []
+    bounds = [0] + topic_boundaries(words, max_words, min_words) + [len(words)]
+    return [" ".join(words[a:b]) for a, b in zip(bounds, bounds[1:])]
@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evidence import (  # noqa: E402
+    extract_key_points,
+    score_sentences,
+    select_section_evidence,
+    split_note_units,
+    top_sentences,
+)
+
+
+def _units():
+    # 3 chunk, mỗi chunk 2 câu; câu "step" là câu có từ khóa của phần steps
+    return [
+        (0, "First step install the python package"),
+        (0, "The package has many users"),
+        (1, "Next step write the config file"),
+        (1, "The config file is plain text"),
+        (2, "Finally step run the python tests"),
+        (2, "The tests take a minute"),
+    ]
+
+
+def test_round_robin_covers_every_chunk_before_repeating():
+    units = _units()
+    evidence = select_section_evidence(units, [10] * len(units), {"steps": 30, "title": 30})
+    # Ngân sách đủ cho 3 câu: mỗi chunk một câu, câu có từ khóa được ưu tiên
+    assert evidence["steps"] == (
+        "First step install the python package Next step write the config file "
+        "Finally step run the python tests"
+    )
+    title_chunks = {units[i][0] for i, (_, text) in enumerate(units) if text in evidence["title"]}
+    assert title_chunks == {0, 1, 2}
+
+
+def test_evidence_respects_budget_and_keeps_order():
+    units = _units()
+    costs = [10, 1, 10, 1, 10, 1]
+    evidence = select_section_evidence(units, costs, {"steps": 23})
+    # Hai câu "step" (20 token), câu thứ ba không vừa; phần còn lại lấy câu rẻ,
+    # rồi sắp lại theo thứ tự xuất hiện trong bài giảng
+    chosen = [0, 1, 2, 3, 5]
+    assert sum(costs[i] for i in chosen) <= 23
+    assert evidence["steps"] == " ".join(units[i][1] for i in chosen)
+    assert select_section_evidence(units, costs, {"steps": 0})["steps"] == ""
+
+
+def test_split_note_units_keeps_chunk_index():
+    units = split_note_units(["- a. b", "", "* c"], lambda block: block.split("."))
+    assert units == [(0, "a"), (0, "b"), (2, "c")]
+
+
+def test_top_sentences_is_stable_and_incremental():
+    text = (
+        "This is an important first step for the whole course. "
+        "Short one. "
+        "Remember this key example because it matters a lot here. "
+        "Another important note about step two in the process today."
+    )
+    scored = score_sentences(text)
+    assert [sentence for _, sentence in scored][0].startswith("This is an important")
+    full = top_sentences(scored, 2)
+    half = len(text) // 2
+    cut = text.rfind(".", 0, half) + 1
+    earlier = top_sentences(score_sentences(text[:cut]), 2)
+    assert top_sentences(earlier + score_sentences(text[cut:]), 2) == full
+    assert extract_key_points(text[cut:], 2, earlier=earlier) == [s for _, s in full]
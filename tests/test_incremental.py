@@ -0,0 +1,92 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evidence import extract_key_points  # noqa: E402
+from incremental import StreamState, sentence_boundary  # noqa: E402
+from transcript import Transcript  # noqa: E402
+
+SENTENCES = [
+    "This is an important first step for the whole course today",
+    "Remember this key example because it matters a lot here",
+    "The next step is to define the main function and call it",
+    "Why does the loop stop? because the condition becomes false at the end",
+    "Another tip is to write tests for each function you create",
+    "Finally we compare both solutions and note the difference",
+]
+
+
+def _state(tmp_path):
+    return StreamState.open("vid00000001", "en", "gemini", streams_dir=str(tmp_path))
+
+
+def test_key_points_match_full_run_as_text_grows(tmp_path):
+    full = ". ".join(SENTENCES) + "."
+    # Transcript dài dần, lần cắt thứ hai dừng giữa câu
+    cuts = [len(". ".join(SENTENCES[:2])) + 1, full.index("loop stop"), len(full)]
+    for cut in cuts:
+        text = full[:cut]
+        state = _state(tmp_path)  # mỗi lần chạy là một process mới: đọc lại từ file
+        assert state.key_points(text, 4) == extract_key_points(text, 4)
+
+
+def test_key_points_start_over_when_earlier_text_changes(tmp_path):
+    text = ". ".join(SENTENCES[:3]) + "."
+    _state(tmp_path).key_points(text, 4)
+    edited = text.replace("whole course", "entire course") + " " + SENTENCES[3] + "."
+    state = _state(tmp_path)
+    assert state.resume_key_points(edited) == ([], 0)
+    assert state.key_points(edited, 4) == extract_key_points(edited, 4)
+
+
+def test_sentence_boundary():
+    assert sentence_boundary("one. two! three") == len("one. two!")
+    assert sentence_boundary("no punctuation", 3) == 3
+
+
+def _transcript(snippets):
+    return Transcript.from_raw_data(
+        [{"text": f"w{i}a w{i}b", "start": i * 5.0, "duration": 5.0} for i in range(snippets)]
+    )
+
+
+def test_chunks_resume_from_last_closed_chunk(tmp_path):
+    first = _transcript(6).span()
+    state = StreamState.open("vid00000002", "en", "local", streams_dir=str(tmp_path))
+    state.bind({"chunk_words": 4})
+    chunks = [(f"summary {c.lo}", c) for c in first.chunks(4)]
+    state.save_chunks(first, chunks, chunk_words=4, chunking="words")
+
+    grown = _transcript(9).span()
+    state = StreamState.open("vid00000002", "en", "local", streams_dir=str(tmp_path))
+    state.bind({"chunk_words": 4})
+    done, rest = state.resume_chunks(grown)
+    # Chunk cuối chạm cuối transcript cũ nhưng đã đủ 4 từ nên "đóng"; chỉ phần mới phải tóm tắt
+    assert [summary for summary, _ in done] == ["summary 0", "summary 2", "summary 4"]
+    assert (rest.lo, rest.hi) == (6, 9)
+    # Cùng cách chia chunk như chạy lại cả transcript
+    resumed = [(c.lo, c.hi) for _, c in done] + [(c.lo, c.hi) for c in rest.chunks(4)]
+    assert resumed == [(c.lo, c.hi) for c in grown.chunks(4)]
+
+
+def test_open_last_chunk_is_summarized_again(tmp_path):
+    first = _transcript(5).span()
+    state = StreamState.open("vid00000003", "en", "local", streams_dir=str(tmp_path))
+    chunks = [(f"summary {c.lo}", c) for c in first.chunks(4)]
+    state.save_chunks(first, chunks, chunk_words=4, chunking="words")
+    done, rest = state.resume_chunks(_transcript(8).span())
+    # Chunk cuối chỉ có 2 từ -> còn "mở", được tóm tắt lại cùng phần mới
+    assert [summary for summary, _ in done] == ["summary 0", "summary 2"]
+    assert (rest.lo, rest.hi) == (4, 8)
+
+
+def test_changed_settings_start_over(tmp_path):
+    first = _transcript(4).span()
+    state = StreamState.open("vid00000004", "en", "local", streams_dir=str(tmp_path))
+    state.bind({"chunk_words": 4})
+    state.save_chunks(first, [(f"s{c.lo}", c) for c in first.chunks(4)], chunk_words=4, chunking="words")
+    state = StreamState.open("vid00000004", "en", "local", streams_dir=str(tmp_path))
+    state.bind({"chunk_words": 2})
+    done, rest = state.resume_chunks(_transcript(6).span())
+    assert done == [] and (rest.lo, rest.hi) == (0, 6)
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_profile import (  # noqa: E402
+    DEFAULT_PROFILE,
+    entry_setting,
+    save_entry_setting,
+    save_profile,
+)
+
+
+def test_create_lesson_keeps_old_chunk_words_without_tuning(tmp_path):
+    path = str(tmp_path / "profile.json")
+    assert entry_setting("create_lesson", "chunk_words", path) == 600
+    # Profile chung được đo với cấu hình quickstart, không áp cho create_lesson
+    save_profile(dict(DEFAULT_PROFILE, chunk_words=200), path)
+    assert entry_setting("create_lesson", "chunk_words", path) == 600
+
+
+def test_entry_setting_survives_general_retune(tmp_path):
+    path = str(tmp_path / "profile.json")
+    save_entry_setting("create_lesson", {"chunk_words": 400, "num_beams": 1}, path)
+    assert entry_setting("create_lesson", "chunk_words", path) == 400
+    save_profile(dict(DEFAULT_PROFILE), path)
+    assert entry_setting("create_lesson", "chunk_words", path) == 400
@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_service import AUTO_BACKEND, JobService, make_router  # noqa: E402
+from lesson_index import LessonIndex  # noqa: E402
+
+
+def _route_all(service, router, worker="w1"):
+    """Nhận và định tuyến lần lượt mọi job đang chờ như worker làm (job không chạy xong)."""
+    routed = []
+    while True:
+        job = service.claim(worker)
+        if job is None:
+            return routed
+        backend = router.choose()
+        service.route(job["id"], backend)
+        routed.append(backend)
+
+
+def _submit(service, count):
+    for i in range(count):
+        service.submit(f"vid{i:08d}", "vi", AUTO_BACKEND)
+
+
+def test_deep_auto_queue_reaches_gemini(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    _submit(service, 20)
+    routed = _route_all(service, make_router(service, workers=2, remote_available=True))
+    assert len(routed) == 20
+    assert "gemini" in routed
+    # Khi hàng đợi đã vơi, các job cuối chạy local
+    assert routed[-1] == "local"
+
+
+def test_shallow_auto_queue_stays_local(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    _submit(service, 1)
+    routed = _route_all(service, make_router(service, workers=2, remote_available=True))
+    assert routed == ["local"]
+
+
+def test_unrouted_auto_jobs_count_as_local_depth(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    _submit(service, 3)
+    assert service.backend_depth("local") == 0
+    assert service.backend_depth("local", include_unrouted=True) == 3
+
+
+def _age(service, job_id, seconds):
+    conn = service._connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET started_at = started_at - ?, heartbeat = heartbeat - ? WHERE id = ?",
+            (seconds, seconds, job_id),
+        )
+    finally:
+        conn.close()
+
+
+def test_requeue_stale_keeps_live_jobs_and_cancelled_jobs(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    _submit(service, 3)
+    dead = service.claim("w1")
+    live = service.claim("w2")
+    cancelling = service.claim("w3")
+    service.cancel(cancelling["id"])
+    for job in (dead, live, cancelling):
+        _age(service, job["id"], 3600)
+    service.beat(live["id"])  # đã chạy một giờ nhưng worker vẫn sống
+
+    assert service.requeue_stale(120) == 1
+    assert service.get(dead["id"])["status"] == "queued"
+    assert service.get(live["id"])["status"] == "running"
+    assert service.get(cancelling["id"])["status"] == "cancelled"
+
+
+def _mark_done(service, job_id, finished_at):
+    conn = service._connect()
+    try:
+        conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (finished_at, job_id))
+    finally:
+        conn.close()
+
+
+def test_finished_job_reuse_respects_max_age(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    job_id, _ = service.submit("vid00000001", "vi", "gemini")
+    _mark_done(service, job_id, time.time() - 7200)
+    assert service.submit("vid00000001", "vi", "gemini", max_age=None) == (job_id, True)
+    new_id, coalesced = service.submit("vid00000001", "vi", "gemini", max_age=3600)
+    assert not coalesced and new_id != job_id
+
+
+def test_incremental_jobs_never_reuse_finished_results(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    params = {"incremental": True}
+    job_id, _ = service.submit("vid00000002", "vi", "gemini", params)
+    _mark_done(service, job_id, time.time())
+    new_id, coalesced = service.submit("vid00000002", "vi", "gemini", params)
+    assert not coalesced and new_id != job_id
+
+
+def test_partial_results_are_not_reused_or_indexed(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    job_id, _ = service.submit("vid00000003", "vi", "gemini")
+    service.claim("w1")
+    record = {"ok": True, "partial": True, "markdown": "# Bài học dở dang"}
+    service.finish(job_id, 0, json.dumps(record), "")
+    job = service.get(job_id)
+    assert job["status"] == "done" and job["partial"] == 1
+    assert job["output"] == "# Bài học dở dang"
+    new_id, coalesced = service.submit("vid00000003", "vi", "gemini")
+    assert not coalesced and new_id != job_id
+    assert LessonIndex(service.index_path).stats()["lesson"] == 0
+
+
+def test_reroute_clears_previous_error(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    job_id, _ = service.submit("vid00000004", "vi", AUTO_BACKEND)
+    service.claim("w1")
+    service.route(job_id, "gemini")
+    service.finish(job_id, 1, "", "429 Resource has been exhausted (rate limit)")
+    service.reroute(job_id, "local")
+    job = service.get(job_id)
+    assert job["status"] == "queued" and job["routed_backend"] == "local"
+    assert job["error"] is None
+
+
+def test_merged_job_is_cancelled_by_its_last_submitter(tmp_path):
+    service = JobService(str(tmp_path / "jobs.sqlite3"))
+    job_id, _ = service.submit("vid00000005", "vi", "gemini")
+    assert service.submit("vid00000005", "vi", "gemini") == (job_id, True)
+    service.claim("w1")
+    assert service.cancel(job_id) == "running"
+    assert not service.cancel_requested(job_id)
+    assert service.cancel(job_id) == "cancelling"
+    assert service.cancel_requested(job_id)
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_index import LessonIndex  # noqa: E402
+
+LESSON = """# Vòng lặp for trong Python
+
+## Mục tiêu học tập
+- Hiểu cách dùng vòng lặp để duyệt danh sách
+
+## Khái niệm chính
+Hàm range() tạo dãy số.
+"""
+
+
+def _index(tmp_path, plain):
+    path = str(tmp_path / "index.sqlite3")
+    if plain:
+        # Index cũ không có FTS5 (và chưa có cột folded): buộc dùng đường LIKE
+        conn = sqlite3.connect(path)
+        conn.executescript("CREATE TABLE sections (section TEXT, body TEXT, doc_id INTEGER);")
+        conn.close()
+    index = LessonIndex(path)
+    assert index.fts is not plain
+    return index
+
+
+@pytest.mark.parametrize("plain", [False, True])
+def test_search_ignores_vietnamese_diacritics(tmp_path, plain):
+    index = _index(tmp_path, plain)
+    index.add("job", "j1", "lesson", "vid00000001", LESSON, language="vi")
+    hits = index.search("vong lap")
+    assert {hit["section"] for hit in hits} == {"title", "objectives"}
+    assert all(hit["video_id"] == "vid00000001" for hit in hits)
+    assert index.search("VÒNG LẶP") and not index.search("vong while")
+
+
+@pytest.mark.parametrize("plain", [False, True])
+def test_search_requires_every_term_and_filters(tmp_path, plain):
+    index = _index(tmp_path, plain)
+    index.add("job", "j1", "lesson", "vid00000001", LESSON, language="vi")
+    index.add("fixture", "f1", "transcript", "vid00000002", "today we learn about range in python", language="en")
+    assert {hit["video_id"] for hit in index.search("range")} == {"vid00000001", "vid00000002"}
+    assert [hit["video_id"] for hit in index.search("range python")] == ["vid00000002"]
+    assert [hit["kind"] for hit in index.search("range", kind="transcript")] == ["transcript"]
+    assert {hit["language"] for hit in index.search("range", language="vi")} == {"vi"}
+    assert index.search("   ") == []
+
+
+def test_add_skips_unchanged_and_replaces_changed(tmp_path):
+    index = _index(tmp_path, plain=False)
+    assert index.add("job", "j1", "lesson", "vid00000001", LESSON)
+    assert not index.add("job", "j1", "lesson", "vid00000001", LESSON)
+    assert index.add("job", "j1", "lesson", "vid00000001", LESSON.replace("range()", "enumerate()"))
+    assert not index.search("range") and index.search("enumerate")
+    docs = index.lookup("vid00000001")
+    assert len(docs) == 1 and docs[0]["title"] == "Vòng lặp for trong Python"
+
+
+def test_plain_index_backfills_folded_column(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("CREATE TABLE sections (section TEXT, body TEXT, doc_id INTEGER);")
+    conn.close()
+    LessonIndex(path).add("job", "j1", "lesson", "vid00000001", LESSON)
+    # Đưa bảng về dạng cũ (chưa có cột folded) nhưng giữ các phần đã index
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "ALTER TABLE sections RENAME TO old;"
+        "CREATE TABLE sections (section TEXT, body TEXT, doc_id INTEGER);"
+        "INSERT INTO sections SELECT section, body, doc_id FROM old; DROP TABLE old;"
+    )
+    conn.close()
+    assert {hit["section"] for hit in LessonIndex(path).search("vong lap")} == {"title", "objectives"}
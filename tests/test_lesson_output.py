@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_output import OutputWriter, split_lesson_sections  # noqa: E402
+
+LESSON = """Dòng trước heading bị bỏ qua
+# 📚 TIÊU ĐỀ BÀI HỌC
+**Vòng lặp trong Python**
+
+## 🎯 Mục tiêu học tập
+- Hiểu vòng for
+### Chi tiết
+- Duyệt danh sách
+
+## Ví dụ
+x = 1
+## Ví dụ thêm
+y = 2
+## Đọc thêm!
+link
+"""
+
+
+def test_split_lesson_sections_by_heading():
+    sections = split_lesson_sections(LESSON)
+    assert sections["title"] == "Vòng lặp trong Python"
+    # ### nằm trong phần ## đang mở, không tách phần mới
+    assert sections["objectives"] == "- Hiểu vòng for\n### Chi tiết\n- Duyệt danh sách"
+    # Hai heading cùng loại được gộp
+    assert sections["examples"] == "x = 1\n\ny = 2"
+    # Heading lạ thành slug
+    assert sections["đọc_thêm"] == "link"
+    assert list(sections) == ["title", "objectives", "examples", "đọc_thêm"]
+
+
+def test_title_falls_back_to_heading():
+    assert split_lesson_sections("# Heading only") == {"title": "Heading only"}
+    placeholder = split_lesson_sections("# TIÊU ĐỀ\n[Tạo tiêu đề hấp dẫn]\n## Summary\nok")
+    assert placeholder == {"title": "TIÊU ĐỀ", "summary": "ok"}
+    assert split_lesson_sections("") == {}
+
+
+def test_json_result_includes_sections():
+    stream = io.StringIO()
+    writer = OutputWriter("json", stream)
+    writer.stage("transcript", words=10)
+    writer.result(LESSON, video_id="vid00000001", partial=True)
+    record = json.loads(stream.getvalue())
+    assert record["ok"] is True and record["partial"] is True
+    assert record["sections"]["title"] == "Vòng lặp trong Python"
+    assert record["markdown"] == LESSON
+    assert set(record["timings"]) == {"transcript", "total"}
+
+
+def test_ndjson_emits_stage_events():
+    stream = io.StringIO()
+    writer = OutputWriter("ndjson", stream)
+    writer.stage("transcript")
+    writer.error("boom")
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["event"] for e in events] == ["stage", "error"]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_journal import RunJournal  # noqa: E402
+from transcript import Transcript  # noqa: E402
+
+
+def test_load_drops_truncated_last_line(tmp_path):
+    runs = str(tmp_path)
+    journal = RunJournal.create("vid00000001", {"language": "vi"}, runs_dir=runs)
+    journal.record_chunk(0, "chunk zero", "summary zero")
+    journal.record_section("objectives", "- hiểu vòng lặp")
+    log_path = os.path.join(journal.path, "journal.jsonl")
+    good_size = os.path.getsize(log_path)
+    with open(log_path, "ab") as f:
+        f.write('{"stage": "chunk", "index": 1, "summ'.encode("utf-8"))  # process chết khi đang ghi
+
+    resumed = RunJournal.load(journal.run_id, runs_dir=runs)
+    assert resumed.completed_chunks == 1
+    assert resumed.chunk_summary(0, "chunk zero") == "summary zero"
+    assert resumed.section("objectives") == "- hiểu vòng lặp"
+    assert os.path.getsize(log_path) == good_size
+
+    # Dòng mới không bị dính vào phần ghi dở
+    resumed.record_chunk(1, "chunk one", "summary one")
+    again = RunJournal.load(journal.run_id, runs_dir=runs)
+    assert again.completed_chunks == 2
+    assert again.params == {"language": "vi"}
+
+
+def test_chunk_summary_requires_same_chunk_text(tmp_path):
+    journal = RunJournal.create("vid00000002", {}, runs_dir=str(tmp_path))
+    journal.record_chunk(0, "original text", "summary")
+    assert journal.chunk_summary(0, "original text") == "summary"
+    assert journal.chunk_summary(0, "edited text") is None
+    assert journal.chunk_summary(1, "original text") is None
+
+
+def test_transcript_and_result_round_trip(tmp_path):
+    runs = str(tmp_path)
+    journal = RunJournal.create("vid00000003", {}, runs_dir=runs)
+    transcript = Transcript.from_raw_data([{"text": "xin chào", "start": 0.0, "duration": 2.0}])
+    journal.save_transcript(transcript)
+    journal.record_result("# Bài học")
+    resumed = RunJournal.load(journal.run_id, runs_dir=runs)
+    assert resumed.load_transcript().text == "xin chào"
+    assert resumed.result == "# Bài học"
+    # Cùng video, cùng giây: run mới có hậu tố thay vì ghi đè
+    assert RunJournal.create("vid00000003", {}, runs_dir=runs).run_id != journal.run_id
+
+
+def test_load_unknown_run(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RunJournal.load("missing", runs_dir=str(tmp_path))
@@ -0,0 +1,49 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import chunk_by_topics, topic_boundaries  # noqa: E402
+
+
+def test_flat_depths_cut_at_max_words():
+    # Toàn stopword: mọi khe có độ sâu 0, không được cắt ở min_words
+    words = ("the and of to a " * 400).split()
+    assert topic_boundaries(words, 600, 300) == [600, 1200, 1800]
+
+
+def _topics(*vocabularies, words_each=400, seed=0):
+    rnd = random.Random(seed)
+    return [rnd.choice(vocab.split()) for vocab in vocabularies for _ in range(words_each)]
+
+
+PYTHON = "python function variable loop list index range print"
+DATABASE = "database table query index join column sql row"
+NETWORK = "network socket server client request packet port http"
+
+
+def test_cuts_fall_on_topic_shifts():
+    words = _topics(PYTHON, DATABASE, NETWORK)
+    assert topic_boundaries(words, 600, 200) == [400, 800]
+
+
+def test_cut_moves_to_nearest_sentence_end():
+    words = _topics(PYTHON, DATABASE, NETWORK)
+    words[394] += "."  # kết thúc câu sau từ thứ 395, trong nửa pseudo-sentence
+    assert topic_boundaries(words, 600, 200)[0] == 395
+
+
+def test_chunks_respect_word_budget():
+    words = _topics(PYTHON, DATABASE, NETWORK, PYTHON, words_each=250, seed=1)
+    bounds = [0] + topic_boundaries(words, 300, 120) + [len(words)]
+    sizes = [b - a for a, b in zip(bounds, bounds[1:])]
+    assert all(size <= 300 for size in sizes)
+    assert all(size >= 120 for size in sizes[:-1])
+    text = " ".join(words)
+    assert " ".join(chunk_by_topics(text, 300, 120)) == text
+
+
+def test_short_text_is_not_split():
+    assert topic_boundaries(_topics(PYTHON, words_each=100), 600) == []
+    assert chunk_by_topics("", 600) == []
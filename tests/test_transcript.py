@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript import Transcript, format_timestamp, parse_timestamp  # noqa: E402
+
+
+def _transcript(snippets=6):
+    """Mỗi snippet 3 từ, dài 10 giây."""
+    return Transcript.from_raw_data(
+        [{"text": f" s{i}a  s{i}b\ns{i}c ", "start": i * 10.0, "duration": 10.0} for i in range(snippets)]
+        + [{"text": "   ", "start": 99.0, "duration": 1.0}]  # snippet rỗng bị bỏ
+    )
+
+
+def test_from_raw_data_cleans_and_indexes_snippets():
+    t = _transcript()
+    assert len(t) == 6 and t.word_count == 18
+    assert t.text.startswith("s0a s0b s0c s1a")
+    assert Transcript.from_raw_data(t.to_raw_data()).text == t.text
+
+
+def test_slice_time_keeps_overlapping_snippets():
+    span = _transcript().slice_time(15, 35)
+    # 15s nằm giữa snippet 1 (10-20s), 35s nằm giữa snippet 3 (30-40s)
+    assert (span.lo, span.hi) == (1, 4)
+    assert span.text == "s1a s1b s1c s2a s2b s2c s3a s3b s3c"
+    assert span.label == "00:10-00:40"
+    assert span.word_count == 9
+
+
+def test_slice_time_open_ends_and_empty_range():
+    t = _transcript()
+    assert (t.slice_time(None, 20).lo, t.slice_time(None, 20).hi) == (0, 2)
+    assert (t.slice_time(20, None).lo, t.slice_time(20, None).hi) == (2, 6)
+    # start đúng lúc snippet 1 kết thúc: snippet 1 không còn được giữ
+    assert t.slice_time(20, 30).text == "s2a s2b s2c"
+    empty = t.slice_time(100, 200)
+    assert not empty and empty.text == "" and empty.word_count == 0
+
+
+def test_slice_words_rounds_out_to_snippet_boundaries():
+    span = _transcript().slice_words(4, 8)
+    assert (span.lo, span.hi) == (1, 3)
+    nested = _transcript().slice_time(10, None).slice_words(0, 3)
+    assert nested.text == "s1a s1b s1c"
+
+
+def test_chunks_and_split_at_words_cover_the_span():
+    span = _transcript().span()
+    assert [(c.lo, c.hi) for c in span.chunks(7)] == [(0, 3), (3, 6)]
+    # Điểm cắt dời về ranh giới snippet gần nhất (5 -> 6 từ, 10 -> 9 từ)
+    parts = list(span.split_at_words([5, 10]))
+    assert [(p.lo, p.hi) for p in parts] == [(0, 2), (2, 3), (3, 6)]
+    assert " ".join(p.text for p in parts) == span.text
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("95", 95.0), ("95.5", 95.5), ("1:35", 95.0), ("1:02:05", 3725.0), (" 10:00 ", 600.0)],
+)
+def test_parse_timestamp(value, seconds):
+    assert parse_timestamp(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "abc", "1:2:3:4", "-5"])
+def test_parse_timestamp_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_format_timestamp():
+    assert format_timestamp(95.2) == "01:35"
+    assert format_timestamp(3725) == "1:02:05"
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Transcript có timestamp, lưu dạng gọn:
+- Một chuỗi text duy nhất (các snippet nối bằng 1 dấu cách)
+- Các mảng song song: start / duration / offset ký tự / offset từ
+
+TranscriptSpan là "view" trên một dải snippet liên tiếp: cắt theo thời gian
+hoặc theo offset từ (token = từ tách bằng khoảng trắng, giống chunk_by_words)
+chỉ tạo view mới, không copy text hay mảng. Text chỉ được ghép khi gọi `.text`.
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Optional
+
+
+def _clean_snippet(s: str) -> str:
+    return re.sub(r"\s+", " ", s or "").strip()
+
+
+def format_timestamp(seconds: float) -> str:
+    """95.2 -> '01:35', 3725 -> '1:02:05'"""
+    total = int(max(0.0, seconds))
+    h, rem = divmod(total, 3600)
+    m, s = divmod(rem, 60)
+    if h:
+        return f"{h}:{m:02d}:{s:02d}"
+    return f"{m:02d}:{s:02d}"
+
+
+def parse_timestamp(value: str) -> float:
+    """
+    Đọc mốc thời gian dạng '95', '95.5', '1:35' hoặc '1:02:05' -> số giây.
+    """
+    value = (value or "").strip()
+    if not value:
+        raise ValueError("Empty timestamp")
+    parts = value.split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Invalid timestamp: {value}")
+    try:
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if seconds < 0:
+        raise ValueError(f"Invalid timestamp: {value}")
+    return seconds
+
+
+class Transcript:
+    """
+    Bộ đệm transcript: `text` + các mảng song song theo từng snippet.
+
+    - starts[i], durations[i]: thời gian (giây) của snippet i
+    - offsets[i]: vị trí ký tự bắt đầu của snippet i trong `text`
+    - word_offsets[i]: số từ đứng trước snippet i (word_offsets[n] = tổng số từ)
+    """
+
+    __slots__ = ("text", "starts", "durations", "offsets", "word_offsets")
+
+    def __init__(
+        self,
+        text: str,
+        starts: array,
+        durations: array,
+        offsets: array,
+        word_offsets: array,
+    ):
+        self.text = text
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.word_offsets = word_offsets
+
+    @classmethod
+    def from_raw_data(cls, raw_entries: Iterable[dict]) -> "Transcript":
+        """Tạo từ `FetchedTranscript.to_raw_data()` (list dict text/start/duration)."""
+        parts: List[str] = []
+        starts = array("d")
+        durations = array("d")
+        offsets = array("q")
+        word_offsets = array("q", [0])
+        pos = 0
+        words = 0
+        for entry in raw_entries:
+            text = _clean_snippet(entry.get("text", ""))
+            if not text:
+                continue
+            if parts:
+                pos += 1  # dấu cách nối giữa 2 snippet
+            parts.append(text)
+            starts.append(float(entry.get("start", 0.0) or 0.0))
+            durations.append(float(entry.get("duration", 0.0) or 0.0))
+            offsets.append(pos)
+            pos += len(text)
+            words += len(text.split())
+            word_offsets.append(words)
+        return cls(" ".join(parts), starts, durations, offsets, word_offsets)
+
+    def to_raw_data(self) -> List[dict]:
+        """Ngược lại của from_raw_data (text đã được làm sạch)."""
+        return [
+            {
+                "text": TranscriptSpan(self, i, i + 1).text,
+                "start": self.starts[i],
+                "duration": self.durations[i],
+            }
+            for i in range(len(self))
+        ]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def span(self) -> "TranscriptSpan":
+        return TranscriptSpan(self, 0, len(self))
+
+    # Các hàm tiện ích gọi thẳng trên toàn bộ transcript
+    def slice_time(self, start: Optional[float] = None, end: Optional[float] = None) -> "TranscriptSpan":
+        return self.span().slice_time(start, end)
+
+    def slice_words(self, lo: int, hi: Optional[int] = None) -> "TranscriptSpan":
+        return self.span().slice_words(lo, hi)
+
+    @property
+    def word_count(self) -> int:
+        return self.word_offsets[-1]
+
+
+class TranscriptSpan:
+    """View trên các snippet [lo, hi) của một Transcript, không copy dữ liệu."""
+
+    __slots__ = ("transcript", "lo", "hi")
+
+    def __init__(self, transcript: Transcript, lo: int, hi: int):
+        self.transcript = transcript
+        self.lo = max(0, lo)
+        self.hi = max(self.lo, min(hi, len(transcript)))
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def __bool__(self) -> bool:
+        return self.hi > self.lo
+
+    def __repr__(self) -> str:
+        return (
+            f"TranscriptSpan({format_timestamp(self.start_time)}-"
+            f"{format_timestamp(self.end_time)}, {self.word_count} words)"
+        )
+
+    @property
+    def start_time(self) -> float:
+        if not self:
+            return 0.0
+        return self.transcript.starts[self.lo]
+
+    @property
+    def end_time(self) -> float:
+        if not self:
+            return 0.0
+        t = self.transcript
+        return t.starts[self.hi - 1] + t.durations[self.hi - 1]
+
+    @property
+    def char_range(self) -> tuple:
+        if not self:
+            return 0, 0
+        t = self.transcript
+        begin = t.offsets[self.lo]
+        end = t.offsets[self.hi] - 1 if self.hi < len(t) else len(t.text)
+        return begin, end
+
+    @property
+    def text(self) -> str:
+        begin, end = self.char_range
+        return self.transcript.text[begin:end]
+
+    @property
+    def word_count(self) -> int:
+        wo = self.transcript.word_offsets
+        return wo[self.hi] - wo[self.lo]
+
+    @property
+    def label(self) -> str:
+        return f"{format_timestamp(self.start_time)}-{format_timestamp(self.end_time)}"
+
+    def slice_time(self, start: Optional[float] = None, end: Optional[float] = None) -> "TranscriptSpan":
+        """
+        Giữ các snippet có phần giao với [start, end) (giây).
+        Dùng bisect trên mảng `starts` nên không phải duyệt toàn bộ.
+        """
+        t = self.transcript
+        lo, hi = self.lo, self.hi
+        if start is not None:
+            # Snippet đầu tiên còn "đang chạy" tại thời điểm start
+            i = bisect_right(t.starts, start, lo, hi) - 1
+            if i < lo or t.starts[i] + t.durations[i] <= start:
+                i += 1
+            lo = max(lo, i)
+        if end is not None:
+            hi = min(hi, bisect_left(t.starts, end, lo, hi))
+        return TranscriptSpan(t, lo, hi)
+
+    def slice_words(self, lo: int, hi: Optional[int] = None) -> "TranscriptSpan":
+        """
+        Cắt theo offset từ (tương đối với đầu span). Biên được làm tròn ra
+        ranh giới snippet để giữ timestamp chính xác.
+        """
+        t = self.transcript
+        base = t.word_offsets[self.lo]
+        first = bisect_right(t.word_offsets, base + lo, self.lo, self.hi + 1) - 1
+        if hi is None:
+            last = self.hi
+        else:
+            last = bisect_left(t.word_offsets, base + hi, self.lo, self.hi + 1)
+        return TranscriptSpan(t, first, last)
+
+    def split_at_words(self, cuts: Iterable[int]) -> Iterator["TranscriptSpan"]:
+        """
+        Cắt span tại các offset từ cho trước (tương đối với đầu span), mỗi
+        điểm cắt được dời về ranh giới snippet gần nhất.
+        """
+        t = self.transcript
+        base = t.word_offsets[self.lo]
+        i = self.lo
+        for cut in cuts:
+            target = base + cut
+            j = bisect_left(t.word_offsets, target, i + 1, self.hi + 1)
+            if j > i + 1 and target - t.word_offsets[j - 1] < t.word_offsets[min(j, self.hi)] - target:
+                j -= 1
+            j = min(j, self.hi)
+            if j > i:
+                yield TranscriptSpan(t, i, j)
+                i = j
+        if i < self.hi:
+            yield TranscriptSpan(t, i, self.hi)
+
+    def chunks(self, chunk_words: int) -> Iterator["TranscriptSpan"]:
+        """
+        Chia span thành các đoạn ~chunk_words từ, cắt tại ranh giới snippet
+        để mỗi đoạn mang theo khoảng thời gian của nó.
+        """
+        chunk_words = max(1, chunk_words)
+        t = self.transcript
+        i = self.lo
+        while i < self.hi:
+            target = t.word_offsets[i] + chunk_words
+            j = bisect_left(t.word_offsets, target, i + 1, self.hi + 1)
+            j = max(i + 1, min(j, self.hi))
+            yield TranscriptSpan(t, i, j)
+            i = j
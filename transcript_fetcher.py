@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Lấy transcript YouTube dùng chung một HTTP session (connection pool).
+
+- Một TranscriptFetcher dùng chung cho cả process (get_fetcher()): mọi request
+  đi qua cùng một requests.Session, không mở kết nối TLS mới cho từng video
+- Chỉ gọi danh sách transcript (list) một lần cho mỗi video rồi tự chọn bản tốt
+  nhất: đúng ngôn ngữ (bản tạo tay trước bản tự động), sau đó các ngôn ngữ dự
+  phòng, cuối cùng là bản bất kỳ (dịch sang ngôn ngữ cần nếu YouTube cho phép)
+- fetch_many(): lấy nhiều video song song với số luồng giới hạn
+
+LESSON_YOUTUBE_BASE_URL=http://127.0.0.1:8765 chuyển mọi request youtube.com
+sang server thay thế chạy local (`python transcript_fetcher.py standin`), để
+thử / đo mà không cần mạng.
+
+Usage:
+  python transcript_fetcher.py fetch URL_1 URL_2 ... --workers 8
+  python transcript_fetcher.py standin --port 8765 --latency 0.3
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import requests
+from requests.adapters import HTTPAdapter
+from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+
+from replay import fetch_transcript_entries
+from transcript import Transcript
+
+
+# Ngôn ngữ dự phòng khi không có transcript đúng ngôn ngữ yêu cầu
+FALLBACK_LANGUAGES = ("vi", "vi-VN", "en", "en-US", "en-GB")
+DEFAULT_WORKERS = 8
+
+
+def language_preferences(preferred: Optional[str]) -> List[str]:
+    """Ngôn ngữ yêu cầu + các biến thể của nó trước, rồi tới các ngôn ngữ dự phòng."""
+    base = (preferred or "").split("-")[0].lower()
+    ordered = [preferred, base]
+    ordered += [code for code in FALLBACK_LANGUAGES if code.split("-")[0] == base]
+    ordered += list(FALLBACK_LANGUAGES)
+    langs: List[str] = []
+    for code in ordered:
+        if code and code not in langs:
+            langs.append(code)
+    return langs
+
+
+class _BaseUrlAdapter(HTTPAdapter):
+    """Chuyển request tới *.youtube.com sang base_url (server thay thế)."""
+
+    def __init__(self, base_url: str, **kwargs):
+        self.base_url = base_url.rstrip("/")
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if (parts.hostname or "").endswith("youtube.com"):
+            request.url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+
+class TranscriptFetcher:
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, base_url: Optional[str] = None):
+        self.max_workers = max(1, max_workers)
+        self.base_url = base_url or os.environ.get("LESSON_YOUTUBE_BASE_URL") or None
+        self.session = requests.Session()
+        # Pool đủ lớn cho số luồng của fetch_many, kết nối được giữ lại giữa các video
+        if self.base_url:
+            adapter = _BaseUrlAdapter(self.base_url, pool_maxsize=self.max_workers)
+        else:
+            adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.api = YouTubeTranscriptApi(http_client=self.session)
+
+    def resolve(self, video_id: str, languages: List[str]):
+        """Một lần gọi list() rồi chọn transcript tốt nhất (chưa tải nội dung)."""
+        listing = self.api.list(video_id)
+        try:
+            return listing.find_transcript(languages)
+        except NoTranscriptFound:
+            available = list(listing)
+            if not available:
+                raise
+            transcript = available[0]
+            target = languages[0] if languages else None
+            codes = {lang.language_code for lang in transcript.translation_languages}
+            for code in (target, (target or "").split("-")[0]):
+                if code and code in codes:
+                    return transcript.translate(code)
+            return transcript
+
+    def fetch(self, video_id: str, preferred_language: str) -> Transcript:
+        langs = language_preferences(preferred_language)
+        # LESSON_REPLAY=record/replay: ghi lại hoặc phát lại transcript (xem replay.py)
+        return Transcript.from_raw_data(
+            fetch_transcript_entries(video_id, langs, lambda: self.resolve(video_id, langs).fetch())
+        )
+
+    def fetch_many(
+        self,
+        video_ids: Iterable[str],
+        preferred_language: str,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Union[Transcript, Exception]]:
+        """
+        Lấy nhiều video song song (tối đa max_workers luồng). Kết quả theo thứ
+        tự video_ids; video lỗi có giá trị là exception thay vì làm hỏng cả lô.
+        """
+        ids = list(dict.fromkeys(video_ids))
+
+        def fetch_one(video_id: str) -> Union[Transcript, Exception]:
+            try:
+                return self.fetch(video_id, preferred_language)
+            except Exception as e:
+                return e
+
+        workers = max(1, min(max_workers or self.max_workers, len(ids) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(ids, pool.map(fetch_one, ids)))
+
+
+_shared: Optional[TranscriptFetcher] = None
+_shared_lock = threading.Lock()
+
+
+def get_fetcher() -> TranscriptFetcher:
+    """TranscriptFetcher dùng chung trong process (tạo khi cần lần đầu)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TranscriptFetcher()
+        return _shared
+
+
+# ---------- server thay thế để thử không cần mạng ----------
+class StandInServer:
+    """
+    Giả lập các endpoint YouTube mà youtube-transcript-api dùng (trang watch,
+    innertube player, timedtext). Transcript lấy từ fixture đã ghi bằng replay.py
+    nếu có, không thì sinh câu giả. `latency` (giây) thêm vào mỗi request.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        languages: Iterable[str] = ("en", "vi"),
+        fixtures_dir: Optional[str] = None,
+    ):
+        self.latency = latency
+        self.languages = list(languages)
+        self.fixtures_dir = fixtures_dir
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def entries(self, video_id: str) -> List[Dict]:
+        if self.fixtures_dir:
+            folder = os.path.join(self.fixtures_dir, "transcripts")
+            if os.path.isdir(folder):
+                for name in sorted(os.listdir(folder)):
+                    if name.startswith(video_id + "__"):
+                        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                            return json.load(f)["raw_data"]
+        return [
+            {"text": f"Part {i} of video {video_id}: an important step with an example.", "start": i * 4.0, "duration": 4.0}
+            for i in range(120)
+        ]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: str, content_type: str) -> None:
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _enter(self) -> None:
+                with server._lock:
+                    server.requests += 1
+                if server.latency > 0:
+                    time.sleep(server.latency)
+
+            def do_GET(self):
+                self._enter()
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == "/watch":
+                    self._send('<html><script>var c = {"INNERTUBE_API_KEY": "standin"};</script></html>', "text/html")
+                elif parts.path == "/api/timedtext":
+                    video_id = query.get("v", [""])[0]
+                    lines = "".join(
+                        f'<text start="{e["start"]}" dur="{e["duration"]}">{escape(e["text"])}</text>'
+                        for e in server.entries(video_id)
+                    )
+                    self._send(f'<?xml version="1.0" encoding="utf-8" ?><transcript>{lines}</transcript>', "text/xml")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self._enter()
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                video_id = payload.get("videoId", "")
+                if urlsplit(self.path).path != "/youtubei/v1/player" or not re.fullmatch(r"[\w-]{11}", video_id):
+                    self.send_error(404)
+                    return
+                tracks = [
+                    {
+                        "baseUrl": f"{server.base_url}/api/timedtext?v={video_id}&lang={lang}",
+                        "name": {"runs": [{"text": lang}]},
+                        "languageCode": lang,
+                        "kind": "asr",
+                        "isTranslatable": False,
+                    }
+                    for lang in server.languages
+                ]
+                self._send(
+                    json.dumps({
+                        "playabilityStatus": {"status": "OK"},
+                        "captions": {"playerCaptionsTracklistRenderer": {"captionTracks": tracks, "translationLanguages": []}},
+                    }),
+                    "application/json",
+                )
+
+        return Handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pooled, concurrent YouTube transcript fetcher")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_fetch = sub.add_parser("fetch", help="Fetch transcripts for many videos concurrently")
+    p_fetch.add_argument("urls", nargs="+", help="YouTube URLs or video IDs")
+    p_fetch.add_argument("--language", "-l", default="en")
+    p_fetch.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p_fetch.add_argument("--save", metavar="DIR", help="Write <video_id>.json (text/start/duration entries)")
+
+    p_standin = sub.add_parser("standin", help="Serve fake YouTube transcript endpoints locally")
+    p_standin.add_argument("--port", type=int, default=8765)
+    p_standin.add_argument("--latency", type=float, default=0.0, help="Seconds added to each request")
+    p_standin.add_argument("--fixtures", default=None, help="Serve transcripts recorded by replay.py from this dir")
+
+    args = parser.parse_args()
+
+    if args.command == "standin":
+        server = StandInServer(args.port, args.latency, fixtures_dir=args.fixtures)
+        print(f"✓ Stand-in YouTube at {server.base_url}")
+        print(f"   export LESSON_YOUTUBE_BASE_URL={server.base_url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
+        return 0
+
+    from quickstart import extract_video_id
+
+    ids = []
+    for url in args.urls:
+        try:
+            ids.append(extract_video_id(url))
+        except ValueError as e:
+            print(f"✗ {url}: {e}")
+    fetcher = TranscriptFetcher(max_workers=args.workers)
+    started = time.perf_counter()
+    results = fetcher.fetch_many(ids, args.language)
+    failed = 0
+    for video_id, result in results.items():
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"✗ {video_id}: {type(result).__name__}: {result}".splitlines()[0])
+            continue
+        print(f"✓ {video_id}: {result.word_count} words")
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            with open(os.path.join(args.save, video_id + ".json"), "w", encoding="utf-8") as f:
+                json.dump(result.to_raw_data(), f, ensure_ascii=False)
+    print(f"⏱ {len(ids)} videos in {time.perf_counter() - started:.1f}s ({args.workers} workers)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,4 +3,10 @@ return [
     'python' => 'C:\\Users\\<User>\\AppData\\Local\\Programs\\Python\\Python312\\python.exe',
     'default_language' => 'vi',
     'gemini_api_key' => getenv('GEMINI_API_KEY') ?: '',
+    // true = gửi job vào hàng đợi (job_service.py) và trả về ngay, trang tự hỏi trạng thái.
+    // Cần chạy worker nền: python job_service.py worker --workers 2
+    'job_queue' => false,
+    // Backend cho job: 'gemini', 'local', hoặc 'auto' (worker chọn theo tải và độ trễ,
+    // Gemini bị rate limit thì chạy bằng model local)
+    'job_backend' => 'gemini',
 ];
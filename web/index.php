@@ -10,9 +10,46 @@ set_time_limit(300);
 $config = require __DIR__ . '/config.php';
 $PYTHON = $config['python'] ?? 'python';
 $DEFAULT_LANG = $config['default_language'] ?? 'vi';
+$JOB_QUEUE = !empty($config['job_queue']);
+$JOB_BACKEND = $config['job_backend'] ?? 'gemini';
 
 $repoRoot = realpath(__DIR__ . '/..');
 $scriptPath = $repoRoot . DIRECTORY_SEPARATOR . 'gemini_lesson.py';
+$jobScriptPath = $repoRoot . DIRECTORY_SEPARATOR . 'job_service.py';
+
+// Chạy job_service.py (lệnh ngắn: submit / status) và trả về JSON đã decode
+function run_job_service($python, $jobScriptPath, $repoRoot, array $args) {
+  $command = escapeshellarg($python) . ' ' . escapeshellarg($jobScriptPath);
+  foreach ($args as $arg) {
+    $command .= ' ' . escapeshellarg($arg);
+  }
+  $descriptorspec = [0 => ['pipe', 'r'], 1 => ['pipe', 'w'], 2 => ['pipe', 'w']];
+  $env = $_ENV;
+  $env['PYTHONIOENCODING'] = 'utf-8';
+  $proc = proc_open($command, $descriptorspec, $pipes, $repoRoot, $env);
+  if (!is_resource($proc)) {
+    return ['error' => 'proc_open failed'];
+  }
+  fclose($pipes[0]);
+  $stdout = stream_get_contents($pipes[1]);
+  fclose($pipes[1]);
+  $stderr = stream_get_contents($pipes[2]);
+  fclose($pipes[2]);
+  proc_close($proc);
+  $data = json_decode($stdout, true);
+  if (!is_array($data)) {
+    return ['error' => trim($stderr) !== '' ? $stderr : 'Invalid response from job_service.py'];
+  }
+  return $data;
+}
+
+// Hỏi trạng thái job (được gọi lặp lại từ JavaScript khi bật job_queue)
+if ($JOB_QUEUE && isset($_GET['job'])) {
+  header('Content-Type: application/json; charset=utf-8');
+  $jobId = preg_replace('/[^a-f0-9]/', '', $_GET['job']);
+  echo json_encode(run_job_service($PYTHON, $jobScriptPath, $repoRoot, ['status', $jobId]), JSON_UNESCAPED_UNICODE);
+  exit;
+}
 
 $url = isset($_POST['url']) ? trim($_POST['url']) : '';
 $lang = isset($_POST['language']) ? trim($_POST['language']) : $DEFAULT_LANG;
@@ -20,6 +57,7 @@ $output = '';
 $error = '';
 $exitCode = null;
 $debugInfo = '';
+$jobId = '';
 
 // Debug: Check if form was submitted
 if ($_SERVER['REQUEST_METHOD'] === 'POST') {
@@ -32,6 +70,15 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
     
     if ($url === '') {
         $error = 'Vui lòng nhập URL YouTube.';
+    } elseif ($JOB_QUEUE) {
+        // Chế độ hàng đợi: chỉ gửi job (trùng video đang chạy thì dùng chung job) rồi trả về ngay
+        $submitted = run_job_service($PYTHON, $jobScriptPath, $repoRoot, ['submit', '--url', $url, '--language', $lang, '--backend', $JOB_BACKEND]);
+        if (isset($submitted['job_id'])) {
+            $jobId = $submitted['job_id'];
+            $debugInfo .= "\nJob: $jobId" . (!empty($submitted['coalesced']) ? ' (gộp với job đang chạy)' : '');
+        } else {
+            $error = 'Không thể gửi job: ' . ($submitted['error'] ?? 'unknown error');
+        }
     } elseif (!file_exists($scriptPath)) {
         $error = 'Không tìm thấy gemini_lesson.py tại: ' . $scriptPath;
     } else {
@@ -42,6 +89,8 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
           escapeshellarg($scriptPath),
           '--url ' . escapeshellarg($url),
           '--language ' . escapeshellarg($lang),
+          '--format json',
+          '--deadline 270', // dừng trước set_time_limit(300) của PHP
         ];
 
         // Define attempts: configured python, Windows py launcher, Windows py -3
@@ -114,7 +163,9 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
             $debugInfo .= "\nStderr length: " . strlen($stderr);
 
             if ($exitCode === 0 && $stdout !== '') {
-              $output = $stdout;
+              // --format json: stdout là một record JSON, bài học nằm trong 'markdown'
+              $record = json_decode($stdout, true);
+              $output = (is_array($record) && isset($record['markdown'])) ? $record['markdown'] : $stdout;
               $succeeded = true;
               break;
             }
@@ -258,6 +309,10 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
       </div>
     <?php endif; ?>
 
+    <?php if ($jobId !== ''): ?>
+      <div id="job" data-job-id="<?= htmlspecialchars($jobId, ENT_QUOTES, 'UTF-8') ?>"></div>
+    <?php endif; ?>
+
     <?php if ($output !== ''): ?>
       <div class="ok">✅ Hoàn tất. Kết quả hiển thị bên dưới.</div>
       <label for="result">Kết quả</label>
@@ -352,7 +407,48 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
         const resultLabel = doc.querySelector('label[for="result"]');
         const resultTextarea = doc.querySelector('textarea#result');
         
-        if (resultOk && resultTextarea) {
+        // Chế độ hàng đợi: hỏi trạng thái job cho tới khi xong
+        const jobEl = doc.querySelector('#job');
+        if (jobEl && !errorEl) {
+          const jobId = jobEl.dataset.jobId;
+          console.log('Job queued:', jobId);
+          let job = {};
+          while (true) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            job = await (await fetch('?job=' + encodeURIComponent(jobId))).json();
+            // Chỉ dừng ở trạng thái cuối: job bị rate limit có thể còn error cũ
+            // khi được đưa lại hàng đợi. Không có status = lỗi của job_service.
+            if (!job.status || ['done', 'failed', 'cancelled'].includes(job.status)) break;
+            const loadingText = document.querySelector('.loading-text');
+            if (loadingText) {
+              if (job.status === 'queued') {
+                loadingText.textContent = '⏳ Đang xếp hàng (vị trí ' + (job.queue_position || 1) + ')...';
+              } else if (job.status === 'cancelling') {
+                loadingText.textContent = '⏹ Đang hủy, chờ lưu phần bài học đã tạo...';
+              } else {
+                loadingText.textContent = '✨ Đang tạo bài học với Gemini AI...';
+              }
+            }
+          }
+          if (job.status === 'done' || (job.status === 'cancelled' && job.output)) {
+            const notice = job.status === 'done'
+              ? '<div class="ok">✅ Hoàn tất. Kết quả hiển thị bên dưới.</div>'
+              : '<div class="error">⏹ Job đã bị hủy. Bên dưới là phần bài học đã tạo được trước khi hủy.</div>';
+            form.insertAdjacentHTML('afterend', notice);
+            form.insertAdjacentHTML('beforeend', '<label for="result">Kết quả</label><textarea id="result" readonly></textarea>');
+            form.querySelector('textarea#result').value = job.output || '';
+          } else if (job.status === 'cancelled') {
+            const msg = document.createElement('div');
+            msg.className = 'error';
+            msg.textContent = '⏹ Job đã bị hủy trước khi có kết quả.';
+            form.insertAdjacentElement('afterend', msg);
+          } else {
+            const msg = document.createElement('div');
+            msg.className = 'error';
+            msg.textContent = 'Lỗi: ' + (job.error || 'Job thất bại');
+            form.insertAdjacentElement('afterend', msg);
+          }
+        } else if (resultOk && resultTextarea) {
                     console.log('✅ Result received! Length:', resultTextarea.value?.length || resultTextarea.textContent?.length, 'chars');
           form.insertAdjacentHTML('afterend', resultOk.outerHTML);
           form.insertAdjacentHTML('beforeend', resultLabel.outerHTML);